@@ -0,0 +1,221 @@
+# alert_parser.py
+import hashlib
+import json
+from typing import Any, Optional
+
+# Optional faster decoders. msgspec decodes straight into the schema below
+# and skips every field the alert path does not need; orjson is a faster
+# drop-in for json.loads.
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class AlertParseError(ValueError):
+    pass
+
+
+class AlertIntent:
+    # What an alert asks for, parsed once on the reader side.
+    # command is 'buy', 'sell', 'close' or 'modify'; price is set for limit
+    # orders and volume when the alert overrides risk-based sizing. key is
+    # the idempotency key of the alert that produced it (see alert_key).
+    __slots__ = ('name', 'command', 'symbol', 'sl_pips', 'tp_pips', 'price', 'volume', 'key')
+
+    def __init__(self, name, command, symbol, sl_pips=None, tp_pips=None, price=None, volume=None, key=None):
+        self.name = name
+        self.command = command
+        self.symbol = symbol
+        self.sl_pips = sl_pips
+        self.tp_pips = tp_pips
+        self.price = price
+        self.volume = volume
+        self.key = key
+
+    @property
+    def is_order(self):
+        return self.command in ('buy', 'sell')
+
+    def __repr__(self):
+        fields = ', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__)
+        return f'AlertIntent({fields})'
+
+
+# ----- frame decoding -----
+
+# Every TradingView alert frame carries both keys; pings, pongs and other
+# notifications on the pipe are turned away by a substring test before any
+# JSON is decoded.
+
+
+def _has_alert_markers(frame):
+    if frame.__class__ is not str:
+        frame = bytes(frame)
+        return b'"message"' in frame and b'"name"' in frame
+    return '"message"' in frame and '"name"' in frame
+
+
+def _fire_id(alert_id, fire_id, fire_time):
+    # TradingView tags each firing with the alert id and fire time; frames
+    # without them have no fire id (see alert_key).
+    parts = [str(value) for value in (alert_id, fire_id, fire_time) if value is not None]
+    return ':'.join(parts) or None
+
+
+def _extract(data):
+    try:
+        payload = data["text"]["content"]["p"]
+        get = payload.get
+        return get("name"), get("message"), _fire_id(get("aid"), get("id"), get("fire_time"))
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+def _decode_json(frame):
+    return _extract(json.loads(frame))
+
+
+def _decode_orjson(frame):
+    return _extract(orjson.loads(frame))
+
+
+if msgspec is not None:
+    class _Payload(msgspec.Struct):
+        name: str = ''
+        message: str = ''
+        aid: Any = None
+        id: Any = None
+        fire_time: Any = None
+
+    class _Content(msgspec.Struct):
+        p: Optional[_Payload] = None
+
+    class _Text(msgspec.Struct):
+        content: Optional[_Content] = None
+
+    class _Frame(msgspec.Struct):
+        text: Optional[_Text] = None
+
+    _frame_decoder = msgspec.json.Decoder(_Frame)
+
+    def _decode_msgspec(frame):
+        try:
+            decoded = _frame_decoder.decode(frame)
+        except msgspec.ValidationError:
+            # Valid JSON that is not shaped like an alert
+            return None
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e))
+        text = decoded.text
+        if text is None or text.content is None or text.content.p is None:
+            return None
+        payload = text.content.p
+        return payload.name, payload.message, _fire_id(payload.aid, payload.id, payload.fire_time)
+
+
+DECODERS = {'json': _decode_json}
+if orjson is not None:
+    DECODERS['orjson'] = _decode_orjson
+if msgspec is not None:
+    DECODERS['msgspec'] = _decode_msgspec
+
+
+def best_backend():
+    for backend in ('msgspec', 'orjson', 'json'):
+        if backend in DECODERS:
+            return backend
+
+
+def frame_decoder(backend=None):
+    # Returns decode(frame) -> (name, message, fire_id) for alert frames, None
+    # for any other frame. Raises ValueError on malformed JSON.
+    decode = DECODERS[backend or best_backend()]
+
+    def decode_frame(frame):
+        if not _has_alert_markers(frame):
+            return None
+        alert = decode(frame)
+        if alert is None or not alert[0] or not alert[1]:
+            return None
+        return alert
+
+    return decode_frame
+
+
+decode_frame = frame_decoder()
+
+
+def alert_key(name, message, fire_id=None, content_only=False):
+    # 32 hex characters identifying one firing of one alert, or None when the
+    # frame has no fire id: the same signal sent twice is then two orders.
+    # content_only keys such frames by content alone, so identical alerts
+    # inside the dedup window count as one.
+    if fire_id is None and not content_only:
+        return None
+    raw = f"{fire_id or ''}|{name}|{message}".encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+# ----- alert grammar -----
+#
+#   buy|sell SYMBOL SL TP [limit=PRICE] [lots=VOLUME]
+#   modify SYMBOL SL TP
+#   close SYMBOL
+
+_OPTIONS = {'limit': 'price', 'price': 'price', 'lots': 'volume', 'volume': 'volume'}
+
+
+def _number(token, what):
+    try:
+        return float(token)
+    except ValueError:
+        raise AlertParseError(f"{what} must be a numeric value, got '{token}'.")
+
+
+def _pips(parts):
+    try:
+        return float(parts[2]), float(parts[3])
+    except ValueError:
+        raise AlertParseError("SL and TP pips must be numeric values.")
+
+
+def parse_alert(text, name=None):
+    parts = text.lower().split()
+    if not parts:
+        raise AlertParseError("Alert description is empty.")
+    command = parts[0]
+
+    if command == 'buy' or command == 'sell':
+        if len(parts) < 4:
+            raise AlertParseError("Alert description needs an action, symbol, SL pips and TP pips. Skipping.")
+        sl_pips, tp_pips = _pips(parts)
+        intent = AlertIntent(name, command, parts[1].upper(), sl_pips, tp_pips)
+        if len(parts) > 4:
+            for option in parts[4:]:
+                key, _, value = option.partition('=')
+                field = _OPTIONS.get(key)
+                if field is None or not value:
+                    raise AlertParseError(f"Unknown alert option '{option}'.")
+                setattr(intent, field, _number(value, key))
+            if intent.volume is not None and intent.volume <= 0:
+                raise AlertParseError("Lot override must be positive.")
+        return intent
+
+    if command == 'modify':
+        if len(parts) != 4:
+            raise AlertParseError("Modify alerts take a symbol, SL pips and TP pips.")
+        sl_pips, tp_pips = _pips(parts)
+        return AlertIntent(name, command, parts[1].upper(), sl_pips, tp_pips)
+
+    if command == 'close':
+        if len(parts) != 2:
+            raise AlertParseError("Close alerts take just a symbol.")
+        return AlertIntent(name, command, parts[1].upper())
+
+    raise AlertParseError(f"Unknown action '{command}'. Skipping.")
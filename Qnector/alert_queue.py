@@ -0,0 +1,142 @@
+# alert_queue.py
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('qnector.queue')
+
+POLICIES = ('drop-oldest', 'reject', 'block')
+
+
+class _Lane:
+    __slots__ = ('key', 'handler', 'items', 'lock', 'running', 'closed',
+                 'enqueued', 'processed', 'dropped', 'rejected', 'wait_total', 'max_wait')
+
+    def __init__(self, key, handler):
+        self.key = key
+        self.handler = handler
+        self.items = deque()
+        self.lock = threading.Lock()
+        self.running = False
+        self.closed = False
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.max_wait = 0.0
+
+
+class AlertQueues:
+    # One bounded FIFO per strategy between the socket readers and execution.
+    # A lane is drained by at most one pool worker at a time, so a strategy's
+    # alerts run in order while different strategies execute in parallel.
+    # When a lane is full the policy decides: 'drop-oldest' discards the
+    # oldest waiting alert, 'reject' refuses the new one, and 'block' refuses
+    # it too so the reader can hold off reading that socket until there is
+    # room (see StreamManager).
+    DRAIN_BATCH = 16  # alerts per turn before a worker yields to other lanes
+
+    def __init__(self, maxsize=100, policy='drop-oldest', max_workers=8, metrics=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown alert queue policy '{policy}'. Use one of: {', '.join(POLICIES)}.")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.metrics = metrics
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='alert-worker')
+        self.lanes = {}
+
+    def register(self, key, handler):
+        # handler is called as handler(item, received_at) on a pool worker
+        old = self.lanes.get(key)
+        if old is not None:
+            old.closed = True
+        self.lanes[key] = _Lane(key, handler)
+
+    def unregister(self, key):
+        lane = self.lanes.pop(key, None)
+        if lane is None:
+            return 0
+        with lane.lock:
+            lane.closed = True
+            discarded = len(lane.items)
+            lane.items.clear()
+        if discarded:
+            logger.warning("Discarded %d queued alert(s) for '%s'.", discarded, key)
+        return discarded
+
+    def offer(self, key, item, received_at):
+        # Returns False when the alert was not queued (unknown key, or a full
+        # lane under the 'reject' or 'block' policy).
+        lane = self.lanes.get(key)
+        if lane is None:
+            return False
+        with lane.lock:
+            if len(lane.items) >= self.maxsize:
+                if self.policy == 'drop-oldest':
+                    lane.items.popleft()
+                    lane.dropped += 1
+                    self._count(key, 'dropped')
+                    logger.warning("Alert queue for '%s' is full. Dropped the oldest alert.", key)
+                else:
+                    if self.policy == 'reject':
+                        lane.rejected += 1
+                        self._count(key, 'rejected')
+                        logger.warning("Alert queue for '%s' is full. Rejected a new alert.", key)
+                    return False
+            lane.items.append((item, received_at, time.perf_counter()))
+            lane.enqueued += 1
+            start = not lane.running
+            lane.running = True
+        if start:
+            self.executor.submit(self._drain, lane)
+        return True
+
+    def stats(self):
+        lanes = list(self.lanes.values())
+        processed = sum(lane.processed for lane in lanes)
+        return {
+            'lanes': len(lanes),
+            'depth': sum(len(lane.items) for lane in lanes),
+            'max_lane_depth': max((len(lane.items) for lane in lanes), default=0),
+            'enqueued': sum(lane.enqueued for lane in lanes),
+            'processed': processed,
+            'dropped': sum(lane.dropped for lane in lanes),
+            'rejected': sum(lane.rejected for lane in lanes),
+            'avg_wait_ms': sum(lane.wait_total for lane in lanes) / (processed or 1) * 1000,
+            'max_wait_ms': max((lane.max_wait for lane in lanes), default=0.0) * 1000,
+        }
+
+    def stop(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def _count(self, key, outcome):
+        if self.metrics is not None:
+            self.metrics.increment(key, outcome)
+
+    def _drain(self, lane):
+        for _ in range(self.DRAIN_BATCH):
+            with lane.lock:
+                if lane.closed or not lane.items:
+                    lane.running = False
+                    return
+                item, received_at, enqueued_at = lane.items.popleft()
+
+            wait = time.perf_counter() - enqueued_at
+            lane.wait_total += wait
+            lane.max_wait = max(lane.max_wait, wait)
+            if self.metrics is not None:
+                self.metrics.observe(lane.key, 'queue_wait', wait)
+            try:
+                lane.handler(item, received_at)
+            except Exception:
+                logger.exception("Alert handler for '%s' failed.", lane.key)
+            lane.processed += 1
+
+        # Give the worker back so other lanes are not starved
+        try:
+            self.executor.submit(self._drain, lane)
+        except RuntimeError:
+            lane.running = False  # shutting down
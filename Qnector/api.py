@@ -0,0 +1,208 @@
+# api.py
+import base64
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, Response, jsonify, request, abort, stream_with_context
+from sqlalchemy import select, tuple_
+
+from models import db, Strategy, Trade
+from rollups import PORTFOLIO, RESOLUTIONS, load_rollups
+from response_cache import page_cache
+from export import EXPORT_FORMATS, COLUMNAR_FORMATS, columnar_available, export_chunks
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+DEFAULT_CHART_POINTS = 500
+MAX_CHART_POINTS = 5000
+
+TRADE_COLUMNS = (
+    Trade.id, Trade.trade_id, Trade.strategy_id, Trade.symbol, Trade.action,
+    Trade.volume, Trade.price, Trade.sl, Trade.tp, Trade.profit, Trade.timestamp,
+)
+
+
+def encode_cursor(timestamp, trade_id):
+    raw = f"{timestamp.isoformat()}|{trade_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, trade_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(trade_id)
+    except (ValueError, UnicodeDecodeError):
+        abort(400, description='Invalid cursor.')
+
+
+def trade_page(strategy_ids, with_strategy_name=False):
+    # Keyset pagination on (timestamp, id): each page starts right after the
+    # last row of the previous one, so page N costs the same as page 1.
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    start, end = date_range()
+    columns = TRADE_COLUMNS + ((Strategy.name,) if with_strategy_name else ())
+    query = select(*columns).where(Trade.strategy_id.in_(strategy_ids))
+    if with_strategy_name:
+        query = query.join(Strategy, Strategy.id == Trade.strategy_id)
+    if start is not None:
+        query = query.where(Trade.timestamp >= start)
+    if end is not None:
+        query = query.where(Trade.timestamp < end)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.where(tuple_(Trade.timestamp, Trade.id) > decode_cursor(cursor))
+    query = query.order_by(Trade.timestamp, Trade.id).limit(limit + 1)
+
+    rows = db.session.execute(query).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    trades = []
+    for row in rows:
+        trade = {
+            'id': row.id,
+            'trade_id': row.trade_id,
+            'strategy_id': row.strategy_id,
+            'symbol': row.symbol,
+            'action': row.action,
+            'volume': row.volume,
+            'price': row.price,
+            'sl': row.sl,
+            'tp': row.tp,
+            'profit': row.profit,
+            'timestamp': row.timestamp.strftime('%Y-%m-%d %H:%M'),
+        }
+        if with_strategy_name:
+            trade['strategy'] = row.name
+        trades.append(trade)
+
+    next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None
+    return jsonify(trades=trades, next_cursor=next_cursor)
+
+
+def date_range():
+    # start and end (exclusive) from the query string; dates are ISO 8601,
+    # e.g. 2024-01-31 or 2024-01-31T12:00. An end given as a plain date, as
+    # the date inputs on the performance pages send it, includes that day.
+    bounds = []
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        try:
+            bound = datetime.fromisoformat(value) if value else None
+        except ValueError:
+            abort(400, description=f'Invalid {name} date.')
+        if name == 'end' and bound is not None and is_plain_date(value):
+            bound += timedelta(days=1)
+        bounds.append(bound)
+    return bounds[0], bounds[1]
+
+
+def is_plain_date(value):
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def rollup_query():
+    resolution = request.args.get('resolution', 'day')
+    if resolution not in RESOLUTIONS:
+        abort(400, description=f"resolution must be one of {', '.join(RESOLUTIONS)}.")
+    start, end = date_range()
+    return resolution, start, end
+
+
+def minmax_rows(rollups, points):
+    # At most points buckets, in time order: the first, the last and the
+    # lowest and highest close of each of (points - 2) // 2 equal runs, so
+    # drawdowns and peaks survive the reduction
+    n = len(rollups)
+    if n <= points:
+        return rollups
+    runs = (points - 2) // 2
+    keep = {0, n - 1}
+    for i in range(runs):
+        run = range(i * n // runs, (i + 1) * n // runs)
+        keep.add(min(run, key=lambda j: rollups[j].close_equity))
+        keep.add(max(run, key=lambda j: rollups[j].close_equity))
+    return [rollups[j] for j in sorted(keep)]
+
+
+def pnl_buckets(strategy_id):
+    # One entry per bucket from the rollups, however many trades they hold,
+    # reduced to the points asked for
+    resolution, start, end = rollup_query()
+    points = max(4, min(request.args.get('points', DEFAULT_CHART_POINTS, type=int), MAX_CHART_POINTS))
+    rollups = load_rollups(db.session, strategy_id, resolution, start, end)
+    total_buckets = len(rollups)
+    rollups = minmax_rows(rollups, points)
+    return jsonify(resolution=resolution, total_buckets=total_buckets, buckets=[
+        {
+            'start': rollup.bucket_start.strftime('%Y-%m-%d %H:%M'),
+            'pnl': rollup.pnl,
+            'trades': rollup.trade_count,
+            'wins': rollup.win_count,
+            'equity': rollup.close_equity,
+            'min_equity': rollup.min_equity,
+            'max_equity': rollup.max_equity,
+        }
+        for rollup in rollups
+    ])
+
+
+def trade_export(strategy_ids, filename):
+    # The whole filtered history, streamed batch by batch from the database
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        abort(400, description=f"format must be one of {', '.join(EXPORT_FORMATS)}.")
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        abort(400, description=f'The {fmt} format needs pyarrow installed.')
+    start, end = date_range()
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    chunks = export_chunks(db.session, fmt, strategy_ids, start, end)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{extension}"'},
+    )
+
+
+@api.route('/strategies/<int:strategy_id>/trades')
+def strategy_trades(strategy_id):
+    strategy = Strategy.query.get_or_404(strategy_id)
+    return trade_page([strategy.id])
+
+
+@api.route('/strategies/<int:strategy_id>/trades/export')
+def strategy_trades_export(strategy_id):
+    strategy = Strategy.query.get_or_404(strategy_id)
+    return trade_export([strategy.id], f'strategy-{strategy.id}-trades')
+
+
+@api.route('/strategies/<int:strategy_id>/pnl')
+@page_cache.cached('strategy_id')
+def strategy_pnl(strategy_id):
+    strategy = Strategy.query.get_or_404(strategy_id)
+    return pnl_buckets(strategy.id)
+
+
+@api.route('/portfolio/trades')
+def portfolio_trades():
+    strategy_ids = db.session.scalars(select(Strategy.id)).all()
+    return trade_page(strategy_ids, with_strategy_name=True)
+
+
+@api.route('/portfolio/trades/export')
+def portfolio_trades_export():
+    # ?strategy=<id> may be repeated to export some strategies only
+    strategy_ids = request.args.getlist('strategy', type=int) or None
+    return trade_export(strategy_ids, 'portfolio-trades')
+
+
+@api.route('/portfolio/pnl')
+@page_cache.cached()
+def portfolio_pnl():
+    return pnl_buckets(PORTFOLIO)
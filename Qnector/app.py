@@ -1,466 +1,742 @@
 # app.py
+#
+# create_app() builds the web application; start_pipeline() brings up the
+# trading side (MT5 broker, caches, alert queues, WebSocket streams, trade
+# journal) and start_strategies() resumes the strategies left Active. Running
+# this file does all three. MetaTrader5, the WebSocket client, NumPy, WTForms
+# and Alembic are imported where they are first needed, so importing this
+# module stays cheap and works without an MT5 terminal.
 import os
-from flask import Flask, render_template, redirect, url_for, request, flash
-from flask_sqlalchemy import SQLAlchemy
-from flask_wtf import FlaskForm
-from wtforms import StringField, FloatField, SubmitField, PasswordField
-from wtforms.validators import DataRequired, NumberRange, ValidationError
-from models import db, Strategy, Trade
-from datetime import datetime, timedelta
+import sys
+from flask import Flask, Blueprint, render_template, redirect, url_for, flash, Response, current_app
+from models import db, Strategy, Trade, StrategyStats, PnlRollup, EngineCommand, EngineStatus, StreamHealth, configure_sqlite
+from broker import ExecutionBroker, account_for
+from symbol_cache import SymbolCache
+from exposure import ExposureBook
+from journal import TradeJournal
+from strategy_stats import rebuild_strategy_stats, load_dashboard_stats
+from rollups import PORTFOLIO, RESOLUTIONS, rebuild_rollups, load_rollups, summarize
+from api import api, rollup_query
+from response_cache import page_cache, ALL
+from export import EXPORT_FORMATS, COLUMNAR_FORMATS, columnar_available, export_chunks
+from instrumentation import PipelineMetrics
+from alert_queue import AlertQueues
+from idempotency import AlertDeduplicator
+from order_plan import OrderPlan
+from reconciler import DealReconciler
+from engine import ENGINE_ROW, EngineAlreadyRunning, start_engine
+from logging_setup import configure_logging
+from datetime import datetime
 import logging
 import configparser
 import atexit
-import websocket
-import json
-import threading
 import time
-import ssl
-import MetaTrader5 as mt5
-from flask_migrate import Migrate
+import click
 from dotenv import load_dotenv  # Import load_dotenv
+from sqlalchemy import inspect, or_, select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func
-from scipy import stats  # For statistical tests
-import numpy as np
 
 # Load environment variables from .env
 load_dotenv()
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your_secure_secret_key')  # Replace with a secure key
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///strategies.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db.init_app(app)
-migrate = Migrate(app, db)  # Initialize Flask-Migrate
-
-# =======================
-# Logging Configuration
-# =======================
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler("tradingview_ws.log"),
-        logging.StreamHandler()
-    ]
-)
-
-# Custom filter to suppress specific error messages
-class SuppressErrorsFilter(logging.Filter):
-    def filter(self, record):
-        if 'error from callback' in record.getMessage() or 'WebSocket Error' in record.getMessage():
-            return False  # Suppress the log message
-        return True  # Allow other messages
-
-for handler in logging.getLogger().handlers:
-    handler.addFilter(SuppressErrorsFilter())
-
 # =======================
 # Configuration
 # =======================
 CONFIG_FILE = 'config.ini'
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+def load_config(path=CONFIG_FILE):
+    config = configparser.ConfigParser()
+
+    if not os.path.exists(path):
+        logging.error("Configuration file %s not found.", path)
+        # Create a default config file or handle appropriately
+        config['DEFAULT'] = {
+            'WebSocket_URL': 'wss://your.websocket.url',
+            'Ping_Interval': '30',
+            'Risk_Percentage': '1',
+            'Commission': '4'
+        }
+        with open(path, 'w') as configfile:
+            config.write(configfile)
+        logging.info("Default configuration file %s created.", path)
+    else:
+        config.read(path)
+    return config
 
-config = configparser.ConfigParser()
-
-if not os.path.exists(CONFIG_FILE):
-    logging.error(f"Configuration file {CONFIG_FILE} not found.")
-    # Create a default config file or handle appropriately
-    config['DEFAULT'] = {
-        'WebSocket_URL': 'wss://your.websocket.url',
-        'Ping_Interval': '30',
-        'Risk_Percentage': '1',
-        'Commission': '4'
+def sqlite_options(config):
+    return {
+        'cache_size_mb': int(config['DEFAULT'].get('SQLite_Cache_Size_MB', 64)),
+        'mmap_size_mb': int(config['DEFAULT'].get('SQLite_Mmap_Size_MB', 256)),
     }
-    with open(CONFIG_FILE, 'w') as configfile:
-        config.write(configfile)
-    logging.info(f"Default configuration file {CONFIG_FILE} created.")
-else:
-    config.read(CONFIG_FILE)
+
+config = None
+log_listener = None
+
+logger = logging.getLogger('qnector.web')
+pipeline_logger = logging.getLogger('qnector.pipeline')
+ws_logger = logging.getLogger('qnector.websocket')
 
 # =======================
 # WebSocket and MT5 Handling
 # =======================
 
+ORDER_MAGIC = 234000
+
+def order_comment(name):
+    return f"TradingView Alert: {name}"
+
 class MT5Connection:
-    def __init__(self, strategy):
+    def __init__(self, strategy, broker):
         self.strategy = strategy
+        self.broker = broker
+        self.mt5 = broker.mt5
+        self.account = account_for(strategy)
+        self.strategy_id = strategy.id
+        self.strategy_name = strategy.name
+        self.risk_percentage = strategy.risk_percentage
+        self.commission = strategy.commission
+        self.call_timeout = float(config['DEFAULT'].get('Broker_Call_Timeout', 30))  # Never wait on the broker forever
+        self.plans = {}  # symbol -> OrderPlan
+        self.tickets = self.open_tickets()  # Tickets of the positions this strategy opened
         self.initialize_mt5()
+        symbol_cache.register(self.account)
+        exposure.register(self.account, self.strategy_id, self.exposure_tickets())
+        self.prepare_plans()
+        self.sync_exposure()
 
     def initialize_mt5(self):
+        # The broker owns mt5.initialize/login; this only checks that the
+        # account is reachable so a bad login shows up when the strategy starts.
         try:
-            if not mt5.initialize(path=self.strategy.directory):
-                logging.error(f"Failed to initialize MT5. Error code: {mt5.last_error()}")
-                return False
-
-            authorized = mt5.login(int(self.strategy.mt5_id), password=self.strategy.password, server=self.strategy.server)
-            if authorized:
-                logging.info(f"Connected to MT5 account {self.strategy.mt5_id} on server {self.strategy.server}.")
-                return True
-            else:
-                logging.error(f"Failed to connect to MT5 account {self.strategy.mt5_id}. Error code: {mt5.last_error()}")
-                return False
+            return self.broker.call(self.account, lambda mt5: mt5.account_info() is not None, timeout=self.call_timeout)
         except Exception as e:
-            logging.error(f"Exception during MT5 initialization: {e}")
+            pipeline_logger.error("Exception during MT5 initialization: %s", e)
             return False
 
-    def shutdown_mt5(self):
-        mt5.shutdown()
-        logging.info("MT5 connection closed.")
+    def open_tickets(self):
+        # A position's ticket is that of the order that opened it. Positions
+        # are told apart by ticket, not by order comment: MT5 cuts comments to
+        # 31 characters, which strategies with similar names can share.
+        return {trade_id for (trade_id,) in db.session.query(Trade.trade_id).filter_by(strategy_id=self.strategy_id, close_time=None)}
+
+    def exposure_tickets(self):
+        # Positions that can still count towards today's limits: open, or
+        # closed since midnight UTC
+        day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        return {trade_id for (trade_id,) in db.session.query(Trade.trade_id).filter(
+            Trade.strategy_id == self.strategy_id, or_(Trade.close_time.is_(None), Trade.close_time >= day))}
+
+    def prepare_plans(self):
+        # Build order plans up front for the symbols this strategy has traded
+        symbols = [symbol for (symbol,) in db.session.query(Trade.symbol).filter_by(strategy_id=self.strategy_id).distinct()]
+        if not symbols:
+            return 0
+        try:
+            return self.broker.call(self.account, lambda mt5: sum(self.order_plan(mt5, symbol) is not None for symbol in symbols),
+                                    timeout=self.call_timeout)
+        except Exception as e:
+            pipeline_logger.warning("Could not prepare order plans for strategy '%s': %s", self.strategy_name, e)
+            return 0
 
-    def calculate_volume(self, symbol, sl_pips):
-        # Implement the calculate_volume function as per your original script
+    def sync_exposure(self):
+        # Count the positions already open on the account before the first alert
+        try:
+            return self.broker.call(self.account, exposure.sync_account, self.account, timeout=self.call_timeout)
+        except Exception as e:
+            pipeline_logger.warning("Could not load open positions for strategy '%s': %s", self.strategy_name, e)
+            return 0
+
+    def order_plan(self, mt5, symbol):
+        # Runs inside the broker. The plan is rebuilt whenever the symbol
+        # cache replaces the symbol's metadata.
+        meta = symbol_cache.symbol_meta(mt5, self.account, symbol)
+        if meta is None:
+            return None
+        plan = self.plans.get(symbol)
+        if plan is None or plan.meta is not meta:
+            plan = self.plans[symbol] = OrderPlan(mt5, meta, ORDER_MAGIC, order_comment(self.strategy_name))
+        return plan
+
+    def shutdown_mt5(self):
+        # The terminal session is shared with other strategies and is closed
+        # by the broker on application shutdown.
+        symbol_cache.unregister(self.account)
+        exposure.unregister(self.account, self.strategy_id)
+        pipeline_logger.info("MT5 connection for strategy '%s' released.", self.strategy_name)
+
+    def calculate_volume(self, symbol, sl_pips, plan=None):
+        # Runs inside the broker, with this strategy's account logged in
+        mt5 = self.mt5
         try:
-            account_info = mt5.account_info()
+            account_info = symbol_cache.account_info(mt5, self.account)
             if account_info is None:
-                logging.error("Failed to retrieve account information.")
+                pipeline_logger.error("Failed to retrieve account information.")
                 return None
 
             balance = account_info.balance
             if balance <= 0:
-                logging.error("Account balance is zero or negative.")
+                pipeline_logger.error("Account balance is zero or negative.")
                 return None
 
-            risk_amount = balance * (self.strategy.risk_percentage / 100)
-            logging.debug(f"Account Balance: {balance}, Risk Percentage: {self.strategy.risk_percentage}%, Risk Amount: {risk_amount}")
+            risk_amount = balance * (self.risk_percentage / 100)
+            pipeline_logger.debug("Account Balance: %s, Risk Percentage: %s%%, Risk Amount: %s", balance, self.risk_percentage, risk_amount)
 
-            symbol_info = mt5.symbol_info(symbol)
-            if symbol_info is None:
-                logging.error(f"Symbol {symbol} not found in MT5.")
-                return None
-
-            if not mt5.symbol_select(symbol, True):
-                logging.error(f"Failed to select symbol {symbol}.")
-                return None
+            if plan is None:
+                plan = self.order_plan(mt5, symbol)
+                if plan is None:
+                    return None
 
             account_currency = account_info.currency
-            quote_currency = symbol[-3:]
-            logging.debug(f"Account Currency: {account_currency}, Quote Currency: {quote_currency}")
+            quote_currency = plan.quote_currency
+            pipeline_logger.debug("Account Currency: %s, Quote Currency: %s", account_currency, quote_currency)
 
             if account_currency != quote_currency:
-                exchange_symbol = account_currency + quote_currency
-                exchange_info = mt5.symbol_info(exchange_symbol)
-                if exchange_info is None:
-                    reverse_exchange_symbol = quote_currency + account_currency
-                    exchange_info = mt5.symbol_info(reverse_exchange_symbol)
-                    if exchange_info is None:
-                        logging.error(f"Neither {exchange_symbol} nor {reverse_exchange_symbol} found in MT5.")
-                        return None
-                    else:
-                        tick = mt5.symbol_info_tick(reverse_exchange_symbol)
-                        if tick is None:
-                            logging.error(f"Failed to get tick information for {reverse_exchange_symbol}.")
-                            return None
-                        exchange_rate = 1 / tick.bid
-                        logging.debug(f"Using reverse exchange rate from {reverse_exchange_symbol}: {exchange_rate}")
-                else:
-                    tick = mt5.symbol_info_tick(exchange_symbol)
-                    if tick is None:
-                        logging.error(f"Failed to get tick information for {exchange_symbol}.")
-                        return None
-                    exchange_rate = tick.ask
-                    logging.debug(f"Using direct exchange rate from {exchange_symbol}: {exchange_rate}")
-
-                pip_value = (10 ** -symbol_info.digits) * 100000 / exchange_rate
-                logging.debug(f"Calculated pip value (adjusted for exchange rate): {pip_value}")
+                exchange_rate = symbol_cache.conversion_rate(mt5, self.account, account_currency, quote_currency)
+                if exchange_rate is None:
+                    return None
+                pip_value = plan.pip_value / exchange_rate
+                pipeline_logger.debug("Calculated pip value (adjusted for exchange rate): %s", pip_value)
             else:
-                pip_value = (10 ** -symbol_info.digits) * 100000
-                logging.debug(f"Pip Value (per lot): {pip_value}")
+                pip_value = plan.pip_value
+                pipeline_logger.debug("Pip Value (per lot): %s", pip_value)
 
-            half_commission = self.strategy.commission / 2
+            half_commission = self.commission / 2
             denominator = (sl_pips * pip_value) + half_commission
-            logging.debug(f"Denominator for volume calculation: (SL Pips * Pip Value) + Half Commission = ({sl_pips} * {pip_value}) + {half_commission} = {denominator}")
+            pipeline_logger.debug("Denominator for volume calculation: (SL Pips * Pip Value) + Half Commission = (%s * %s) + %s = %s",
+                                 sl_pips, pip_value, half_commission, denominator)
 
             if denominator <= 0:
-                logging.error("Invalid denominator for volume calculation.")
+                pipeline_logger.error("Invalid denominator for volume calculation.")
                 return None
 
             volume = risk_amount / denominator
-            volume = round(volume, 2)
 
-            if volume < symbol_info.volume_min:
-                logging.warning(f"Calculated volume {volume} is below the minimum {symbol_info.volume_min}. Adjusting to minimum.")
-                volume = symbol_info.volume_min
-            elif volume > symbol_info.volume_max:
-                logging.warning(f"Calculated volume {volume} is above the maximum {symbol_info.volume_max}. Adjusting to maximum.")
-                volume = symbol_info.volume_max
+            if volume < plan.volume_min:
+                pipeline_logger.warning("Calculated volume %s is below the minimum %s. Adjusting to minimum.", volume, plan.volume_min)
+            elif volume > plan.volume_max:
+                pipeline_logger.warning("Calculated volume %s is above the maximum %s. Adjusting to maximum.", volume, plan.volume_max)
+            volume = plan.snap_volume(volume)  # whole volume_steps, within the limits
 
-            logging.info(f"Calculated volume: {volume} lots based on risk management (including commission).")
+            pipeline_logger.info("Calculated volume: %s lots based on risk management (including commission).", volume)
             return volume
 
         except Exception as e:
-            logging.error(f"An error occurred while calculating volume: {e}")
+            pipeline_logger.error("An error occurred while calculating volume: %s", e)
             return None
 
-    def process_alert(self, description, name):
-        # Validate that the alert's strategy name matches the strategy's name
-        if name != self.strategy.name:
-            logging.warning(f"Alert name '{name}' does not match strategy name '{self.strategy.name}'. Ignoring this alert.")
-            return  # Ignore the alert if names do not match
-
-        # Existing processing code
+    def process_intent(self, intent, received_at):
+        strategy_name = self.strategy_name
+        if intent.key is not None:
+            # Reconnect bursts can redeliver an alert that was already acted on
+            if not alert_dedup.first_seen(intent.key):
+                pipeline_metrics.increment(strategy_name, 'duplicate')
+                pipeline_logger.warning("Duplicate alert '%s' for '%s' (key %s). Skipping.", intent.command, strategy_name, intent.key)
+                return
+            journal.record_alert(key=intent.key, strategy_id=self.strategy_id, seen_at=datetime.utcnow())
         try:
-            parts = description.strip().lower().split()
-            if len(parts) != 4:
-                logging.warning("Alert description does not have exactly 4 parts. Skipping.")
+            if not intent.is_order:
+                if self.broker.call(self.account, self.manage_positions, intent, timeout=self.call_timeout):
+                    pipeline_metrics.observe(strategy_name, 'total', time.perf_counter() - received_at)
+                    pipeline_metrics.increment(strategy_name, 'executed')
+                else:
+                    pipeline_metrics.increment(strategy_name, 'failed')
                 return
 
-            action, symbol, sl_pips, tp_pips = parts
-
-            if action not in ["buy", "sell"]:
-                logging.warning(f"Unknown action '{action}'. Skipping.")
+            executed = self.broker.call(self.account, self.execute_order, intent, timeout=self.call_timeout)
+            if executed is None:
+                pipeline_metrics.increment(strategy_name, 'failed')
                 return
+            if executed is False:
+                return  # Refused by a risk limit and counted as such
+            result, volume, price, sl_price, tp_price = executed
+            pipeline_metrics.observe(strategy_name, 'total', time.perf_counter() - received_at)
+            pipeline_metrics.increment(strategy_name, 'executed')
+
+            # Hand the trade to the journal writer; it is committed in the
+            # background. A pending order is journaled at its placed price,
+            # which the reconciler replaces with the fill price once it fills.
+            started = time.perf_counter()
+            journal.record(
+                strategy_id=self.strategy_id,
+                trade_id=result.order,
+                symbol=intent.symbol,
+                action=intent.command.upper(),
+                volume=volume,
+                price=price,
+                sl=sl_price,
+                tp=tp_price,
+                profit=result.profit,
+                timestamp=datetime.utcnow(),
+                alert_key=intent.key
+            )
+            pipeline_metrics.observe(strategy_name, 'journal_write', time.perf_counter() - started)
+            pipeline_logger.info("Trade queued for journal: MT5 order %s", result.order)
 
-            try:
-                sl_pips = float(sl_pips)
-                tp_pips = float(tp_pips)
-            except ValueError:
-                logging.error("SL and TP pips must be numeric values.")
-                return
+        except Exception as e:
+            pipeline_metrics.increment(strategy_name, 'failed')
+            pipeline_logger.error("An error occurred while processing the alert for MT5: %s", e)
+
+    def execute_order(self, mt5, intent):
+        # Runs inside the broker so sizing, pricing and order_send all see the
+        # same logged-in account.
+        symbol, name = intent.symbol, intent.name
+        plan = self.order_plan(mt5, symbol)
+        if plan is None:
+            pipeline_logger.error("Failed to get symbol info for %s.", symbol)
+            return None
 
-            volume = self.calculate_volume(symbol.upper(), sl_pips)
+        if intent.volume is not None:
+            # The alert fixed the lot size; only the broker's step and limits apply
+            volume = plan.snap_volume(intent.volume)
+        else:
+            with pipeline_metrics.timer(self.strategy_name, 'calculate_volume'):
+                volume = self.calculate_volume(symbol, intent.sl_pips, plan)
             if volume is None:
-                logging.error("Failed to calculate trade volume. Skipping trade.")
-                return
+                pipeline_logger.error("Failed to calculate trade volume. Skipping trade.")
+                return None
 
-            symbol_info = mt5.symbol_info(symbol.upper())
-            if symbol_info is None:
-                logging.error(f"Failed to get symbol info for {symbol}.")
-                return
+        # Pre-trade limits, against the in-memory book rather than the terminal
+        breach = exposure.check(self.account, self.strategy_id, symbol, volume)
+        if breach is not None:
+            pipeline_metrics.increment(self.strategy_name, 'risk_rejected')
+            pipeline_logger.warning("Risk limit: not sending %s %s %s for '%s': %s.",
+                                    intent.command.upper(), volume, symbol, name, breach)
+            return False
 
-            digits = symbol_info.digits
-            pip = 10 ** -digits
-            tick = mt5.symbol_info_tick(symbol.upper())
+        pip = plan.point
+        if intent.price is not None:
+            # Limit order at the alert's price; no live quote needed
+            price = intent.price
+            order_type = mt5.ORDER_TYPE_BUY_LIMIT if intent.command == "buy" else mt5.ORDER_TYPE_SELL_LIMIT
+        else:
+            # The only live MT5 read on the alert path; everything else is cached
+            with pipeline_metrics.timer(self.strategy_name, 'tick'):
+                tick = mt5.symbol_info_tick(symbol)
             if tick is None:
-                logging.error(f"Failed to get tick information for {symbol}.")
-                return
+                pipeline_logger.error("Failed to get tick information for %s.", symbol)
+                return None
+            price = tick.ask if intent.command == "buy" else tick.bid
+            order_type = mt5.ORDER_TYPE_BUY if intent.command == "buy" else mt5.ORDER_TYPE_SELL
 
-            if action == "buy":
-                order_type = mt5.ORDER_TYPE_BUY
-                price = tick.ask
-                sl_price = price - (sl_pips * pip)
-                tp_price = price + (tp_pips * pip)
-            else:
-                order_type = mt5.ORDER_TYPE_SELL
-                price = tick.bid
-                sl_price = price + (sl_pips * pip)
-                tp_price = price - (tp_pips * pip)
-
-            request = {
-                "action": mt5.TRADE_ACTION_DEAL,
-                "symbol": symbol.upper(),
-                "volume": volume,
-                "type": order_type,
-                "price": price,
-                "sl": sl_price,
-                "tp": tp_price,
-                "deviation": 20,
-                "magic": 234000,
-                "comment": f"TradingView Alert: {name}",
-                "type_time": mt5.ORDER_TIME_GTC,
-                "type_filling": mt5.ORDER_FILLING_IOC,
-            }
+        if intent.command == "buy":
+            sl_price = price - (intent.sl_pips * pip)
+            tp_price = price + (intent.tp_pips * pip)
+        else:
+            sl_price = price + (intent.sl_pips * pip)
+            tp_price = price - (intent.tp_pips * pip)
+
+        if intent.price is not None:
+            request = plan.pending_request(order_type, price, sl_price, tp_price, volume)
+        else:
+            request = plan.market_request(order_type, price, sl_price, tp_price, volume)
 
+        with pipeline_metrics.timer(self.strategy_name, 'order_send'):
             result = mt5.order_send(request)
 
-            if result.retcode == mt5.TRADE_RETCODE_DONE:
-                logging.info(f"Trade executed successfully: {action.upper()} {volume} {symbol.upper()} at {price}. SL: {sl_price}, TP: {tp_price}. Alert Name: {name}")
-
-                # Log the trade in the database
-                trade = Trade(
-                    strategy_id=self.strategy.id,
-                    trade_id=result.order,
-                    symbol=symbol.upper(),
-                    action=action.upper(),
-                    volume=volume,
-                    price=price,
-                    sl=sl_price,
-                    tp=tp_price,
-                    profit=result.profit,
-                    timestamp=datetime.utcnow()
-                )
-                db.session.add(trade)
-                db.session.commit()
-                logging.info(f"Trade logged successfully: Trade ID {trade.id}")
+        if result.retcode in (mt5.TRADE_RETCODE_DONE, mt5.TRADE_RETCODE_PLACED):
+            self.tickets.add(result.order)  # A pending order's position gets its ticket too
+            if intent.price is None:
+                exposure.opened(self.account, self.strategy_id, result.order, symbol, volume)
             else:
-                logging.error(f"Failed to execute trade: {result.retcode} - {result.comment}")
+                exposure.claim(self.account, self.strategy_id, result.order)  # Counted once it fills
+            pipeline_logger.info("Trade executed successfully: %s %s %s at %s. SL: %s, TP: %s. Alert Name: %s",
+                             intent.command.upper(), volume, symbol, price, sl_price, tp_price, name)
+            return result, volume, price, sl_price, tp_price
+
+        pipeline_logger.error("Failed to execute trade: %s - %s", result.retcode, result.comment)
+        if result.retcode in (mt5.TRADE_RETCODE_INVALID_VOLUME, mt5.TRADE_RETCODE_INVALID_FILL):
+            # Contract specs may have changed; fetch them again next time
+            symbol_cache.invalidate(self.account, symbol)
+        return None
+
+    def manage_positions(self, mt5, intent):
+        # close/modify alerts act on the positions this strategy opened on the
+        # symbol, recognised by magic number and ticket (see open_tickets).
+        positions = [
+            position for position in (mt5.positions_get(symbol=intent.symbol) or ())
+            if position.magic == ORDER_MAGIC and position.ticket in self.tickets
+        ]
+        if not positions:
+            pipeline_logger.warning("No open %s positions for strategy '%s' to %s.", intent.symbol, self.strategy_name, intent.command)
+            return False
 
-        except Exception as e:
-            logging.error(f"An error occurred while processing the alert for MT5: {e}")
+        plan = self.order_plan(mt5, intent.symbol)
+        tick = mt5.symbol_info_tick(intent.symbol) if intent.command == 'close' else None
+        if plan is None or (intent.command == 'close' and tick is None):
+            pipeline_logger.error("Failed to get symbol information for %s.", intent.symbol)
+            return False
 
-class WebSocketHandler(threading.Thread):
+        ok = True
+        for position in positions:
+            is_buy = position.type == mt5.POSITION_TYPE_BUY
+            if intent.command == 'close':
+                request = plan.close_request(
+                    mt5.ORDER_TYPE_SELL if is_buy else mt5.ORDER_TYPE_BUY,
+                    tick.bid if is_buy else tick.ask, position.volume, position.ticket
+                )
+            else:
+                offset_sl = intent.sl_pips * plan.point
+                offset_tp = intent.tp_pips * plan.point
+                request = {
+                    "action": mt5.TRADE_ACTION_SLTP,
+                    "symbol": intent.symbol,
+                    "position": position.ticket,
+                    "sl": position.price_open - offset_sl if is_buy else position.price_open + offset_sl,
+                    "tp": position.price_open + offset_tp if is_buy else position.price_open - offset_tp,
+                }
+            with pipeline_metrics.timer(self.strategy_name, 'order_send'):
+                result = mt5.order_send(request)
+            if result.retcode != mt5.TRADE_RETCODE_DONE:
+                ok = False
+                pipeline_logger.error("Failed to %s position %s: %s - %s", intent.command, position.ticket, result.retcode, result.comment)
+            else:
+                if intent.command == 'close':
+                    self.tickets.discard(position.ticket)
+                    exposure.closed(self.account, position.ticket)
+                pipeline_logger.info("Position %s on %s: %s done. Alert Name: %s", position.ticket, intent.symbol, intent.command, intent.name)
+        return ok
+
+class WebSocketHandler:
+    # One per running strategy. The socket itself lives on stream_manager's
+    # event loop and may be shared with other strategies on the same URL;
+    # alerts carrying this strategy's name are parsed there and arrive here,
+    # in order, on an alert queue worker.
     def __init__(self, strategy):
-        super().__init__()
         self.strategy = strategy
-        self.ws = None
-        self.daemon = True
-        self.mt5_conn = MT5Connection(strategy)
-        self.stop_event = threading.Event()
+        self.strategy_id = strategy.id
+        self.strategy_name = strategy.name
+        self.websocket_url = strategy.websocket_url
+        self.mt5_conn = MT5Connection(strategy, broker)
 
-    def run(self):
-        def on_message(ws, message):
-            try:
-                data = json.loads(message)
-                content = data.get("text", {}).get("content", {}).get("p", {})
-                alert_message = content.get("message")
-                alert_name = content.get("name")
-
-                if alert_message and alert_name:
-                    logging.info(f"Alert Name: {alert_name}")
-                    logging.info(f"Alert Message: {alert_message}")
-                    self.mt5_conn.process_alert(alert_message, alert_name)
-            except json.JSONDecodeError:
-                logging.warning("Received non-JSON message. Ignoring.")
-
-        def on_error(ws, error):
-            logging.error(f"WebSocket Error: {error}")
-
-        def on_close(ws, close_status_code, close_msg):
-            logging.debug("WebSocket connection closed")
-            logging.debug(f"Close Status Code: {close_status_code}")
-            logging.debug(f"Close Message    : {close_msg}")
-
-        def on_open(ws):
-            logging.info("WebSocket connection opened")
-
-            def run_ping():
-                while not self.stop_event.is_set():
-                    time.sleep(int(config['DEFAULT'].get('Ping_Interval', 30)))
-                    try:
-                        ping_message = {"type": "ping"}
-                        ws.send(json.dumps(ping_message))
-                    except Exception as e:
-                        logging.error(f"Failed to send ping: {e}")
-                        break
-
-            threading.Thread(target=run_ping, daemon=True).start()
-
-        self.ws = websocket.WebSocketApp(
-            self.strategy.websocket_url,
-            on_open=on_open,
-            on_message=on_message,
-            on_error=on_error,
-            on_close=on_close
-        )
+    def start(self):
+        stream_manager.subscribe(self.websocket_url, self.strategy_name, self.on_alert)
 
-        while not self.stop_event.is_set():
-            try:
-                self.ws.run_forever(
-                    sslopt={"cert_reqs": ssl.CERT_NONE}
-                )
-            except Exception as e:
-                logging.error(f"Unexpected error: {e}")
-                logging.info("Attempting to reconnect in 5 seconds...")
-                time.sleep(5)
+    def on_alert(self, intent, received_at):
+        ws_logger.info("Alert Name: %s", intent.name)
+        ws_logger.info("Alert: %s", intent)
+        self.mt5_conn.process_intent(intent, received_at)
 
     def stop(self):
-        self.stop_event.set()
-        if self.ws:
-            self.ws.close()
+        stream_manager.unsubscribe(self.websocket_url, self.strategy_name)
         self.mt5_conn.shutdown_mt5()
-        logging.info(f"WebSocket handler for strategy '{self.strategy.name}' stopped.")
+        ws_logger.info("WebSocket handler for strategy '%s' stopped.", self.mt5_conn.strategy_name)
+
+# Stage latencies and alert counters, served at /metrics
+pipeline_metrics = PipelineMetrics()
+
+# The trading pipeline, set up by start_pipeline()
+broker = None
+symbol_cache = None
+exposure = None
+alert_queues = None
+alert_dedup = None
+stream_manager = None
+journal = None
+reconciler = None
 
 # Dictionary to hold WebSocket handlers for each strategy
 websocket_handlers = {}
 
-# Initialize WebSocket handlers for existing strategies
-with app.app_context():
-    db.create_all()  # Ensures tables are created
-    strategies = Strategy.query.all()
-    for strategy in strategies:
-        if strategy.status == 'Active':
-            handler = WebSocketHandler(strategy)
-            handler.start()
-            websocket_handlers[strategy.id] = handler
+views = Blueprint('views', __name__, cli_group=None)
+
+def create_app(config_file=CONFIG_FILE):
+    global config, log_listener
+    config = load_config(config_file)
+
+    # =======================
+    # Logging Configuration
+    # =======================
+    # Levels per subsystem come from config.ini (Log_Level, Log_Levels); records
+    # are queued and written to disk by a background listener.
+    if log_listener is None:
+        log_listener = configure_logging(config)
+        atexit.register(log_listener.stop)  # Registered first, so it runs last and flushes everything
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your_secure_secret_key')  # Replace with a secure key
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///strategies.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    db.init_app(app)
+    if os.environ.get('FLASK_RUN_FROM_CLI'):
+        # Only the flask command needs 'flask db', and Alembic is slow to import
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    app.register_blueprint(views)
+    app.register_blueprint(api)  # JSON endpoints for trade tables and charts
+
+    # Performance pages are served from memory until a trade or strategy changes
+    page_cache.configure(
+        max_entries=int(config['DEFAULT'].get('Page_Cache_Entries', 256)),
+        max_bytes=int(config['DEFAULT'].get('Page_Cache_MB', 32)) * 1024 * 1024
+    )
+    page_cache.watch(data_versions, interval=float(config['DEFAULT'].get('Page_Cache_Poll_Interval', 1)))
+    pipeline_metrics.register_gauges('page_cache', page_cache.stats)
+
+    # No queries here: `flask db upgrade` builds the app before migrating.
+    # The engine runs prepare_database() once the schema is current.
+    with app.app_context():
+        configure_sqlite(db.engine, **sqlite_options(config))  # WAL and connection pragmas
+    return app
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+def prepare_database(app):
+    # Builds a new database from the models and stamps it with the latest
+    # migration; an existing one has to be at that migration already (flask
+    # db upgrade), as create_all() cannot add columns. Then builds the
+    # aggregates that databases from before strategy_stats and pnl_rollup lack.
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    scripts = ScriptDirectory(MIGRATIONS_DIR)
+    head = scripts.get_current_head()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            migration = MigrationContext.configure(connection)
+            if not inspect(connection).has_table('strategy'):
+                db.metadata.create_all(connection)
+                migration.stamp(scripts, head)
+                logger.info("Created a new database at schema revision %s.", head)
+            elif migration.get_current_revision() != head:
+                raise SchemaOutOfDate(f"The database schema is at revision {migration.get_current_revision()}, "
+                                      f"this version needs {head}. Run `flask db upgrade` first.")
+
+        if StrategyStats.query.first() is None and Trade.query.first() is not None:
+            rebuild_strategy_stats(db.session)
+        if PnlRollup.query.first() is None and Trade.query.first() is not None:
+            rebuild_rollups(db.session)
+            db.session.commit()
 
-# Ensure MT5 is shutdown gracefully on program exit
-def shutdown():
-    for handler in websocket_handlers.values():
-        if handler.ws:
-            handler.ws.close()
-        handler.mt5_conn.shutdown_mt5()
+def start_pipeline(app):
+    global broker, symbol_cache, exposure, alert_queues, alert_dedup, stream_manager, journal, reconciler
+    if broker is not None:
+        return
+    import MetaTrader5 as mt5
+    from stream_manager import StreamManager
+
+    # Single worker that owns the MT5 terminal session for every strategy
+    broker = ExecutionBroker(mt5, max_batch=int(config['DEFAULT'].get('Broker_Max_Batch', 32)))
+    broker.start()
+    pipeline_metrics.register_gauges('broker', broker.stats)
+
+    # Symbol metadata, FX conversion ticks and account balances shared by all strategies
+    symbol_cache = SymbolCache(
+        broker,
+        metadata_ttl=float(config['DEFAULT'].get('Symbol_Cache_TTL', 300)),
+        refresh_interval=float(config['DEFAULT'].get('Account_Refresh_Interval', 5))
+    )
+    symbol_cache.start()
+
+    # Open positions and today's profit per account, for the pre-trade risk limits
+    exposure = ExposureBook(
+        broker,
+        ORDER_MAGIC,
+        max_symbol_lots=float(config['DEFAULT'].get('Risk_Max_Symbol_Lots', 0)),
+        max_open_trades=int(config['DEFAULT'].get('Risk_Max_Open_Trades', 0)),
+        max_daily_loss=float(config['DEFAULT'].get('Risk_Max_Daily_Loss', 0)),
+        max_account_daily_loss=float(config['DEFAULT'].get('Risk_Max_Account_Daily_Loss', 0)),
+        sync_interval=float(config['DEFAULT'].get('Exposure_Sync_Interval', 5))
+    )
+    exposure.start()
+    pipeline_metrics.register_gauges('exposure', exposure.stats)
+
+    # Bounded per-strategy queues between the socket reader and order execution
+    alert_queues = AlertQueues(
+        maxsize=int(config['DEFAULT'].get('Alert_Queue_Size', 100)),
+        policy=config['DEFAULT'].get('Alert_Queue_Policy', 'drop-oldest'),
+        max_workers=int(config['DEFAULT'].get('Alert_Workers', 8)),
+        metrics=pipeline_metrics
+    )
+    pipeline_metrics.register_gauges('alert_queues', alert_queues.stats)
+
+    # Keys of recently processed alerts, so redelivered alerts are not traded twice
+    alert_dedup = AlertDeduplicator(
+        window=float(config['DEFAULT'].get('Alert_Dedup_Window', 300)),
+        max_entries=int(config['DEFAULT'].get('Alert_Dedup_Max_Entries', 10000))
+    )
+    pipeline_metrics.register_gauges('alert_dedup', alert_dedup.stats)
+
+    # Every strategy's WebSocket runs on this one event loop, with a shared heartbeat
+    stream_manager = StreamManager(
+        alert_queues,
+        ping_interval=int(config['DEFAULT'].get('Ping_Interval', 30)),
+        reconnect_delay=float(config['DEFAULT'].get('Reconnect_Delay', 1)),
+        max_reconnect_delay=float(config['DEFAULT'].get('Max_Reconnect_Delay', 60)),
+        max_missed_pongs=int(config['DEFAULT'].get('Max_Missed_Pongs', 2)),
+        idle_timeout=float(config['DEFAULT'].get('Stream_Idle_Timeout', 0)),
+        metrics=pipeline_metrics,
+        dedup_content_only=config['DEFAULT'].getboolean('Alert_Dedup_Content_Only', False)
+    )
+    stream_manager.start()
+    pipeline_metrics.register_gauges('streams', stream_manager.stats)
+
+    with app.app_context():
+        # Background writer for Trade rows, on its own engine
+        journal = TradeJournal(
+            db.engine.url,
+            sqlite_options=sqlite_options(config),
+            max_queue=int(config['DEFAULT'].get('Journal_Max_Queue', 10000)),
+            batch_size=int(config['DEFAULT'].get('Journal_Batch_Size', 200)),
+            flush_interval=float(config['DEFAULT'].get('Journal_Flush_Interval', 0.5)),
+            alert_retention=alert_dedup.window,
+            on_write=page_cache.invalidate
+        )
+        journal.start()
+        pipeline_metrics.register_gauges('journal', journal.stats)
+        alert_dedup.load(db.session)
+
+        # Realized profit, costs and closes from the terminal's deal history
+        reconciler = DealReconciler(
+            broker,
+            db.engine.url,
+            symbol_cache.registered_accounts,
+            ORDER_MAGIC,
+            interval=float(config['DEFAULT'].get('Deal_Sync_Interval', 10)),
+            grace=float(config['DEFAULT'].get('Deal_Sync_Grace', 30)),
+            sqlite_options=sqlite_options(config),
+            on_write=page_cache.invalidate
+        )
+        reconciler.start()
+        pipeline_metrics.register_gauges('reconciler', reconciler.stats)
+
+    # Ensure MT5 is shutdown gracefully on program exit
+    atexit.register(shutdown)
+
+def start_strategies(app, stop_event=None):
+    # Resume the strategies that were running when the app last stopped,
+    # unless the engine is told to stop meanwhile
+    with app.app_context():
+        for strategy in Strategy.query.filter_by(status='Active'):
+            if stop_event is not None and stop_event.is_set():
+                break
+            start_handler(strategy)
+    return len(websocket_handlers)
+
+def start_handler(strategy):
+    if strategy.id in websocket_handlers:
+        return False
+    handler = WebSocketHandler(strategy)
+    handler.start()
+    websocket_handlers[strategy.id] = handler
+    return True
+
+def stop_handler(strategy_id):
+    handler = websocket_handlers.pop(strategy_id, None)
+    if handler is not None:
+        handler.stop()
+    return handler is not None
+
+def handler_health():
+    # Stream health of every running strategy, by strategy id
+    return {
+        strategy_id: stream_manager.health(handler.websocket_url)
+        for strategy_id, handler in list(websocket_handlers.items())
+    }
+
+def queue_command(strategy_id, command):
+    # For the engine (engine.py) to apply; committed with the caller's changes
+    db.session.add(EngineCommand(strategy_id=strategy_id, command=command))
 
-atexit.register(shutdown)
+def engine_online():
+    status = db.session.get(EngineStatus, ENGINE_ROW)
+    stale_after = float(config['DEFAULT'].get('Engine_Stale_After', 10))
+    return status is not None and (datetime.utcnow() - status.heartbeat).total_seconds() < stale_after
+
+def data_versions():
+    # What the cached pages are built from, per strategy; the page cache
+    # polls this to notice trades written by the engine process
+    rows = db.session.execute(
+        select(Strategy.id, Strategy.updated_date, StrategyStats.updated_date, StrategyStats.last_trade_id)
+        .outerjoin(StrategyStats, StrategyStats.strategy_id == Strategy.id)
+    ).all()
+    return {strategy_id: tuple(versions) for strategy_id, *versions in rows}
+
+def shutdown():
+    if broker is not None:
+        stream_manager.stop()
+        alert_queues.stop()
+        for handler in websocket_handlers.values():
+            handler.mt5_conn.shutdown_mt5()
+        journal.stop()
+        reconciler.stop()
+        exposure.stop()
+        symbol_cache.stop()
+        broker.stop()
+
+@views.cli.command('init-db')
+def init_db_command():
+    """Create a new database, or check a migrated one and build missing aggregates."""
+    try:
+        prepare_database(current_app._get_current_object())
+    except SchemaOutOfDate as e:
+        raise click.ClickException(str(e))
+    print("Database ready.")
+
+@views.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the per-strategy performance aggregates and PnL rollups from the trade history."""
+    buckets = rebuild_rollups(db.session)
+    rebuilt = rebuild_strategy_stats(db.session)  # Commits both
+    print(f"Rebuilt performance aggregates for {len(rebuilt)} strategies and {buckets} PnL rollup buckets.")
+
+@views.cli.command('export-trades')
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--strategy', 'strategy_ids', type=int, multiple=True, help='Strategy id to export; repeat for several. All by default.')
+@click.option('--start', type=click.DateTime(), help='First trade time to include.')
+@click.option('--end', type=click.DateTime(), help='Trades before this time are included.')
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='File to write; standard output by default.')
+def export_trades_command(fmt, strategy_ids, start, end, output):
+    """Stream the trade history as CSV, JSON lines, Arrow or Parquet."""
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        raise click.UsageError(f'The {fmt} format needs pyarrow installed.')
+    for chunk in export_chunks(db.session, fmt, list(strategy_ids) or None, start, end):
+        output.write(chunk)
 
 # =======================
 # Flask Routes
 # =======================
 
-class StrategyForm(FlaskForm):
-    name = StringField('Strategy Name', validators=[DataRequired()])
-    risk_percentage = FloatField('Risk %', validators=[DataRequired(), NumberRange(min=0.1, max=100)])
-    mt5_id = StringField('MT5 ID', validators=[DataRequired()])
-    password = PasswordField('Password', validators=[DataRequired()])
-    server = StringField('Server', validators=[DataRequired()])
-    directory = StringField('Directory', validators=[DataRequired()])
-    websocket_url = StringField('WebSocket URL', validators=[DataRequired()])
-    commission = FloatField('Commission', validators=[DataRequired(), NumberRange(min=0)])
-    submit = SubmitField('Save')
-
-    def validate_name(self, field):
-        # Check if a strategy with the same name already exists (excluding current strategy if editing)
-        existing_strategy = Strategy.query.filter_by(name=field.data).first()
-        if existing_strategy and (not hasattr(self, 'strategy_id') or existing_strategy.id != self.strategy_id):
-            raise ValidationError('Strategy name already exists. Please choose a different name.')
-
-@app.route('/')
+@views.route('/')
 def dashboard():
-    strategies = Strategy.query.all()
-    performance_data = []
-    for strategy in strategies:
-        trades = Trade.query.filter_by(strategy_id=strategy.id).order_by(Trade.timestamp).all()
-        profits = [trade.profit for trade in trades]
-        total_profit = sum(profits)
-        total_trades = len(trades)
-        wins = len([p for p in profits if p > 0])
-        win_rate = (wins / total_trades * 100) if total_trades > 0 else 0
-        average_profit = (total_profit / total_trades) if total_trades > 0 else 0
-
-        # Calculate Drawdown %
-        equity_curve = []
-        current_equity = 0
-        max_equity = 0
-        for trade in trades:
-            current_equity += trade.profit
-            equity_curve.append(current_equity)
-            if current_equity > max_equity:
-                max_equity = current_equity
-        drawdown = 0
-        if equity_curve:
-            drawdown = max([max_equity - equity for equity in equity_curve])
-            drawdown_percentage = (drawdown / max_equity * 100) if max_equity > 0 else 0
-        else:
-            drawdown_percentage = 0
-
-        # Sharpe Ratio (Assuming risk-free rate = 0)
-        if total_trades > 1 and np.std(profits) != 0:
-            sharpe_ratio = (np.mean(profits) / np.std(profits)) * np.sqrt(total_trades)
-        else:
-            sharpe_ratio = 0
+    # The connection column is live, so only the aggregates are cached
+    rows = page_cache.memoize('dashboard', ALL, lambda: load_dashboard_stats(db.session))
+    strategies = [strategy for strategy, _ in rows]
 
-        # Sortino Ratio (Assuming risk-free rate = 0)
-        negative_returns = [p for p in profits if p < 0]
-        if len(negative_returns) > 0 and np.std(negative_returns) != 0:
-            sortino_ratio = (np.mean(profits) / np.std(negative_returns)) * np.sqrt(total_trades)
-        else:
-            sortino_ratio = 0
+    # Connection health as the engine last published it
+    online = engine_online()
+    health = {row.strategy_id: row for row in StreamHealth.query.all()} if online else {}
+    now = datetime.utcnow()
 
+    performance_data = []
+    for strategy, stats in rows:
+        stream = health.get(strategy.id)
         performance = {
             'strategy': strategy,
-            'total_profit': total_profit,
-            'total_trades': total_trades,
-            'win_rate': win_rate,
-            'average_profit': average_profit,
-            'drawdown_percentage': drawdown_percentage,
-            'sharpe_ratio': sharpe_ratio,
-            'sortino_ratio': sortino_ratio
+            'total_profit': stats.total_profit,
+            'total_trades': stats.trade_count,
+            'win_rate': stats.win_rate,
+            'average_profit': stats.average_profit,
+            'drawdown_percentage': stats.drawdown_percentage,
+            'sharpe_ratio': stats.sharpe_ratio,
+            'sortino_ratio': stats.sortino_ratio,
+            'connection': {
+                'state': stream.state,
+                'connected_since': stream.connected_since,
+                'last_message_age': (now - stream.last_message_at).total_seconds() if stream.last_message_at else None,
+                'reconnects': stream.reconnects,
+                'last_error': stream.last_error,
+            } if stream else None
         }
         performance_data.append(performance)
 
-    return render_template('dashboard.html', strategies=strategies, performance_data=performance_data)
+    return render_template('dashboard.html', strategies=strategies, performance_data=performance_data, engine_online=online)
 
-@app.route('/create', methods=['GET', 'POST'])
+@views.route('/create', methods=['GET', 'POST'])
 def create_strategy():
+    from forms import StrategyForm
     form = StrategyForm()
     if form.validate_on_submit():
         strategy = Strategy(
@@ -479,19 +755,21 @@ def create_strategy():
         db.session.add(strategy)
         try:
             db.session.commit()
+            page_cache.invalidate([strategy.id])
             flash('Strategy created successfully!', 'success')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('views.dashboard'))
         except IntegrityError:
             db.session.rollback()
             flash('Strategy name already exists. Please choose a different name.', 'danger')
         except Exception as e:
             db.session.rollback()
-            logging.error(f"Error creating strategy: {e}")
+            logger.error("Error creating strategy: %s", e)
             flash('An error occurred while creating the strategy.', 'danger')
     return render_template('edit_strategy.html', form=form, action='Create')
 
-@app.route('/edit/<int:strategy_id>', methods=['GET', 'POST'])
+@views.route('/edit/<int:strategy_id>', methods=['GET', 'POST'])
 def edit_strategy(strategy_id):
+    from forms import StrategyForm
     strategy = Strategy.query.get_or_404(strategy_id)
     form = StrategyForm(obj=strategy)
     form.strategy_id = strategy_id  # Pass strategy_id to the form for validation
@@ -507,209 +785,145 @@ def edit_strategy(strategy_id):
         strategy.commission = form.commission.data
         strategy.updated_date = datetime.utcnow()
 
+        # If strategy is active, the engine restarts its handler with the new settings
+        if strategy.status == 'Active':
+            queue_command(strategy.id, 'restart')
+
         try:
             db.session.commit()
-            # If strategy is active, restart the WebSocket handler
-            if strategy.status == 'Active':
-                handler = websocket_handlers.get(strategy.id)
-                if handler:
-                    handler.stop()
-                    websocket_handlers.pop(strategy.id, None)
-                new_handler = WebSocketHandler(strategy)
-                new_handler.start()
-                websocket_handlers[strategy.id] = new_handler
-
+            page_cache.invalidate([strategy.id])
             flash('Strategy updated successfully!', 'success')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('views.dashboard'))
         except IntegrityError:
             db.session.rollback()
             flash('Strategy name already exists. Please choose a different name.', 'danger')
         except Exception as e:
             db.session.rollback()
-            logging.error(f"Error updating strategy: {e}")
+            logger.error("Error updating strategy: %s", e)
             flash('An error occurred while updating the strategy.', 'danger')
 
     return render_template('edit_strategy.html', form=form, action='Edit')
 
-@app.route('/delete/<int:strategy_id>', methods=['POST'])
+@views.route('/delete/<int:strategy_id>', methods=['POST'])
 def delete_strategy(strategy_id):
     strategy = Strategy.query.get_or_404(strategy_id)
-    handler = websocket_handlers.pop(strategy.id, None)
-    if handler:
-        handler.stop()
+    queue_command(strategy.id, 'stop')
+    StrategyStats.query.filter_by(strategy_id=strategy.id).delete()
+    PnlRollup.query.filter_by(strategy_id=strategy.id).delete()
+    StreamHealth.query.filter_by(strategy_id=strategy.id).delete()
     db.session.delete(strategy)
     db.session.commit()
+    page_cache.invalidate([strategy_id])
     flash('Strategy deleted successfully!', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('views.dashboard'))
 
-@app.route('/run/<int:strategy_id>', methods=['POST'])
+@views.route('/run/<int:strategy_id>', methods=['POST'])
 def run_strategy(strategy_id):
     strategy = Strategy.query.get_or_404(strategy_id)
     if strategy.status == 'Active':
         flash('Strategy is already running.', 'warning')
-        return redirect(url_for('dashboard'))
-    
-    handler = WebSocketHandler(strategy)
-    handler.start()
-    websocket_handlers[strategy.id] = handler
+        return redirect(url_for('views.dashboard'))
 
-    # Update strategy status
+    # Update strategy status; the engine starts the handler
     strategy.status = 'Active'
     strategy.updated_date = datetime.utcnow()
+    queue_command(strategy.id, 'start')
     db.session.commit()
+    page_cache.invalidate([strategy.id])
 
-    flash(f"Strategy '{strategy.name}' started successfully.", 'success')
-    return redirect(url_for('dashboard'))
+    if engine_online():
+        flash(f"Strategy '{strategy.name}' started successfully.", 'success')
+    else:
+        flash(f"Strategy '{strategy.name}' will start once the trading engine is running (python engine.py).", 'warning')
+    return redirect(url_for('views.dashboard'))
 
-@app.route('/stop/<int:strategy_id>', methods=['POST'])
+@views.route('/stop/<int:strategy_id>', methods=['POST'])
 def stop_strategy(strategy_id):
     strategy = Strategy.query.get_or_404(strategy_id)
     if strategy.status == 'Inactive':
         flash('Strategy is already stopped.', 'warning')
-        return redirect(url_for('dashboard'))
-    
-    handler = websocket_handlers.get(strategy.id)
-    if handler:
-        handler.stop()
-        websocket_handlers.pop(strategy.id, None)
-    
-    # Update strategy status
+        return redirect(url_for('views.dashboard'))
+
+    # Update strategy status; the engine stops the handler
     strategy.status = 'Inactive'
     strategy.updated_date = datetime.utcnow()
+    queue_command(strategy.id, 'stop')
     db.session.commit()
+    page_cache.invalidate([strategy.id])
 
     flash(f"Strategy '{strategy.name}' stopped successfully.", 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('views.dashboard'))
 
-@app.route('/performance/<int:strategy_id>')
+@views.route('/performance/<int:strategy_id>')
+@page_cache.cached('strategy_id')
 def strategy_performance(strategy_id):
     # Fetch the strategy by ID
     strategy = Strategy.query.get_or_404(strategy_id)
-    
-    # Retrieve all trades associated with this strategy, ordered by timestamp
-    trades = Trade.query.filter_by(strategy_id=strategy.id).order_by(Trade.timestamp).all()
-    
-    # Calculate Total Profit
-    total_profit = sum(trade.profit for trade in trades)
-    
-    # Calculate Total Trades
-    total_trades = len(trades)
-    
-    # Calculate Win Rate
-    wins = len([trade for trade in trades if trade.profit > 0])
-    win_rate = (wins / total_trades * 100) if total_trades > 0 else 0
-    
-    # Calculate Average Profit per Trade
-    average_profit = (total_profit / total_trades) if total_trades > 0 else 0
-    
-    # Calculate Drawdown %
-    equity_curve = []
-    current_equity = 0
-    max_equity = 0
-    for trade in trades:
-        current_equity += trade.profit
-        equity_curve.append(current_equity)
-        if current_equity > max_equity:
-            max_equity = current_equity
-    drawdown = 0
-    if equity_curve:
-        drawdown = max([max_equity - equity for equity in equity_curve])
-        drawdown_percentage = (drawdown / max_equity * 100) if max_equity > 0 else 0
-    else:
-        drawdown_percentage = 0
 
-    # Sharpe Ratio (Assuming risk-free rate = 0)
-    if total_trades > 1 and np.std([trade.profit for trade in trades]) != 0:
-        sharpe_ratio = (np.mean([trade.profit for trade in trades]) / np.std([trade.profit for trade in trades])) * np.sqrt(total_trades)
-    else:
-        sharpe_ratio = 0
-
-    # Sortino Ratio (Assuming risk-free rate = 0)
-    negative_returns = [trade.profit for trade in trades if trade.profit < 0]
-    if len(negative_returns) > 0 and np.std(negative_returns) != 0:
-        sortino_ratio = (np.mean([trade.profit for trade in trades]) / np.std(negative_returns)) * np.sqrt(total_trades)
-    else:
-        sortino_ratio = 0
-
-    # Prepare data for the equity curve chart
-    equity_values = equity_curve
-    equity_timestamps = [trade.timestamp.strftime('%Y-%m-%d %H:%M') for trade in trades]
+    # Metrics for the chosen range come from the PnL rollups, one row per
+    # bucket; the trade table and equity chart are loaded from the API
+    resolution, start, end = rollup_query()
+    performance = summarize(load_rollups(db.session, strategy.id, resolution, start, end))
 
     return render_template(
         'strategy_performance.html',
         strategy=strategy,
-        total_profit=total_profit,
-        total_trades=total_trades,
-        win_rate=win_rate,
-        average_profit=average_profit,
-        drawdown_percentage=drawdown_percentage,
-        sharpe_ratio=sharpe_ratio,
-        sortino_ratio=sortino_ratio,
-        equity_values=equity_values,
-        equity_timestamps=equity_timestamps,
-        trades=trades
+        total_profit=performance.total_profit,
+        total_trades=performance.trade_count,
+        wins=performance.win_count,
+        win_rate=performance.win_rate,
+        average_profit=performance.average_profit,
+        drawdown_percentage=performance.drawdown_percentage,
+        sharpe_ratio=performance.sharpe_ratio,
+        sortino_ratio=performance.sortino_ratio,
+        profit_factor=performance.profit_factor,
+        expectancy=performance.expectancy,
+        resolutions=RESOLUTIONS,
+        resolution=resolution
     )
 
-@app.route('/portfolio')
+@views.route('/portfolio')
+@page_cache.cached()
 def portfolio_performance():
     strategies = Strategy.query.all()
-    strategy_ids = [s.id for s in strategies]
-    portfolio_trades = Trade.query.filter(Trade.strategy_id.in_(strategy_ids)).order_by(Trade.timestamp).all()
-    
-    profits = [trade.profit for trade in portfolio_trades]
-    total_profit = sum(profits)
-    total_trades = len(portfolio_trades)
-    wins = len([p for p in profits if p > 0])
-    win_rate = (wins / total_trades * 100) if total_trades > 0 else 0
-    average_profit = (total_profit / total_trades) if total_trades > 0 else 0
-
-    # Calculate Drawdown %
-    equity_curve = []
-    current_equity = 0
-    max_equity = 0
-    for trade in portfolio_trades:
-        current_equity += trade.profit
-        equity_curve.append(current_equity)
-        if current_equity > max_equity:
-            max_equity = current_equity
-    drawdown = 0
-    if equity_curve:
-        drawdown = max([max_equity - equity for equity in equity_curve])
-        drawdown_percentage = (drawdown / max_equity * 100) if max_equity > 0 else 0
-    else:
-        drawdown_percentage = 0
 
-    # Sharpe Ratio (Assuming risk-free rate = 0)
-    if total_trades > 1 and np.std(profits) != 0:
-        sharpe_ratio = (np.mean(profits) / np.std(profits)) * np.sqrt(total_trades)
-    else:
-        sharpe_ratio = 0
-
-    # Sortino Ratio (Assuming risk-free rate = 0)
-    negative_returns = [p for p in profits if p < 0]
-    if len(negative_returns) > 0 and np.std(negative_returns) != 0:
-        sortino_ratio = (np.mean(profits) / np.std(negative_returns)) * np.sqrt(total_trades)
-    else:
-        sortino_ratio = 0
-
-    # Prepare data for the equity curve chart
-    equity_values = equity_curve
-    equity_timestamps = [trade.timestamp.strftime('%Y-%m-%d %H:%M') for trade in portfolio_trades]
+    resolution, start, end = rollup_query()
+    performance = summarize(load_rollups(db.session, PORTFOLIO, resolution, start, end))
 
     return render_template(
         'portfolio_performance.html',
         strategies=strategies,
-        total_profit=total_profit,
-        total_trades=total_trades,
-        win_rate=win_rate,
-        average_profit=average_profit,
-        drawdown_percentage=drawdown_percentage,
-        sharpe_ratio=sharpe_ratio,
-        sortino_ratio=sortino_ratio,
-        equity_values=equity_values,
-        equity_timestamps=equity_timestamps,
-        trades=portfolio_trades
+        total_profit=performance.total_profit,
+        total_trades=performance.trade_count,
+        win_rate=performance.win_rate,
+        average_profit=performance.average_profit,
+        drawdown_percentage=performance.drawdown_percentage,
+        sharpe_ratio=performance.sharpe_ratio,
+        sortino_ratio=performance.sortino_ratio,
+        profit_factor=performance.profit_factor,
+        expectancy=performance.expectancy,
+        resolutions=RESOLUTIONS,
+        resolution=resolution
     )
 
+@views.route('/metrics')
+def metrics_endpoint():
+    return Response(pipeline_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    app = create_app()
+    debug = True
+    # With debug on, the reloader runs this file twice; only the child that
+    # serves requests runs the engine, so handlers never start twice.
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        try:
+            prepare_database(app)
+        except SchemaOutOfDate as e:
+            logger.error("%s", e)
+            sys.exit(1)
+        if config['DEFAULT'].getboolean('Embedded_Engine', True):
+            try:
+                start_engine(app, sys.modules[__name__])
+            except EngineAlreadyRunning as e:
+                logger.warning("%s Serving the web interface only.", e)
+    app.run(debug=debug)
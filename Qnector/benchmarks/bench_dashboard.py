@@ -0,0 +1,88 @@
+# benchmarks/bench_dashboard.py
+#
+# Checks that the dashboard's data access stays at a constant number of SQL
+# statements as strategies are added, and times it against the old
+# per-strategy Trade loads. Exits non-zero if the statement count grows.
+# Run from the Qnector directory:
+#
+#     python benchmarks/bench_dashboard.py --strategies 1 10 100
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from models import db, Strategy, Trade, configure_sqlite, count_queries
+from strategy_stats import load_dashboard_stats, rebuild_strategy_stats
+
+
+def populate(session, strategy_count, trades_per_strategy):
+    rng = random.Random(7)
+    now = datetime(2024, 1, 1)
+    session.execute(insert(Strategy), [
+        dict(id=i, name=f'strategy-{i}', risk_percentage=1, mt5_id='1', password='x', server='x',
+             directory='x', websocket_url='x', commission=4, created_date=now, updated_date=now, status='Inactive')
+        for i in range(1, strategy_count + 1)
+    ])
+    session.execute(insert(Trade), [
+        dict(strategy_id=i, trade_id=i * trades_per_strategy + n, symbol='EURUSD', action='BUY', volume=0.1,
+             price=1.1, sl=1.09, tp=1.12, profit=rng.gauss(5, 50), timestamp=now + timedelta(minutes=n))
+        for i in range(1, strategy_count + 1) for n in range(trades_per_strategy)
+    ])
+    session.commit()
+
+
+def legacy_dashboard(session):
+    for strategy in session.query(Strategy).all():
+        [trade.profit for trade in session.query(Trade).filter_by(strategy_id=strategy.id).order_by(Trade.timestamp).all()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the dashboard query count and time it.')
+    parser.add_argument('--strategies', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--trades', type=int, default=1000, help='trades per strategy')
+    args = parser.parse_args()
+
+    counts = {}
+    print(f"{'strategies':>10} {'mode':>12} {'statements':>11} {'ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for strategy_count in args.strategies:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, f'{strategy_count}.db')}")
+            configure_sqlite(engine)
+            db.metadata.create_all(engine)
+            with Session(engine) as session:
+                populate(session, strategy_count, args.trades)
+
+            cases = (
+                ('legacy', legacy_dashboard),
+                ('grouped', lambda session: load_dashboard_stats(session)),
+                ('aggregates', lambda session: load_dashboard_stats(session)),
+            )
+            for mode, func in cases:
+                if mode == 'aggregates':
+                    with Session(engine) as session:
+                        rebuild_strategy_stats(session)
+                with Session(engine) as session, count_queries(engine) as executed:
+                    started = time.perf_counter()
+                    func(session)
+                    elapsed = (time.perf_counter() - started) * 1000
+                counts.setdefault(mode, set()).add(len(executed))
+                print(f'{strategy_count:>10} {mode:>12} {len(executed):>11} {elapsed:>10.1f}')
+            engine.dispose()
+
+    for mode in ('grouped', 'aggregates'):
+        if len(counts[mode]) != 1:
+            print(f'FAIL: {mode} dashboard statement count varies with strategies: {sorted(counts[mode])}')
+            sys.exit(1)
+    print('OK: dashboard statement count is independent of the number of strategies')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_parser.py
+#
+# Times frame decoding plus alert parsing over a frame corpus: the old
+# json.loads/dict walk/split path against alert_parser with each available
+# JSON backend. Pass --corpus with a file of recorded frames, one per line;
+# without it a synthetic corpus in TradingView's format is generated, mostly
+# non-alert traffic as on a real pipe. Run from the Qnector directory:
+#
+#     python benchmarks/bench_parser.py --corpus frames.txt
+#     python benchmarks/bench_parser.py --frames 200000 --alert-ratio 0.1
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alert_parser import DECODERS, frame_decoder, parse_alert, AlertParseError
+from standin_server import alert_frame, random_alert
+
+
+def synthetic_corpus(count, alert_ratio, seed=7):
+    rng = random.Random(seed)
+    others = [
+        json.dumps({"type": "pong"}),
+        json.dumps({"text": {"channel": "private", "content": {"m": "heartbeat", "p": {"ts": 1712345678}}}}),
+        json.dumps({"text": {"channel": "private", "content": {"m": "quote_update",
+                    "p": {"symbol": "FX:EURUSD", "lp": 1.0843, "ch": 0.0012, "volume": 123456, "bid": 1.0842, "ask": 1.0844}}}}),
+    ]
+    corpus = []
+    for _ in range(count):
+        if rng.random() < alert_ratio:
+            corpus.append(alert_frame(f'strategy-{rng.randint(1, 20)}', random_alert(rng)))
+        else:
+            corpus.append(rng.choice(others))
+    return corpus
+
+
+def legacy(frame):
+    # The old on_message + process_alert parsing
+    data = json.loads(frame)
+    content = data.get("text", {}).get("content", {}).get("p", {})
+    alert_message = content.get("message")
+    alert_name = content.get("name")
+    if alert_message and alert_name:
+        parts = alert_message.strip().lower().split()
+        if len(parts) == 4:
+            action, symbol, sl_pips, tp_pips = parts
+            return action, symbol.upper(), float(sl_pips), float(tp_pips)
+    return None
+
+
+def fast_path(decode):
+    def parse(frame):
+        alert = decode(frame)
+        if alert is None:
+            return None
+        try:
+            return parse_alert(alert[1], alert[0])
+        except AlertParseError:
+            return None
+    return parse
+
+
+def best_of(func, corpus, repeat):
+    best = float('inf')
+    parsed = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parsed = sum(1 for frame in corpus if func(frame) is not None)
+        best = min(best, time.perf_counter() - started)
+    return best, parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark alert frame parsing.')
+    parser.add_argument('--corpus', help='file of recorded frames, one per line')
+    parser.add_argument('--frames', type=int, default=200000)
+    parser.add_argument('--alert-ratio', type=float, default=0.1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding='utf-8') as f:
+            corpus = [line.rstrip('\n') for line in f if line.strip()]
+    else:
+        corpus = synthetic_corpus(args.frames, args.alert_ratio)
+
+    cases = [('legacy', legacy)] + [(backend, fast_path(frame_decoder(backend))) for backend in DECODERS]
+    print(f'{len(corpus)} frames')
+    print(f"{'parser':>10} {'alerts':>8} {'ns/frame':>10} {'speedup':>9}")
+    baseline = None
+    for label, func in cases:
+        elapsed, parsed = best_of(func, corpus, args.repeat)
+        per_frame = elapsed / len(corpus) * 1e9
+        baseline = baseline or per_frame
+        print(f'{label:>10} {parsed:>8} {per_frame:>10.0f} {baseline / per_frame:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
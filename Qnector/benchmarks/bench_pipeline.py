@@ -0,0 +1,188 @@
+# benchmarks/bench_pipeline.py
+#
+# End-to-end throughput of the alert pipeline: replay server -> StreamManager
+# -> alert queues -> MT5Connection -> simulated terminal -> trade journal.
+# Each strategy count runs in its own process, in a scratch directory with
+# its own config.ini and database, against benchmarks/simulator/MetaTrader5.py,
+# so it runs anywhere the app's Python dependencies are installed. Reports
+# alerts/sec filled, p50/p99 alert-to-fill latency (frame sent to order
+# filled) and journal writes/sec, and exits non-zero if a run fills nothing.
+# Run from the Qnector directory:
+#
+#     python benchmarks/bench_pipeline.py --strategies 1 10 100 --rate 5 --fill-ms 2
+#     python benchmarks/bench_pipeline.py --frames frames.txt --reject-rate 0.05
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+QNECTOR_DIR = os.path.dirname(BENCH_DIR)
+SIMULATOR_DIR = os.path.join(BENCH_DIR, 'simulator')
+
+CONFIG = """[DEFAULT]
+Ping_Interval = 30
+Risk_Percentage = 1
+Commission = 4
+Alert_Workers = {workers}
+Alert_Queue_Size = {queue_size}
+Log_Level = WARNING
+Log_File = qnector.log
+"""
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def wait_until(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def run_one(args):
+    # Runs in the child process, inside its scratch directory
+    sys.path[:0] = [SIMULATOR_DIR, QNECTOR_DIR, BENCH_DIR]
+    from replay_server import ReplayServer, load_frames
+
+    server = ReplayServer(load_frames(args.frames) if args.frames else None, args.rate, track=True)
+    server.pause()
+    server_loop = asyncio.new_event_loop()
+    server_started = threading.Event()
+    threading.Thread(
+        target=server_loop.run_until_complete,
+        args=(server.serve_forever('127.0.0.1', args.port, server_started),),
+        daemon=True,
+    ).start()
+    server_started.wait(5)
+
+    import MetaTrader5
+    import app as qnector
+    from engine import start_engine
+    from models import Strategy, Trade
+
+    MetaTrader5.configure(fill_latency_ms=args.fill_ms, fill_jitter_ms=args.fill_jitter_ms, reject_rate=args.reject_rate)
+    app = qnector.create_app()
+    qnector.prepare_database(app)
+    count = args.child
+    urls = (count + args.per_url - 1) // args.per_url
+    with app.app_context():
+        names = [f'strategy-{i}' for i in range(count)]
+        for url_index in range(urls):
+            group = names[url_index * args.per_url:(url_index + 1) * args.per_url]
+            url = f"ws://127.0.0.1:{args.port}/{','.join(group)}"
+            for name in group:
+                qnector.db.session.add(Strategy(name=name, risk_percentage=1, mt5_id=str(url_index), password='x',
+                                            server='sim', directory='sim', websocket_url=url, commission=4,
+                                            status='Active'))
+        qnector.db.session.commit()
+        # As python engine.py would: the engine starts every Active strategy
+        start_engine(app, qnector)
+        if not wait_until(lambda: qnector.stream_manager.stats()['connected'] >= urls, 30):
+            print(json.dumps({'error': 'streams did not connect'}))
+            return
+
+        server.sending = True
+        started = time.perf_counter()
+        time.sleep(args.duration)
+        server.pause()
+        sent_for = time.perf_counter() - started
+
+        # Let the queues, the terminal and the journal catch up
+        wait_until(lambda: qnector.alert_queues.stats()['depth'] == 0, 60)
+        wait_until(lambda: qnector.journal.stats()['queue_depth'] == 0, 30)
+        time.sleep(qnector.journal.flush_interval * 2)
+
+        fills = MetaTrader5.terminal.fills
+        latencies = []
+        last_fill = started
+        for alert_key, order in qnector.db.session.query(Trade.alert_key, Trade.trade_id):
+            sent_at = server.sent_at.get(alert_key)
+            filled_at = fills.get(order)
+            if sent_at is not None and filled_at is not None:
+                latencies.append(filled_at - sent_at)
+                last_fill = max(last_fill, filled_at)
+        journal = qnector.journal.stats()
+        queues = qnector.alert_queues.stats()
+        elapsed = last_fill - started
+        print(json.dumps({
+            'strategies': count,
+            'connections': urls,
+            'sent': server.alerts,
+            'filled': len(latencies),
+            'rejected': MetaTrader5.terminal.rejects,
+            'dropped': queues['dropped'] + queues['rejected'],
+            'alerts_per_s': len(latencies) / elapsed if elapsed > 0 else 0.0,
+            'offered_per_s': server.alerts / sent_for,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'db_writes_per_s': (journal['rows_written'] + journal['alerts_written']) / elapsed if elapsed > 0 else 0.0,
+            'avg_commit_ms': journal['avg_commit_ms'],
+        }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the alert pipeline against a simulated MT5 terminal.')
+    parser.add_argument('--strategies', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--per-url', type=int, default=1, help='strategies sharing each pipe URL')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of alerts per run')
+    parser.add_argument('--rate', type=float, default=5.0, help='frames per second per connection')
+    parser.add_argument('--frames', help='recorded frames to replay (default: synthetic alerts)')
+    parser.add_argument('--fill-ms', type=float, default=1.0, help='simulated order_send latency')
+    parser.add_argument('--fill-jitter-ms', type=float, default=0.0)
+    parser.add_argument('--reject-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--queue-size', type=int, default=1000)
+    parser.add_argument('--port', type=int, default=8790)
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.frames:
+        args.frames = os.path.abspath(args.frames)
+
+    if args.child is not None:
+        run_one(args)
+        return
+
+    options = ['--per-url', args.per_url, '--duration', args.duration, '--rate', args.rate,
+               '--fill-ms', args.fill_ms, '--fill-jitter-ms', args.fill_jitter_ms,
+               '--reject-rate', args.reject_rate, '--port', args.port]
+    if args.frames:
+        options += ['--frames', args.frames]
+
+    print(f"{'strategies':>10} {'sent':>7} {'filled':>7} {'alerts/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'db writes/s':>12} {'commit ms':>10} {'rejected':>9} {'dropped':>8}")
+    failed = False
+    for count in args.strategies:
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'config.ini'), 'w') as f:
+                f.write(CONFIG.format(workers=args.workers, queue_size=args.queue_size))
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', str(count)] + [str(option) for option in options],
+                cwd=tmp, env=env, capture_output=True, text=True,
+                timeout=args.duration + 180,
+            )
+        lines = [line for line in child.stdout.splitlines() if line.startswith('{')]
+        result = json.loads(lines[-1]) if lines else {'error': child.stderr.strip().splitlines()[-1:] or 'no output'}
+        if 'error' in result or not result['filled']:
+            failed = True
+            print(f"{count:>10} failed: {result.get('error', 'no alerts filled')}")
+            continue
+        print(f"{count:>10} {result['sent']:>7} {result['filled']:>7} {result['alerts_per_s']:>9.1f} "
+              f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['db_writes_per_s']:>12.1f} "
+              f"{result['avg_commit_ms']:>10.2f} {result['rejected']:>9} {result['dropped']:>8}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
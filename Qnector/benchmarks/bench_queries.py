@@ -0,0 +1,123 @@
+# benchmarks/bench_queries.py
+#
+# Times the queries behind the dashboard, strategy and portfolio pages on a
+# synthetic strategies.db, with and without the trade indexes and the WAL /
+# cache pragmas. Run from the Qnector directory:
+#
+#     python benchmarks/bench_queries.py --sizes 10000 100000 1000000
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from models import db, Strategy, Trade, configure_sqlite
+
+SYMBOLS = ['EURUSD', 'GBPUSD', 'USDJPY', 'XAUUSD', 'EURJPY']
+
+
+def build_database(path, trade_count, strategy_count, with_indexes):
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    if not with_indexes:
+        with engine.begin() as conn:
+            conn.exec_driver_sql('DROP INDEX IF EXISTS ix_trade_strategy_id_timestamp')
+            conn.exec_driver_sql('DROP INDEX IF EXISTS ix_trade_trade_id')
+    engine.dispose()
+
+    rng = random.Random(42)
+    now = datetime(2024, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO strategy (id, name, risk_percentage, mt5_id, password, server, directory, websocket_url, '
+        'commission, created_date, updated_date, status) VALUES (?, ?, 1, "1", "x", "x", "x", "x", 4, ?, ?, "Inactive")',
+        [(i, f'strategy-{i}', now, now) for i in range(1, strategy_count + 1)]
+    )
+
+    def rows():
+        # Strategies interleave in time, like live trading
+        for i in range(trade_count):
+            yield (
+                rng.randint(1, strategy_count), i + 1, rng.choice(SYMBOLS), rng.choice(('BUY', 'SELL')),
+                0.1, 1.1, 1.09, 1.12, rng.gauss(5, 50), now + timedelta(minutes=i)
+            )
+
+    conn.executemany(
+        'INSERT INTO trade (strategy_id, trade_id, symbol, action, volume, price, sl, tp, profit, timestamp) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        rows()
+    )
+    conn.commit()
+    conn.close()
+
+
+def time_it(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def run_queries(path, trade_count, tuned, repeat):
+    engine = create_engine(f'sqlite:///{path}')
+    if tuned:
+        configure_sqlite(engine)
+
+    with Session(engine) as session:
+        strategy_ids = [s.id for s in session.query(Strategy).all()]
+
+        def dashboard():
+            for strategy_id in strategy_ids:
+                session.query(Trade).filter_by(strategy_id=strategy_id).order_by(Trade.timestamp).all()
+            session.expunge_all()
+
+        def strategy_page():
+            session.query(Trade).filter_by(strategy_id=strategy_ids[0]).order_by(Trade.timestamp).all()
+            session.expunge_all()
+
+        def portfolio():
+            session.query(Trade).filter(Trade.strategy_id.in_(strategy_ids)).order_by(Trade.timestamp).all()
+            session.expunge_all()
+
+        def lookup_by_ticket():
+            session.query(Trade).filter_by(trade_id=trade_count).first()
+
+        results = {
+            'dashboard': time_it(dashboard, repeat),
+            'strategy': time_it(strategy_page, repeat),
+            'portfolio': time_it(portfolio, repeat),
+            'trade_id lookup': time_it(lookup_by_ticket, repeat),
+        }
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the performance-page queries on a synthetic database.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--strategies', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'trades':>10} {'setup':>10} {'query':>16} {'best ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            for label, tuned in (('baseline', False), ('tuned', True)):
+                path = os.path.join(tmp, f'{label}-{size}.db')
+                build_database(path, size, args.strategies, with_indexes=tuned)
+                for query, elapsed in run_queries(path, size, tuned, args.repeat).items():
+                    print(f'{size:>10} {label:>10} {query:>16} {elapsed:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_startup.py
+#
+# Times `import app` and create_app() in fresh interpreters, lists the
+# slowest imports, and checks that none of the modules that should load
+# lazily (MetaTrader5, the WebSocket client, NumPy, SciPy, WTForms, Alembic, PyArrow)
+# were pulled in. Exits non-zero when the median startup is over --budget-ms
+# or a lazy module was imported. Run from the Qnector directory:
+#
+#     python benchmarks/bench_startup.py --runs 5 --budget-ms 800
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+QNECTOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = ('MetaTrader5', 'websockets', 'scipy', 'wtforms', 'alembic', 'pyarrow')
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {qnector!r})
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'loaded': [name for name in {lazy!r} if name in sys.modules],
+}}))
+"""
+
+
+def probe(tmp, env):
+    code = PROBE.format(qnector=QNECTOR_DIR, lazy=LAZY_MODULES)
+    result = subprocess.run([sys.executable, '-c', code], cwd=tmp, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(tmp, env, count):
+    code = f"import sys; sys.path.insert(0, {QNECTOR_DIR!r}); import app"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=tmp, env=env, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:  # direct imports of app and its siblings
+            rows.append((int(parts[1]), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check app import and create_app() time against a budget.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=800.0, help='median import + create_app() budget')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Scratch directory: create_app() writes config.ini, the log and the database there
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}")
+        runs = [probe(tmp, env) for _ in range(args.runs)]
+        slowest = slowest_imports(tmp, env, args.top)
+
+    import_ms = statistics.median(run['import_ms'] for run in runs)
+    create_ms = statistics.median(run['create_app_ms'] for run in runs)
+    total_ms = statistics.median(run['import_ms'] + run['create_app_ms'] for run in runs)
+    loaded = sorted({name for run in runs for name in run['loaded']})
+
+    print(f'import app:    {import_ms:8.1f} ms (median of {args.runs})')
+    print(f'create_app():  {create_ms:8.1f} ms')
+    print(f'total:         {total_ms:8.1f} ms, budget {args.budget_ms:.0f} ms')
+    print('slowest imports (cumulative):')
+    for micros, name in slowest:
+        print(f'  {micros / 1000:8.1f} ms  {name}')
+    if loaded:
+        print(f"loaded eagerly, should be lazy: {', '.join(loaded)}")
+    if total_ms > args.budget_ms or loaded:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_streams.py
+#
+# Subscribes many strategies through StreamManager against the local
+# stand-in server and reports connections, throughput, heartbeats and the
+# thread count, which should stay flat however many connections are open.
+# With --per-url N, N strategies share each pipe URL and so one connection;
+# --handler-ms simulates slow order execution behind the alert queues.
+# Run from the Qnector directory:
+#
+#     python benchmarks/bench_streams.py --strategies 500 --per-url 5 --duration 10
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stream_manager import StreamManager
+from alert_queue import AlertQueues, POLICIES
+from standin_server import StandinServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the WebSocket stream manager.')
+    parser.add_argument('--strategies', type=int, default=500)
+    parser.add_argument('--per-url', type=int, default=1, help='strategies sharing each pipe URL')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between alerts per connection')
+    parser.add_argument('--ping-interval', type=float, default=2.0)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--handler-ms', type=float, default=0.0, help='simulated execution time per alert')
+    parser.add_argument('--queue-size', type=int, default=100)
+    parser.add_argument('--policy', choices=POLICIES, default='drop-oldest')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    server = StandinServer(args.interval)
+    server_loop = asyncio.new_event_loop()
+    server_started = threading.Event()
+    threading.Thread(
+        target=server_loop.run_until_complete,
+        args=(server.serve_forever('127.0.0.1', args.port, server_started),),
+        daemon=True,
+    ).start()
+    server_started.wait(5)
+    threads_before = threading.active_count()
+
+    received = [0]
+    lock = threading.Lock()
+
+    def handler(intent, received_at):
+        if args.handler_ms:
+            time.sleep(args.handler_ms / 1000)
+        with lock:
+            received[0] += 1
+
+    queues = AlertQueues(args.queue_size, args.policy, args.workers)
+    manager = StreamManager(queues, ping_interval=args.ping_interval)
+    manager.start()
+    started = time.perf_counter()
+    urls = {}
+    for i in range(args.strategies):
+        urls.setdefault(i // args.per_url, []).append(f'strategy-{i}')
+    for names in urls.values():
+        url = f"ws://127.0.0.1:{args.port}/{','.join(names)}"
+        for name in names:
+            manager.subscribe(url, name, handler)
+    while manager.stats()['connected'] < len(urls) and time.perf_counter() - started < 30:
+        time.sleep(0.05)
+    connect_s = time.perf_counter() - started
+
+    time.sleep(args.duration)
+    stats = manager.stats()
+    queue_stats = queues.stats()
+    threads_during = threading.active_count()
+    manager.stop()
+    queues.stop(wait=False)
+
+    print(f"connections open:   {stats['connected']}/{len(urls)} for {stats['subscribers']} strategies in {connect_s:.2f} s")
+    print(f"alerts routed:      {received[0]} ({received[0] / args.duration:.0f}/s), unrouted {stats['unrouted']}")
+    print(f"alert queues:       depth {queue_stats['depth']}, dropped {queue_stats['dropped']}, "
+          f"rejected {queue_stats['rejected']}, wait avg {queue_stats['avg_wait_ms']:.1f} ms / max {queue_stats['max_wait_ms']:.1f} ms")
+    print(f"heartbeats at server: {server.pings}")
+    print(f"threads:            {threads_before} before, {threads_during} with all streams open")
+
+
+if __name__ == '__main__':
+    main()
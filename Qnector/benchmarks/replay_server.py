@@ -0,0 +1,160 @@
+# benchmarks/replay_server.py
+#
+# Records TradingView frames from a live pipe and replays them, or synthetic
+# alerts, to local connections at a fixed rate. As with standin_server, the
+# URL path names the strategies a connection carries
+# (ws://127.0.0.1:8765/<name>[,<name>...]); replayed alerts are re-addressed
+# to those names in turn and given a fresh fire id, so a short recording can
+# drive any number of strategies without tripping alert deduplication.
+# Run from the Qnector directory:
+#
+#     python benchmarks/replay_server.py record wss://pipe.example/... --out frames.txt --duration 600
+#     python benchmarks/replay_server.py serve --frames frames.txt --rate 20
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+
+from alert_parser import alert_key
+from standin_server import alert_frame, random_alert
+
+
+def load_frames(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+class ReplayServer:
+    def __init__(self, frames=None, rate=10.0, seed=7, track=False):
+        # frames: recorded frames to cycle through; None for synthetic alerts.
+        # rate: frames per second on each connection. With track=True the
+        # send time of every alert is kept in sent_at, by alert key.
+        self.frames = frames
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.track = track
+        self.sent_at = {}
+        self.fire_ids = itertools.count(1)
+        self.sending = True
+        self.connections = 0
+        self.sent = 0
+        self.alerts = 0
+        self.pings = 0
+
+    def pause(self):
+        self.sending = False
+
+    async def handle(self, connection):
+        names = unquote(connection.request.path.lstrip('/')).split(',')
+        self.connections += 1
+        sender = asyncio.create_task(self._send_frames(connection, names))
+        try:
+            async for message in connection:
+                if json.loads(message).get('type') == 'ping':
+                    self.pings += 1
+        except Exception:
+            pass
+        finally:
+            sender.cancel()
+            self.connections -= 1
+
+    def _next_frame(self, source, name):
+        # Returns (frame, key); key is None for frames that are not alerts
+        fire_id = next(self.fire_ids)
+        if source is None:
+            message = random_alert(self.rng)
+        else:
+            frame = next(source)
+            try:
+                payload = json.loads(frame)["text"]["content"]["p"]
+                message = payload["message"]
+            except (ValueError, KeyError, TypeError):
+                return frame, None
+        return alert_frame(name, message, fire_id), alert_key(name, message, str(fire_id))
+
+    async def _send_frames(self, connection, names):
+        loop = asyncio.get_running_loop()
+        source = itertools.cycle(self.frames) if self.frames else None
+        interval = 1.0 / self.rate
+        # Spread the first frame so many connections do not send in step
+        next_at = loop.time() + self.rng.random() * interval
+        for i in itertools.count():
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+            next_at += interval
+            if not self.sending:
+                continue
+            frame, key = self._next_frame(source, names[i % len(names)])
+            if key is not None:
+                self.alerts += 1
+                if self.track:
+                    self.sent_at[key] = time.perf_counter()
+            await connection.send(frame)
+            self.sent += 1
+
+    async def serve_forever(self, host, port, started=None):
+        async with serve(self.handle, host, port, ping_interval=None) as server:
+            if started is not None:
+                started.set()
+            await server.serve_forever()
+
+
+async def record(url, path, duration):
+    # Appends every frame received from url to path, one per line
+    count = 0
+    deadline = time.monotonic() + duration
+    with open(path, 'a', encoding='utf-8') as out:
+        async with connect(url) as connection:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    frame = await asyncio.wait_for(connection.recv(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if isinstance(frame, bytes):
+                    frame = frame.decode('utf-8')
+                out.write(frame.replace('\n', ' ') + '\n')
+                count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and replay TradingView alert frames.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    rec = commands.add_parser('record', help='save frames from a live pipe')
+    rec.add_argument('url')
+    rec.add_argument('--out', required=True)
+    rec.add_argument('--duration', type=float, default=60.0, help='seconds to record')
+    srv = commands.add_parser('serve', help='replay frames to local connections')
+    srv.add_argument('--frames', help='recorded frames, one per line (default: synthetic alerts)')
+    srv.add_argument('--rate', type=float, default=10.0, help='frames per second per connection')
+    srv.add_argument('--host', default='127.0.0.1')
+    srv.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        count = asyncio.run(record(args.url, args.out, args.duration))
+        print(f'recorded {count} frames to {args.out}')
+        return
+
+    server = ReplayServer(load_frames(args.frames) if args.frames else None, args.rate)
+    print(f'Replaying on ws://{args.host}:{args.port}/<name>[,<name>...] at {args.rate:g} frames/s per connection')
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f'sent={server.sent} alerts={server.alerts} pings={server.pings}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+# benchmarks/simulator/MetaTrader5.py
+#
+# Drop-in stand-in for the MetaTrader5 package, so the alert pipeline can be
+# exercised on Linux without a terminal or a broker. Put this directory first
+# on the path and `import MetaTrader5` resolves here:
+#
+#     PYTHONPATH=benchmarks/simulator python app.py
+#
+# Quotes follow a seeded random walk unless a tick file (symbol,bid,ask per
+# line, replayed in order per symbol) is given. order_send sleeps for the
+# configured fill latency and rejects a configurable share of orders. Options
+# come from configure() or, for a whole process, from QNECTOR_SIM_* variables:
+#
+#     QNECTOR_SIM_FILL_MS, QNECTOR_SIM_FILL_JITTER_MS, QNECTOR_SIM_REJECT_RATE,
+#     QNECTOR_SIM_TICKS, QNECTOR_SIM_BALANCE, QNECTOR_SIM_CURRENCY, QNECTOR_SIM_SEED
+import csv
+import itertools
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TYPE_BUY_LIMIT = 2
+ORDER_TYPE_SELL_LIMIT = 3
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_PENDING = 5
+TRADE_ACTION_SLTP = 6
+ORDER_TIME_GTC = 0
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+ORDER_FILLING_RETURN = 2
+DEAL_TYPE_BUY = 0
+DEAL_TYPE_SELL = 1
+DEAL_ENTRY_IN = 0
+DEAL_ENTRY_OUT = 1
+TRADE_RETCODE_REJECT = 10006
+TRADE_RETCODE_PLACED = 10008
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_FILL = 10030
+
+# symbol: (starting bid, digits)
+SYMBOLS = {
+    'EURUSD': (1.0850, 5), 'GBPUSD': (1.2650, 5), 'AUDUSD': (0.6550, 5),
+    'USDJPY': (151.20, 3), 'EURJPY': (163.90, 3), 'USDCHF': (0.9050, 5),
+    'USDCAD': (1.3600, 5), 'EURGBP': (0.8580, 5),
+}
+SPREAD_POINTS = 15
+
+
+class _Terminal:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.configure()
+
+    def configure(self, fill_latency_ms=0.0, fill_jitter_ms=0.0, reject_rate=0.0, ticks=None,
+                  balance=10000.0, currency='USD', seed=7):
+        with self.lock:
+            self.fill_latency = fill_latency_ms / 1000
+            self.fill_jitter = fill_jitter_ms / 1000
+            self.reject_rate = reject_rate
+            self.balance = balance
+            self.currency = currency
+            self.rng = random.Random(seed)
+            self.prices = {symbol: bid for symbol, (bid, _) in SYMBOLS.items()}
+            self.replay = {}
+            if ticks:
+                self.replay = _load_ticks(ticks)
+            self.tickets = itertools.count(1)
+            self.positions = {}
+            self.deals = []
+            self.fills = {}  # order ticket -> perf_counter when filled
+            self.orders = 0
+            self.rejects = 0
+            self.login = None
+
+    def tick(self, symbol):
+        if symbol not in SYMBOLS:
+            return None
+        with self.lock:
+            replay = self.replay.get(symbol)
+            if replay:
+                bid, ask = next(replay)
+            else:
+                point = 10 ** -SYMBOLS[symbol][1]
+                bid = self.prices[symbol] = round(self.prices[symbol] + self.rng.randint(-3, 3) * point, SYMBOLS[symbol][1])
+                ask = round(bid + SPREAD_POINTS * point, SYMBOLS[symbol][1])
+        now = time.time()
+        return SimpleNamespace(bid=bid, ask=ask, last=bid, time=int(now), time_msc=int(now * 1000))
+
+    def order_send(self, request):
+        delay = self.fill_latency + (self.rng.random() * self.fill_jitter if self.fill_jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        with self.lock:
+            self.orders += 1
+            if self.rng.random() < self.reject_rate:
+                self.rejects += 1
+                return _result(TRADE_RETCODE_REJECT, 'Request rejected', request)
+            ticket = next(self.tickets)
+            action = request.get('action')
+            if action == TRADE_ACTION_SLTP:
+                position = self.positions.get(request.get('position'))
+                if position is None:
+                    return _result(TRADE_RETCODE_INVALID, 'Position not found', request)
+                position.sl, position.tp = request.get('sl'), request.get('tp')
+                return _result(TRADE_RETCODE_DONE, 'Request executed', request)
+            if action == TRADE_ACTION_PENDING:
+                return _result(TRADE_RETCODE_PLACED, 'Request placed', request, order=ticket)
+            if request.get('symbol') not in SYMBOLS:
+                return _result(TRADE_RETCODE_INVALID, 'Invalid symbol', request)
+
+            closing = self.positions.pop(request.get('position'), None)
+            profit = 0.0
+            if closing is not None:
+                direction = 1 if closing.type == POSITION_TYPE_BUY else -1
+                profit = round((request['price'] - closing.price_open) * direction * closing.volume * 100000, 2)
+                self.balance += profit
+            else:
+                self.positions[ticket] = SimpleNamespace(
+                    ticket=ticket, symbol=request['symbol'], volume=request['volume'],
+                    type=POSITION_TYPE_BUY if request['type'] == ORDER_TYPE_BUY else POSITION_TYPE_SELL,
+                    price_open=request['price'], sl=request.get('sl'), tp=request.get('tp'),
+                    magic=request.get('magic', 0), comment=(request.get('comment') or '')[:31],
+                    time=int(time.time()), profit=0.0,
+                )
+            self.deals.append(SimpleNamespace(
+                ticket=ticket, order=ticket, position_id=closing.ticket if closing else ticket,
+                symbol=request['symbol'], volume=request['volume'], price=request['price'],
+                type=DEAL_TYPE_BUY if request['type'] == ORDER_TYPE_BUY else DEAL_TYPE_SELL,
+                entry=DEAL_ENTRY_OUT if closing else DEAL_ENTRY_IN, profit=profit,
+                commission=0.0, swap=0.0, magic=request.get('magic', 0),
+                comment=(request.get('comment') or '')[:31], time=int(time.time()),
+                time_msc=int(time.time() * 1000),
+            ))
+            self.fills[ticket] = time.perf_counter()
+            return _result(TRADE_RETCODE_DONE, 'Request executed', request, order=ticket, deal=ticket, profit=profit)
+
+
+def _load_ticks(path):
+    quotes = {}
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if len(row) >= 3 and row[0].upper() in SYMBOLS:
+                try:
+                    quotes.setdefault(row[0].upper(), []).append((float(row[1]), float(row[2])))
+                except ValueError:
+                    continue  # header or malformed line
+    return {symbol: itertools.cycle(rows) for symbol, rows in quotes.items()}
+
+
+def _result(retcode, comment, request, order=0, deal=0, profit=0.0):
+    return SimpleNamespace(retcode=retcode, comment=comment, order=order, deal=deal, profit=profit,
+                           volume=request.get('volume', 0.0), price=request.get('price', 0.0), request=request)
+
+
+terminal = _Terminal()
+if any(name.startswith('QNECTOR_SIM_') for name in os.environ):
+    terminal.configure(
+        fill_latency_ms=float(os.environ.get('QNECTOR_SIM_FILL_MS', 0)),
+        fill_jitter_ms=float(os.environ.get('QNECTOR_SIM_FILL_JITTER_MS', 0)),
+        reject_rate=float(os.environ.get('QNECTOR_SIM_REJECT_RATE', 0)),
+        ticks=os.environ.get('QNECTOR_SIM_TICKS'),
+        balance=float(os.environ.get('QNECTOR_SIM_BALANCE', 10000)),
+        currency=os.environ.get('QNECTOR_SIM_CURRENCY', 'USD'),
+        seed=int(os.environ.get('QNECTOR_SIM_SEED', 7)),
+    )
+configure = terminal.configure
+
+
+# ----- MetaTrader5 API -----
+
+def initialize(path=None, **kwargs):
+    return True
+
+
+def login(login, password=None, server=None, **kwargs):
+    terminal.login = login
+    return True
+
+
+def shutdown():
+    terminal.login = None
+
+
+def last_error():
+    return (1, 'Success')
+
+
+def account_info():
+    return SimpleNamespace(login=terminal.login, balance=terminal.balance, equity=terminal.balance,
+                           currency=terminal.currency, leverage=100)
+
+
+def symbol_info(symbol):
+    if symbol not in SYMBOLS:
+        return None
+    digits = SYMBOLS[symbol][1]
+    point = 10 ** -digits
+    return SimpleNamespace(
+        name=symbol, digits=digits, point=point, trade_tick_size=point, trade_contract_size=100000,
+        volume_min=0.01, volume_max=100.0, volume_step=0.01,
+        filling_mode=3,  # FOK and IOC bits; the real module has no names for them
+        visible=True, select=True,
+    )
+
+
+def symbol_select(symbol, enable=True):
+    return symbol in SYMBOLS
+
+
+def symbol_info_tick(symbol):
+    return terminal.tick(symbol)
+
+
+def order_send(request):
+    return terminal.order_send(request)
+
+
+def positions_get(symbol=None, ticket=None, **kwargs):
+    with terminal.lock:
+        positions = list(terminal.positions.values())
+    if symbol is not None:
+        positions = [position for position in positions if position.symbol == symbol]
+    if ticket is not None:
+        positions = [position for position in positions if position.ticket == ticket]
+    return tuple(positions)
+
+
+def history_deals_get(date_from=None, date_to=None, **kwargs):
+    with terminal.lock:
+        return tuple(terminal.deals)
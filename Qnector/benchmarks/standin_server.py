@@ -0,0 +1,88 @@
+# benchmarks/standin_server.py
+#
+# Local stand-in for the TradingView alert stream. Every connection gets
+# alerts in TradingView's frame format for the strategies named in the URL
+# path (ws://127.0.0.1:8765/<name>[,<name>...], names taken in turn, like one
+# private pipe shared by several alerts), and the server counts the
+# {"type": "ping"} heartbeats it receives. Run from the Qnector directory:
+#
+#     python benchmarks/standin_server.py --port 8765 --interval 1
+import argparse
+import asyncio
+import itertools
+import json
+import random
+from urllib.parse import unquote
+
+from websockets.asyncio.server import serve
+
+SYMBOLS = ('eurusd', 'gbpusd', 'usdjpy', 'eurjpy', 'audusd')
+
+
+def alert_frame(name, message, fire_id=None):
+    payload = {"name": name, "message": message}
+    if fire_id is not None:
+        payload["id"] = fire_id
+    return json.dumps({"text": {"content": {"p": payload}}})
+
+
+def random_alert(rng):
+    return f"{rng.choice(('buy', 'sell'))} {rng.choice(SYMBOLS)} {rng.randint(10, 50)} {rng.randint(20, 100)}"
+
+
+class StandinServer:
+    def __init__(self, interval=1.0, seed=7):
+        self.interval = interval
+        self.rng = random.Random(seed)
+        self.connections = 0
+        self.peak_connections = 0
+        self.sent = 0
+        self.pings = 0
+
+    async def handle(self, connection):
+        names = unquote(connection.request.path.lstrip('/')).split(',')
+        self.connections += 1
+        self.peak_connections = max(self.peak_connections, self.connections)
+        sender = asyncio.create_task(self._send_alerts(connection, names))
+        try:
+            async for message in connection:
+                if json.loads(message).get('type') == 'ping':
+                    self.pings += 1
+        except Exception:
+            pass
+        finally:
+            sender.cancel()
+            self.connections -= 1
+
+    async def _send_alerts(self, connection, names):
+        # Spread the first alert so hundreds of connections do not fire in step
+        await asyncio.sleep(self.rng.random() * self.interval)
+        for i in itertools.count():
+            self.sent += 1
+            await connection.send(alert_frame(names[i % len(names)], random_alert(self.rng), self.sent))
+            await asyncio.sleep(self.interval)
+
+    async def serve_forever(self, host, port, started=None):
+        async with serve(self.handle, host, port, ping_interval=None) as server:
+            if started is not None:
+                started.set()
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve fake TradingView alert streams.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between alerts per connection')
+    args = parser.parse_args()
+
+    server = StandinServer(args.interval)
+    print(f'Serving alerts on ws://{args.host}:{args.port}/<name>[,<name>...]')
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f'sent={server.sent} pings={server.pings} peak_connections={server.peak_connections}')
+
+
+if __name__ == '__main__':
+    main()
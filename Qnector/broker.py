@@ -0,0 +1,236 @@
+# broker.py
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+logger = logging.getLogger('qnector.broker')
+
+# The MetaTrader5 package talks to a single terminal per process, so every
+# call has to go through one worker that owns the session. Strategies hand
+# their work to the broker as jobs tagged with the account they need.
+MT5Account = namedtuple('MT5Account', ['login', 'password', 'server', 'path'])
+
+
+def account_for(strategy):
+    return MT5Account(int(strategy.mt5_id), strategy.password, strategy.server, strategy.directory)
+
+
+class BrokerError(Exception):
+    pass
+
+
+class NotLoggedIn(BrokerError):
+    # A background job's account was not the one logged in when its turn came
+    pass
+
+
+class _Job:
+    __slots__ = ('account', 'func', 'args', 'background', 'future', 'enqueued_at')
+
+    def __init__(self, account, func, args, background=False):
+        self.account = account
+        self.func = func
+        self.args = args
+        self.background = background
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+# Queue priorities: alerts before background work, and stop after both
+FOREGROUND, BACKGROUND, _LAST = 0, 1, 2
+_STOP = object()
+
+
+class ExecutionBroker(threading.Thread):
+    def __init__(self, mt5_module, max_batch=32, poll_interval=0.5):
+        super().__init__(name='mt5-broker')
+        self.daemon = True
+        self.mt5 = mt5_module
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+        self.jobs = queue.PriorityQueue()  # (priority, sequence, job)
+        self.sequence = itertools.count()  # Arrival order within a priority
+        self.closed = False  # Set by stop(); no job is accepted after it
+        self.submit_lock = threading.Lock()
+        self.current_path = None
+        self.current_account = None
+        self.stats_lock = threading.Lock()
+        self.counters = {
+            'jobs': 0,
+            'failed_jobs': 0,
+            'batches': 0,
+            'initializations': 0,
+            'logins': 0,
+            'queue_wait_total': 0.0,
+            'exec_total': 0.0,
+        }
+
+    # ----- public API -----
+
+    def submit(self, account, func, *args, background=False):
+        # func is called as func(mt5, *args) once the account's session is
+        # active. A background job (cache refreshes, syncs) waits behind every
+        # queued alert and never logs in: unless its account is already the
+        # one logged in, it fails with NotLoggedIn.
+        job = _Job(account, func, args, background)
+        with self.submit_lock:
+            if self.closed or not self.is_alive():
+                job.future.set_exception(BrokerError("Execution broker is not running."))
+                return job.future
+            self.jobs.put((BACKGROUND if background else FOREGROUND, next(self.sequence), job))
+        return job.future
+
+    def call(self, account, func, *args, timeout=None, background=False):
+        # A job still queued when timeout runs out is withdrawn and never
+        # runs; one already running finishes, but its result is lost.
+        future = self.submit(account, func, *args, background=background)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise BrokerError(f"MT5 job did not start within {timeout}s.") from None
+            logger.warning("MT5 job for account %s still running after %ss; its outcome is unknown.", account.login, timeout)
+            raise BrokerError(f"MT5 job did not finish within {timeout}s.") from None
+
+    def stop(self, timeout=5):
+        with self.submit_lock:
+            already_closed, self.closed = self.closed, True
+            if self.is_alive() and not already_closed:
+                self.jobs.put((_LAST, next(self.sequence), _STOP))
+        if self.is_alive():
+            self.join(timeout)
+        self._fail_pending()
+
+    def stats(self):
+        with self.stats_lock:
+            snapshot = dict(self.counters)
+        jobs = snapshot['jobs'] or 1
+        snapshot['avg_queue_wait_ms'] = snapshot['queue_wait_total'] / jobs * 1000
+        snapshot['avg_exec_ms'] = snapshot['exec_total'] / jobs * 1000
+        snapshot['queue_depth'] = self.jobs.qsize()
+        snapshot['current_login'] = self.current_account.login if self.current_account else None
+        return snapshot
+
+    # ----- worker -----
+
+    def run(self):
+        logger.info("MT5 execution broker started.")
+        stopping = False
+        while not stopping:
+            try:
+                first = self.jobs.get(timeout=self.poll_interval)[2]
+            except queue.Empty:
+                if self.closed:
+                    break  # stop() gave up waiting and already failed what was queued
+                continue
+            if first is _STOP:
+                break
+
+            batch = [first]
+            while len(batch) < self.max_batch:
+                try:
+                    job = self.jobs.get_nowait()[2]
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stopping = True
+                    break
+                batch.append(job)
+
+            for account, jobs in self._group(batch):
+                self._run_group(account, jobs)
+
+        self._fail_pending()
+        self._shutdown_terminal()
+        logger.info("MT5 execution broker stopped.")
+
+    def _fail_pending(self):
+        # Jobs still queued at shutdown would otherwise leave their callers waiting
+        while True:
+            try:
+                job = self.jobs.get_nowait()[2]
+            except queue.Empty:
+                return
+            if job is not _STOP and job.future.set_running_or_notify_cancel():
+                job.future.set_exception(BrokerError("Execution broker stopped."))
+
+    def _group(self, batch):
+        # Keep arrival order within an account, but serve the account that is
+        # already logged in first so a mixed batch costs at most one switch
+        # per distinct account.
+        groups = OrderedDict()
+        if self.current_account is not None:
+            groups[self.current_account] = []
+        for job in batch:
+            groups.setdefault(job.account, []).append(job)
+        return [(account, jobs) for account, jobs in groups.items() if jobs]
+
+    def _run_group(self, account, jobs):
+        if self.current_account != account and all(job.background for job in jobs):
+            # Nothing in this group is worth a login
+            for job in jobs:
+                if job.future.set_running_or_notify_cancel():
+                    job.future.set_exception(NotLoggedIn(f"MT5 account {account.login} is not logged in."))
+            return
+        try:
+            self._ensure_session(account)
+        except Exception as e:
+            failed = 0
+            for job in jobs:
+                if job.future.set_running_or_notify_cancel():
+                    job.future.set_exception(e)
+                    failed += 1
+            with self.stats_lock:
+                self.counters['failed_jobs'] += failed
+            return
+
+        with self.stats_lock:
+            self.counters['batches'] += 1
+
+        for job in jobs:
+            if not job.future.set_running_or_notify_cancel():
+                continue  # Its caller stopped waiting (see call)
+            started = time.perf_counter()
+            try:
+                result = job.func(self.mt5, *job.args)
+            except Exception as e:
+                job.future.set_exception(e)
+                failed = 1
+            else:
+                job.future.set_result(result)
+                failed = 0
+            finished = time.perf_counter()
+            with self.stats_lock:
+                self.counters['jobs'] += 1
+                self.counters['failed_jobs'] += failed
+                self.counters['queue_wait_total'] += started - job.enqueued_at
+                self.counters['exec_total'] += finished - started
+
+    def _ensure_session(self, account):
+        if self.current_path != account.path:
+            self._shutdown_terminal()
+            if not self.mt5.initialize(path=account.path):
+                raise BrokerError(f"Failed to initialize MT5 at {account.path}. Error code: {self.mt5.last_error()}")
+            self.current_path = account.path
+            with self.stats_lock:
+                self.counters['initializations'] += 1
+
+        if self.current_account != account:
+            self.current_account = None
+            if not self.mt5.login(account.login, password=account.password, server=account.server):
+                raise BrokerError(f"Failed to connect to MT5 account {account.login}. Error code: {self.mt5.last_error()}")
+            self.current_account = account
+            with self.stats_lock:
+                self.counters['logins'] += 1
+            logger.info("Connected to MT5 account %s on server %s.", account.login, account.server)
+
+    def _shutdown_terminal(self):
+        if self.current_path is not None:
+            self.mt5.shutdown()
+            logger.info("MT5 connection closed.")
+        self.current_path = None
+        self.current_account = None
@@ -0,0 +1,278 @@
+# engine.py
+#
+# The trading engine: the alert pipeline, every strategy's WebSocket handler
+# and MT5 connection, in one process. The web tier never touches them; its
+# run, stop, edit and delete routes queue commands in the engine_command
+# table, which the engine applies in order. Any number of web workers can
+# then run next to it:
+#
+#     python engine.py
+#     gunicorn -w 4 'app:create_app()'
+#
+# `python app.py` runs the same engine in a thread of the development server
+# (Embedded_Engine in config.ini), unless a standalone engine is already live.
+import atexit
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, EngineCommand, EngineStatus, Strategy, StreamHealth
+
+logger = logging.getLogger('qnector.engine')
+
+ENGINE_ROW = 1
+
+
+class EngineAlreadyRunning(RuntimeError):
+    pass
+
+
+class Engine(threading.Thread):
+    # pipeline is the app module that built flask_app (app, or __main__ when
+    # app.py runs as a script): its start_handler / stop_handler /
+    # handler_health act on the handlers this engine owns.
+    def __init__(self, flask_app, pipeline, poll_interval=0.5, heartbeat_interval=2.0, stale_after=10.0,
+                 command_retention=86400):
+        super().__init__(name='engine')
+        self.daemon = True
+        self.flask_app = flask_app
+        self.pipeline = pipeline
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.command_retention = command_retention
+        self.instance = uuid.uuid4().hex
+        self.stop_event = threading.Event()
+        self.lost = threading.Event()  # Set once another engine has taken the row
+        self.heartbeat_thread = None
+        self.stats_lock = threading.Lock()
+        self.counters = {'commands': 0, 'failures': 0, 'heartbeats': 0}
+
+    def claim(self):
+        # Take the engine row unless another engine's heartbeat is fresh.
+        # One upsert, so two engines starting together cannot both win.
+        now = datetime.utcnow()
+        values = dict(id=ENGINE_ROW, instance=self.instance, pid=os.getpid(), host=socket.gethostname(),
+                      started_date=now, heartbeat=now)
+        stmt = sqlite_insert(EngineStatus).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['id'],
+            set_=values,
+            where=EngineStatus.heartbeat < now - timedelta(seconds=self.stale_after),
+        )
+        with self.flask_app.app_context():
+            claimed = db.session.execute(stmt).rowcount == 1
+            db.session.commit()
+            if not claimed:
+                other = db.session.get(EngineStatus, ENGINE_ROW)
+                raise EngineAlreadyRunning(f'Another engine is running (pid {other.pid} on {other.host}).')
+        logger.info("Engine %s claimed (pid %d).", self.instance, os.getpid())
+
+    def stats(self):
+        with self.stats_lock:
+            return dict(self.counters)
+
+    def stop(self, timeout=10):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def start_heartbeat(self):
+        # A thread of its own, so that strategies starting up or a slow
+        # command never let the row go stale for another engine to claim
+        self.heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name='engine-heartbeat', daemon=True)
+        self.heartbeat_thread.start()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            with self.flask_app.app_context():
+                try:
+                    self.process_commands()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error("Engine cycle failed: %s", e)
+            self.stop_event.wait(self.poll_interval)
+        if self.heartbeat_thread is not None:
+            self.heartbeat_thread.join(self.heartbeat_interval + 5)
+        if self.lost.is_set():
+            # The engine that took over runs the strategies now
+            for strategy_id in list(self.pipeline.websocket_handlers):
+                self.pipeline.stop_handler(strategy_id)
+            logger.error("Engine stopped all strategies after losing the engine row.")
+        else:
+            self.release()
+        logger.info("Engine stopped.")
+
+    def _heartbeat_loop(self):
+        while not self.stop_event.is_set():
+            with self.flask_app.app_context():
+                try:
+                    self.heartbeat()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error("Engine heartbeat failed: %s", e)
+            self.stop_event.wait(self.heartbeat_interval)
+
+    def process_commands(self):
+        commands = db.session.scalars(
+            select(EngineCommand).where(EngineCommand.status == 'pending').order_by(EngineCommand.id)
+        ).all()
+        for command in commands:
+            try:
+                self.apply(command.command, command.strategy_id)
+                command.status = 'done'
+            except Exception as e:
+                command.status = 'failed'
+                command.error = str(e)[:500]
+                with self.stats_lock:
+                    self.counters['failures'] += 1
+                logger.error("Command %s for strategy %s failed: %s", command.command, command.strategy_id, e)
+            command.processed_date = datetime.utcnow()
+            db.session.commit()
+            with self.stats_lock:
+                self.counters['commands'] += 1
+
+    def apply(self, command, strategy_id):
+        # The strategy row is the desired state, so a command that arrives
+        # late or twice changes nothing: start only starts an Active strategy
+        # that is not running yet.
+        if command not in ('start', 'stop', 'restart'):
+            raise ValueError(f'Unknown command: {command}')
+        if command in ('stop', 'restart'):
+            if self.pipeline.stop_handler(strategy_id):
+                logger.info("Stopped strategy %s.", strategy_id)
+        if command in ('start', 'restart'):
+            strategy = db.session.get(Strategy, strategy_id)
+            if strategy is not None and strategy.status == 'Active' and self.pipeline.start_handler(strategy):
+                logger.info("Started strategy '%s'.", strategy.name)
+
+    def heartbeat(self):
+        now = datetime.utcnow()
+        owned = db.session.execute(
+            update(EngineStatus)
+            .where(EngineStatus.id == ENGINE_ROW, EngineStatus.instance == self.instance)
+            .values(heartbeat=now)
+        ).rowcount
+        if not owned:
+            db.session.rollback()
+            logger.error("Another engine has taken over the engine row. Stopping this engine.")
+            self.lost.set()
+            self.stop_event.set()
+            return
+
+        health = self.pipeline.handler_health()
+        rows = [
+            dict(strategy_id=strategy_id, state=stream['state'], connected_since=stream['connected_since'],
+                 last_message_at=(now - timedelta(seconds=stream['last_message_age'])
+                                  if stream['last_message_age'] is not None else None),
+                 reconnects=stream['reconnects'], last_error=(stream['last_error'] or '')[:500] or None,
+                 updated_date=now)
+            for strategy_id, stream in health.items() if stream is not None
+        ]
+        db.session.execute(delete(StreamHealth).where(StreamHealth.strategy_id.not_in([row['strategy_id'] for row in rows])))
+        if rows:
+            stmt = sqlite_insert(StreamHealth)
+            columns = ('state', 'connected_since', 'last_message_at', 'reconnects', 'last_error', 'updated_date')
+            db.session.execute(
+                stmt.on_conflict_do_update(index_elements=['strategy_id'], set_={c: stmt.excluded[c] for c in columns}),
+                rows,
+            )
+        db.session.execute(
+            delete(EngineCommand).where(
+                EngineCommand.status != 'pending',
+                EngineCommand.created_date < now - timedelta(seconds=self.command_retention),
+            )
+        )
+        db.session.commit()
+        with self.stats_lock:
+            self.counters['heartbeats'] += 1
+
+    def release(self):
+        with self.flask_app.app_context():
+            released = db.session.execute(
+                delete(EngineStatus).where(EngineStatus.id == ENGINE_ROW, EngineStatus.instance == self.instance)
+            ).rowcount
+            if released:
+                db.session.execute(delete(StreamHealth))
+            db.session.commit()
+
+
+def start_engine(flask_app, pipeline):
+    # Claim, start the alert pipeline and the Active strategies, then apply
+    # commands in the background. Raises EngineAlreadyRunning.
+    config = pipeline.config['DEFAULT']
+    engine = Engine(
+        flask_app,
+        pipeline,
+        poll_interval=float(config.get('Engine_Poll_Interval', 0.5)),
+        heartbeat_interval=float(config.get('Engine_Heartbeat_Interval', 2)),
+        stale_after=float(config.get('Engine_Stale_After', 10)),
+    )
+    engine.claim()
+    engine.start_heartbeat()
+    pipeline.start_pipeline(flask_app)
+    started = pipeline.start_strategies(flask_app, engine.stop_event)
+    pipeline.pipeline_metrics.register_gauges('engine', engine.stats)
+    engine.start()
+    atexit.register(engine.stop)  # Before the pipeline's own shutdown, which was registered first
+    logger.info("Engine running with %d strategies.", started)
+    return engine
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(pipeline, port):
+    # The pipeline's /metrics, which only this process can see
+    def metrics_app(environ, start_response):
+        if environ.get('PATH_INFO') != '/metrics':
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'Not Found']
+        start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4')])
+        return [pipeline.pipeline_metrics.render_prometheus().encode()]
+
+    server = make_server('127.0.0.1', port, metrics_app, handler_class=_QuietHandler)
+    threading.Thread(target=server.serve_forever, name='engine-metrics', daemon=True).start()
+    logger.info("Engine metrics on http://127.0.0.1:%d/metrics", port)
+    return server
+
+
+def main():
+    import app as pipeline
+
+    flask_app = pipeline.create_app()
+    try:
+        pipeline.prepare_database(flask_app)
+        engine = start_engine(flask_app, pipeline)
+    except (pipeline.SchemaOutOfDate, EngineAlreadyRunning) as e:
+        logger.error("%s", e)
+        sys.exit(1)
+
+    port = int(pipeline.config['DEFAULT'].get('Engine_Metrics_Port', 9108))
+    if port:
+        serve_metrics(pipeline, port)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: engine.stop_event.set())
+    try:
+        while engine.is_alive():
+            engine.join(1)
+    except KeyboardInterrupt:
+        pass
+    engine.stop()  # The pipeline itself shuts down at exit
+    if engine.lost.is_set():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# export.py
+import csv
+import importlib.util
+import io
+import json
+
+from sqlalchemy import select
+
+from models import Strategy, Trade
+
+EXPORT_COLUMNS = (
+    Trade.id, Trade.trade_id, Trade.strategy_id, Strategy.name.label('strategy'), Trade.symbol, Trade.action,
+    Trade.volume, Trade.price, Trade.sl, Trade.tp, Trade.profit, Trade.commission, Trade.swap,
+    Trade.close_price, Trade.close_time, Trade.timestamp, Trade.alert_key,
+)
+FIELDS = tuple(column.key for column in EXPORT_COLUMNS)
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+COLUMNAR_FORMATS = ('arrow', 'parquet')  # Need pyarrow
+
+
+def columnar_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def trade_batches(session, strategy_ids=None, start=None, end=None, batch_size=5000):
+    # Trades in (timestamp, id) order, batch_size rows at a time from a
+    # streaming cursor, so memory does not grow with the history
+    query = select(*EXPORT_COLUMNS).join(Strategy, Strategy.id == Trade.strategy_id)
+    if strategy_ids is not None:
+        query = query.where(Trade.strategy_id.in_(strategy_ids))
+    if start is not None:
+        query = query.where(Trade.timestamp >= start)
+    if end is not None:
+        query = query.where(Trade.timestamp < end)
+    query = query.order_by(Trade.timestamp, Trade.id).execution_options(yield_per=batch_size)
+    yield from session.execute(query).partitions()
+
+
+def export_chunks(session, fmt, strategy_ids=None, start=None, end=None, batch_size=5000):
+    # The export as a stream of bytes chunks, one per batch of trades
+    batches = trade_batches(session, strategy_ids, start, end, batch_size)
+    if fmt == 'csv':
+        return _csv_chunks(batches)
+    if fmt == 'jsonl':
+        return _jsonl_chunks(batches)
+    if fmt in COLUMNAR_FORMATS:
+        return _columnar_chunks(batches, fmt)
+    raise ValueError(f'Unknown export format: {fmt}')
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # Header only; there were no trades
+
+
+def _jsonl_chunks(batches):
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(FIELDS, row)), default=_isoformat) + '\n' for row in rows).encode()
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+class _Sink:
+    # Write-only file for the Arrow writers that keeps just the bytes not yet
+    # sent; tell() still counts everything, as Parquet's footer offsets need.
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _columnar_chunks(batches, fmt):
+    # One Arrow record batch, or Parquet row group, per batch of trades
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ('id', pa.int64()), ('trade_id', pa.int64()), ('strategy_id', pa.int64()), ('strategy', pa.string()),
+        ('symbol', pa.string()), ('action', pa.string()), ('volume', pa.float64()), ('price', pa.float64()),
+        ('sl', pa.float64()), ('tp', pa.float64()), ('profit', pa.float64()), ('commission', pa.float64()),
+        ('swap', pa.float64()), ('close_price', pa.float64()), ('close_time', pa.timestamp('us')),
+        ('timestamp', pa.timestamp('us')), ('alert_key', pa.string()),
+    ])
+    sink = _Sink()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+
+    for rows in batches:
+        columns = zip(*rows)
+        writer.write_batch(pa.record_batch(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+        ))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
@@ -0,0 +1,285 @@
+# exposure.py
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from broker import NotLoggedIn
+
+logger = logging.getLogger('qnector.risk')
+
+EPSILON = 1e-9  # Lots are floats; 0.1 + 0.2 must not breach a 0.3 cap
+
+
+class _Position:
+    __slots__ = ('strategy_id', 'symbol', 'volume', 'profit')
+
+    def __init__(self, strategy_id, symbol, volume, profit=0.0):
+        self.strategy_id = strategy_id  # None when no running strategy claims it
+        self.symbol = symbol
+        self.volume = volume
+        self.profit = profit  # Floating profit as of the last sync
+
+
+class _Account:
+    # What one MT5 account has open under our magic number, with the totals
+    # the limits are checked against kept up to date as positions come and go
+    def __init__(self):
+        self.positions = {}     # ticket -> _Position
+        self.symbol_lots = {}   # symbol -> open lots, all strategies
+        self.open_trades = {}   # strategy_id -> open positions
+        self.floating = {}      # strategy_id -> floating profit
+        self.realized = {}      # strategy_id -> today's realized profit, after costs
+        self.account_realized = 0.0
+        self.day = None
+
+    def add(self, ticket, position):
+        self.positions[ticket] = position
+        self.symbol_lots[position.symbol] = self.symbol_lots.get(position.symbol, 0.0) + position.volume
+        self.open_trades[position.strategy_id] = self.open_trades.get(position.strategy_id, 0) + 1
+        self.floating[position.strategy_id] = self.floating.get(position.strategy_id, 0.0) + position.profit
+
+    def remove(self, ticket):
+        position = self.positions.pop(ticket, None)
+        if position is None:
+            return None
+        self.symbol_lots[position.symbol] -= position.volume
+        self.open_trades[position.strategy_id] -= 1
+        self.floating[position.strategy_id] -= position.profit
+        return position
+
+
+class ExposureBook:
+    # Open positions, lots per symbol and today's profit of every account the
+    # running strategies trade, held in memory so the pre-trade limits cost a
+    # few dict lookups instead of a positions_get round trip per alert. The
+    # alert path updates the book from its own fills and closes; every
+    # sync_interval, if its account is the one logged in, it is rebuilt from
+    # the terminal's positions and today's deals through the execution broker, which corrects anything it missed
+    # (stop losses, take profits, manual closes, pending orders that filled)
+    # and brings in floating and realized profit.
+    #
+    # A limit of 0 is off. max_symbol_lots caps the lots open on one symbol
+    # across the account, max_open_trades the positions of one strategy, and
+    # max_daily_loss / max_account_daily_loss how far a strategy / the
+    # account may be down today (UTC), realized plus floating, before new
+    # orders are refused.
+    def __init__(self, broker, magic, max_symbol_lots=0.0, max_open_trades=0, max_daily_loss=0.0,
+                 max_account_daily_loss=0.0, sync_interval=5.0):
+        self.broker = broker
+        self.magic = magic
+        self.max_symbol_lots = max_symbol_lots
+        self.max_open_trades = max_open_trades
+        self.max_daily_loss = max_daily_loss
+        self.max_account_daily_loss = max_account_daily_loss
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.accounts = {}     # account -> _Account
+        self.strategies = {}   # account -> running strategy ids
+        self.owners = {}       # account -> {position ticket: (strategy_id, day claimed)}
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.counters = {
+            'checks': 0,
+            'rejected_symbol_lots': 0,
+            'rejected_open_trades': 0,
+            'rejected_daily_loss': 0,
+            'rejected_account_daily_loss': 0,
+            'syncs': 0,
+            'sync_failures': 0,
+            'positions_corrected': 0,
+            'last_sync_ms': 0.0,
+        }
+
+    # ----- strategies -----
+
+    # Positions and deals belong to the strategy that claimed their position
+    # ticket, as in manage_positions, never to one whose order comment looks
+    # alike. Unclaimed ones stay unassigned and only count towards the
+    # symbol and account limits.
+
+    def register(self, account, strategy_id, tickets=()):
+        # tickets: the strategy's positions from the trade table that can
+        # still count today, i.e. open or closed since midnight UTC
+        with self.lock:
+            self.strategies.setdefault(account, set()).add(strategy_id)
+            self.accounts.setdefault(account, _Account())
+            self._claim(account, strategy_id, tickets)
+
+    def unregister(self, account, strategy_id):
+        with self.lock:
+            strategies = self.strategies.get(account, set())
+            strategies.discard(strategy_id)
+            if not strategies:
+                self.strategies.pop(account, None)
+                self.accounts.pop(account, None)
+                self.owners.pop(account, None)
+            elif account in self.owners:
+                self.owners[account] = {
+                    ticket: owner for ticket, owner in self.owners[account].items() if owner[0] != strategy_id
+                }
+
+    def claim(self, account, strategy_id, ticket):
+        # A pending order was placed; its position will carry its ticket
+        with self.lock:
+            if account in self.accounts:
+                self._claim(account, strategy_id, (ticket,))
+
+    # ----- the alert path (called from inside broker jobs) -----
+
+    def check(self, account, strategy_id, symbol, volume):
+        # None if an order for volume lots may go out, else why not
+        with self.lock:
+            self.counters['checks'] += 1
+            book = self.accounts.get(account)
+            if book is None:
+                return None
+            self._roll_day(book)
+
+            if self.max_open_trades and book.open_trades.get(strategy_id, 0) >= self.max_open_trades:
+                return self._reject('open_trades', f'{book.open_trades[strategy_id]} trades already open '
+                                                   f'(limit {self.max_open_trades})')
+            lots = book.symbol_lots.get(symbol, 0.0)
+            if self.max_symbol_lots and lots + volume > self.max_symbol_lots + EPSILON:
+                return self._reject('symbol_lots', f'{lots:g} lots of {symbol} open, {volume:g} more would exceed '
+                                                   f'{self.max_symbol_lots:g}')
+            if self.max_daily_loss:
+                pnl = book.realized.get(strategy_id, 0.0) + book.floating.get(strategy_id, 0.0)
+                if pnl <= -self.max_daily_loss:
+                    return self._reject('daily_loss', f'strategy is down {-pnl:.2f} today (limit {self.max_daily_loss:g})')
+            if self.max_account_daily_loss:
+                pnl = book.account_realized + sum(book.floating.values())
+                if pnl <= -self.max_account_daily_loss:
+                    return self._reject('account_daily_loss', f'account is down {-pnl:.2f} today '
+                                                              f'(limit {self.max_account_daily_loss:g})')
+            return None
+
+    def opened(self, account, strategy_id, ticket, symbol, volume):
+        # A market order filled; its order ticket is the position ticket
+        with self.lock:
+            book = self.accounts.get(account)
+            if book is None:
+                return
+            self._claim(account, strategy_id, (ticket,))
+            if ticket not in book.positions:
+                book.add(ticket, _Position(strategy_id, symbol, volume))
+
+    def closed(self, account, ticket):
+        # Its last known profit stands in as realized until the next sync
+        # reads the closing deal
+        with self.lock:
+            book = self.accounts.get(account)
+            if book is None:
+                return
+            position = book.remove(ticket)
+            if position is not None:
+                self._roll_day(book)
+                book.realized[position.strategy_id] = book.realized.get(position.strategy_id, 0.0) + position.profit
+                book.account_realized += position.profit
+
+    # ----- reconciliation with the terminal -----
+
+    def sync_account(self, mt5, account):
+        # Runs inside the broker with account logged in
+        positions = mt5.positions_get()
+        if positions is None:
+            raise RuntimeError(f'positions_get failed: {mt5.last_error()}')
+        # Aware datetimes: MetaTrader5 shifts naive ones by the local time zone
+        day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        day_start_msc = int(day.timestamp() * 1000)
+        deals = mt5.history_deals_get(day, datetime.now(timezone.utc) + timedelta(days=1)) or ()
+        magic = self.magic
+
+        with self.lock:
+            book = self.accounts.get(account)
+            if book is None:
+                return 0
+            owners = self.owners.get(account, {})
+            seen = set()
+
+            fresh = _Account()
+            for position in positions:
+                if position.magic != magic:
+                    continue
+                seen.add(position.ticket)
+                strategy_id = owners.get(position.ticket, (None, None))[0]
+                fresh.add(position.ticket, _Position(strategy_id, position.symbol, position.volume, position.profit))
+
+            fresh.day = day.date()
+            for deal in deals:
+                if deal.magic != magic or deal.time_msc < day_start_msc:
+                    continue
+                seen.add(deal.position_id)
+                strategy_id = owners.get(deal.position_id, (None, None))[0]
+                profit = deal.profit + deal.commission + deal.swap
+                fresh.realized[strategy_id] = fresh.realized.get(strategy_id, 0.0) + profit
+                fresh.account_realized += profit
+
+            corrected = len(book.positions.keys() ^ fresh.positions.keys())
+            self.accounts[account] = fresh
+            # Drop tickets claimed on an earlier day with no position or deal
+            # today. That includes a pending order still unfilled since then,
+            # whose position will be unassigned when it fills.
+            self.owners[account] = {
+                ticket: owner for ticket, owner in owners.items() if owner[1] == fresh.day or ticket in seen
+            }
+            self.counters['positions_corrected'] += corrected
+        if corrected:
+            logger.info("Exposure book for MT5 account %s corrected by %d position(s).", account.login, corrected)
+        return corrected
+
+    def sync(self):
+        started = time.perf_counter()
+        with self.lock:
+            accounts = list(self.strategies)
+        for account in accounts:
+            try:
+                self.broker.call(account, self.sync_account, account, timeout=self.sync_interval * 2, background=True)
+            except NotLoggedIn:
+                pass  # Synced while its account is logged in, which it is for every alert
+            except Exception as e:
+                with self.lock:
+                    self.counters['sync_failures'] += 1
+                logger.warning("Exposure sync for MT5 account %s failed: %s", account.login, e)
+        with self.lock:
+            self.counters['syncs'] += 1
+            self.counters['last_sync_ms'] = (time.perf_counter() - started) * 1000
+
+    def start(self):
+        self.thread = threading.Thread(target=self._sync_loop, name='exposure-book', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(self.sync_interval)
+
+    def stats(self):
+        with self.lock:
+            snapshot = dict(self.counters)
+            snapshot['accounts'] = len(self.accounts)
+            snapshot['positions'] = sum(len(book.positions) for book in self.accounts.values())
+        return snapshot
+
+    def _sync_loop(self):
+        self.sync()  # Positions left open by an earlier run count from the start
+        while not self.stop_event.wait(self.sync_interval):
+            self.sync()
+
+    def _roll_day(self, book):
+        # Today's realized profit starts over at midnight UTC
+        today = datetime.utcnow().date()
+        if book.day != today:
+            book.day = today
+            book.realized = {}
+            book.account_realized = 0.0
+
+    def _reject(self, limit, reason):
+        self.counters['rejected_' + limit] += 1
+        return reason
+
+    def _claim(self, account, strategy_id, tickets):
+        owners = self.owners.setdefault(account, {})
+        today = datetime.utcnow().date()
+        for ticket in tickets:
+            owners[ticket] = (strategy_id, today)
@@ -0,0 +1,24 @@
+# forms.py
+from flask_wtf import FlaskForm
+from wtforms import StringField, FloatField, SubmitField, PasswordField
+from wtforms.validators import DataRequired, NumberRange, ValidationError
+
+from models import Strategy
+
+
+class StrategyForm(FlaskForm):
+    name = StringField('Strategy Name', validators=[DataRequired()])
+    risk_percentage = FloatField('Risk %', validators=[DataRequired(), NumberRange(min=0.1, max=100)])
+    mt5_id = StringField('MT5 ID', validators=[DataRequired()])
+    password = PasswordField('Password', validators=[DataRequired()])
+    server = StringField('Server', validators=[DataRequired()])
+    directory = StringField('Directory', validators=[DataRequired()])
+    websocket_url = StringField('WebSocket URL', validators=[DataRequired()])
+    commission = FloatField('Commission', validators=[DataRequired(), NumberRange(min=0)])
+    submit = SubmitField('Save')
+
+    def validate_name(self, field):
+        # Check if a strategy with the same name already exists (excluding current strategy if editing)
+        existing_strategy = Strategy.query.filter_by(name=field.data).first()
+        if existing_strategy and (not hasattr(self, 'strategy_id') or existing_strategy.id != self.strategy_id):
+            raise ValidationError('Strategy name already exists. Please choose a different name.')
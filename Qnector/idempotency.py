@@ -0,0 +1,73 @@
+# idempotency.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import ProcessedAlert
+
+logger = logging.getLogger('qnector.pipeline')
+
+EPOCH = datetime(1970, 1, 1)  # seen_at is naive UTC
+
+
+class AlertDeduplicator:
+    # Time-bounded LRU of alert keys that have already been acted on.
+    # Every key lives for the same window, so insertion order is expiry
+    # order: expired keys are always at the front and eviction is a popitem.
+    # Lookups and inserts are O(1), and max_entries caps memory during an
+    # alert storm (the oldest keys go first).
+    def __init__(self, window=300, max_entries=10000):
+        self.window = window
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> expiry, epoch seconds
+        self.lock = threading.Lock()
+        self.duplicates = 0
+        self.evicted = 0
+
+    def load(self, session):
+        # Restore the keys seen inside the window before a restart
+        since = datetime.utcnow() - timedelta(seconds=self.window)
+        rows = session.execute(
+            select(ProcessedAlert.key, ProcessedAlert.seen_at)
+            .where(ProcessedAlert.seen_at >= since)
+            .order_by(ProcessedAlert.seen_at)
+        ).all()
+        with self.lock:
+            for key, seen_at in rows:
+                self.entries[key] = (seen_at - EPOCH).total_seconds() + self.window
+                self.entries.move_to_end(key)
+            self._evict(time.time())
+        logger.info("Loaded %d recent alert key(s) for deduplication.", len(rows))
+        return len(rows)
+
+    def first_seen(self, key):
+        # True, and remembers the key, the first time a key is seen within
+        # the window; False for a duplicate.
+        now = time.time()
+        with self.lock:
+            expires = self.entries.get(key)
+            if expires is not None and expires > now:
+                self.duplicates += 1
+                return False
+            self.entries[key] = now + self.window
+            self.entries.move_to_end(key)
+            self._evict(now)
+            return True
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'duplicates': self.duplicates, 'evicted': self.evicted}
+
+    def _evict(self, now):
+        entries = self.entries
+        while entries:
+            key, expires = next(iter(entries.items()))
+            if expires > now and len(entries) <= self.max_entries:
+                break
+            entries.popitem(last=False)
+            if expires > now:
+                self.evicted += 1
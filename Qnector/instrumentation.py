@@ -0,0 +1,156 @@
+# instrumentation.py
+import threading
+import time
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class LatencyHistogram:
+    # HDR-style log-linear histogram over microseconds: each power of two is
+    # split into SUB_BUCKETS linear slots, which bounds the relative error of
+    # any reported quantile to 1 / SUB_BUCKETS whatever the range.
+    SUB_BITS = 4
+    SUB_BUCKETS = 1 << SUB_BITS
+    MAX_EXPONENT = 40  # ~12 days in microseconds
+
+    __slots__ = ('counts', 'count', 'total', 'max', 'lock')
+
+    def __init__(self):
+        self.counts = [0] * ((self.MAX_EXPONENT + 2) * self.SUB_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def _index(cls, micros):
+        # Values below 2 * SUB_BUCKETS are counted exactly; above that the
+        # top SUB_BITS + 1 bits select the slot within the power of two.
+        exponent = micros.bit_length() - (cls.SUB_BITS + 1)
+        if exponent <= 0:
+            return micros
+        if exponent > cls.MAX_EXPONENT:
+            return (cls.MAX_EXPONENT + 2) * cls.SUB_BUCKETS - 1
+        return (exponent + 1) * cls.SUB_BUCKETS + (micros >> exponent) - cls.SUB_BUCKETS
+
+    @classmethod
+    def _upper_bound(cls, index):
+        if index < 2 * cls.SUB_BUCKETS:
+            return index + 1
+        exponent, sub = divmod(index, cls.SUB_BUCKETS)
+        return (cls.SUB_BUCKETS + sub + 1) << (exponent - 1)
+
+    def record(self, seconds):
+        index = self._index(int(seconds * 1_000_000))
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.count, self.total, self.max
+
+    def quantiles(self, quantiles=QUANTILES):
+        counts, count, _, maximum = self.snapshot()
+        if count == 0:
+            return {q: 0.0 for q in quantiles}
+        result = {}
+        targets = sorted(quantiles)
+        seen = 0
+        position = 0
+        for index, bucket in enumerate(counts):
+            if not bucket:
+                continue
+            seen += bucket
+            while position < len(targets) and seen >= targets[position] * count:
+                result[targets[position]] = min(self._upper_bound(index) / 1_000_000, maximum)
+                position += 1
+            if position == len(targets):
+                break
+        return result
+
+
+class PipelineMetrics:
+    # Per-strategy stage histograms and alert counters for the path from a
+    # WebSocket frame to mt5.order_send. Recording is a dict lookup plus a
+    # locked increment, so it is cheap enough to leave on in production.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}   # (strategy, stage) -> LatencyHistogram
+        self.counters = {}     # (strategy, counter) -> int
+        self.gauges = {}       # name -> callable returning {label: value}
+
+    def observe(self, strategy, stage, seconds):
+        key = (strategy, stage)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram())
+        histogram.record(seconds)
+
+    def timer(self, strategy, stage):
+        return _StageTimer(self, strategy, stage)
+
+    def increment(self, strategy, counter, amount=1):
+        key = (strategy, counter)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def register_gauges(self, name, collect):
+        # collect() returns a flat {metric_suffix: value} dict, e.g. broker.stats
+        self.gauges[name] = collect
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+
+        lines.append('# HELP qnector_alerts_total Alerts seen by the pipeline, by outcome.')
+        lines.append('# TYPE qnector_alerts_total counter')
+        for (strategy, counter), value in counters:
+            lines.append(f'qnector_alerts_total{{strategy="{_escape(strategy)}",outcome="{counter}"}} {value}')
+
+        lines.append('# HELP qnector_stage_latency_seconds Alert pipeline stage latency.')
+        lines.append('# TYPE qnector_stage_latency_seconds summary')
+        for (strategy, stage), histogram in histograms:
+            labels = f'strategy="{_escape(strategy)}",stage="{stage}"'
+            for quantile, value in histogram.quantiles().items():
+                lines.append(f'qnector_stage_latency_seconds{{{labels},quantile="{quantile}"}} {value:.6f}')
+            _, count, total, _ = histogram.snapshot()
+            lines.append(f'qnector_stage_latency_seconds_sum{{{labels}}} {total:.6f}')
+            lines.append(f'qnector_stage_latency_seconds_count{{{labels}}} {count}')
+
+        for name, collect in sorted(self.gauges.items()):
+            for key, value in sorted(collect().items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric = f'qnector_{name}_{key}'
+                lines.append(f'# TYPE {metric} gauge')
+                lines.append(f'{metric} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class _StageTimer:
+    __slots__ = ('metrics', 'strategy', 'stage', 'started')
+
+    def __init__(self, metrics, strategy, stage):
+        self.metrics = metrics
+        self.strategy = strategy
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.strategy, self.stage, time.perf_counter() - self.started)
+        return False
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
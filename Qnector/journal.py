@@ -0,0 +1,225 @@
+# journal.py
+import logging
+import queue
+import threading
+import time
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, delete, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import Trade, ProcessedAlert, configure_sqlite
+from strategy_stats import record_trades
+
+logger = logging.getLogger('qnector.journal')
+
+_STOP = object()
+
+
+def _is_busy(error):
+    # Only a lock held by another connection clears up by waiting for it
+    name = getattr(error.orig, 'sqlite_errorname', '')
+    if name:
+        return name.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED'))
+    message = str(error.orig)
+    return 'locked' in message or 'busy' in message
+
+
+class TradeJournal(threading.Thread):
+    # Writes Trade rows off the alert path. Rows are group-committed once
+    # batch_size rows are waiting or flush_interval seconds have passed since
+    # the first one arrived, using a session on the journal's own engine.
+    # Processed alert keys (see idempotency.py) ride the same batches and are
+    # pruned once they are older than alert_retention seconds. on_write, if
+    # given, is called with the strategy ids of every committed batch of trades.
+    #
+    # A batch that fails because the database is locked or busy is retried
+    # with backoff until it goes through, or until stop() runs out of time:
+    # the trades were executed and must not be lost. Any other failure (a
+    # constraint, a missing migration, disk trouble) is not going to pass on
+    # a retry, so the batch is written row by row and only the rows that still
+    # fail are dropped, each one logged and counted in rows_dropped.
+    PRUNE_INTERVAL = 60
+    RETRY_DELAY = 0.1
+    MAX_RETRY_DELAY = 5.0
+
+    def __init__(self, database_url, max_queue=10000, batch_size=200, flush_interval=0.5, put_timeout=5.0,
+                 sqlite_options=None, alert_retention=300, on_write=None):
+        super().__init__(name='trade-journal')
+        self.daemon = True
+        self.engine = create_engine(database_url)
+        configure_sqlite(self.engine, **(sqlite_options or {}))
+        self.rows = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.alert_retention = alert_retention
+        self.on_write = on_write
+        self.last_prune = 0.0
+        self.stop_deadline = None  # Set by stop(); lock retries give up after it
+        self.stats_lock = threading.Lock()
+        self.counters = {
+            'rows_written': 0,
+            'rows_dropped': 0,
+            'alerts_written': 0,
+            'batches': 0,
+            'commit_failures': 0,
+            'commit_retries': 0,
+            'last_commit_ms': 0.0,
+            'max_commit_ms': 0.0,
+            'commit_total': 0.0,
+        }
+
+    def record(self, **fields):
+        return self._put(Trade, fields)
+
+    def record_alert(self, **fields):
+        return self._put(ProcessedAlert, fields)
+
+    def _put(self, model, fields):
+        try:
+            self.rows.put((model, fields), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self.stats_lock:
+                self.counters['rows_dropped'] += 1
+            logger.error("Trade journal queue is full. Dropping %s record: %s", model.__tablename__, fields)
+            return False
+
+    def stop(self, timeout=10):
+        self.stop_deadline = time.monotonic() + timeout
+        if self.is_alive():
+            try:
+                self.rows.put_nowait(_STOP)
+            except queue.Full:
+                pass  # The writer stops once it finds the queue empty
+            self.join(timeout)
+        self.engine.dispose()
+
+    def stats(self):
+        with self.stats_lock:
+            snapshot = dict(self.counters)
+        commit_total = snapshot.pop('commit_total')
+        batches = snapshot['batches']
+        snapshot['avg_commit_ms'] = (commit_total / batches * 1000) if batches else 0.0
+        snapshot['queue_depth'] = self.rows.qsize()
+        return snapshot
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            try:
+                first = self.rows.get(timeout=1.0 if self.stop_deadline is None else 0.1)
+            except queue.Empty:
+                if self.stop_deadline is not None:
+                    break
+                continue
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self.rows.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            self._commit(batch)
+
+        # Drain whatever arrived before the stop marker
+        leftover = []
+        while True:
+            try:
+                row = self.rows.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                leftover.append(row)
+        if leftover:
+            self._commit(leftover)
+        logger.info("Trade journal stopped.")
+
+    def _commit(self, batch):
+        started = time.perf_counter()
+        trades = [fields for model, fields in batch if model is Trade]
+        alerts = [fields for model, fields in batch if model is ProcessedAlert]
+        delay = self.RETRY_DELAY
+        while True:
+            try:
+                self._write(trades, alerts)
+                break
+            except OperationalError as e:
+                if not _is_busy(e) or (self.stop_deadline is not None and time.monotonic() >= self.stop_deadline):
+                    self._reject(batch, e)
+                    return
+                with self.stats_lock:
+                    self.counters['commit_retries'] += 1
+                # Still locked after the backoff has maxed out: say so louder
+                log = logger.error if delay >= self.MAX_RETRY_DELAY else logger.warning
+                log("Writing %d trade(s) and %d alert key(s) failed; retrying in %.1fs: %s",
+                    len(trades), len(alerts), delay, e)
+                if self.stop_deadline is not None:
+                    time.sleep(max(0.0, min(delay, self.stop_deadline - time.monotonic())))
+                else:
+                    time.sleep(delay)
+                delay = min(delay * 2, self.MAX_RETRY_DELAY)
+            except Exception as e:
+                self._reject(batch, e)
+                return
+
+        elapsed = time.perf_counter() - started
+        with self.stats_lock:
+            self.counters['rows_written'] += len(trades)
+            self.counters['alerts_written'] += len(alerts)
+            self.counters['batches'] += 1
+            self.counters['last_commit_ms'] = elapsed * 1000
+            self.counters['max_commit_ms'] = max(self.counters['max_commit_ms'], elapsed * 1000)
+            self.counters['commit_total'] += elapsed
+        if trades and self.on_write is not None:
+            self.on_write(sorted({row['strategy_id'] for row in trades}))
+        logger.debug("Trade journal committed %d row(s) in %.1f ms.", len(batch), elapsed * 1000)
+
+    def _reject(self, batch, error):
+        with self.stats_lock:
+            self.counters['commit_failures'] += 1
+        if len(batch) > 1:
+            logger.error("Journal batch of %d row(s) was rejected (%s); writing its rows one at a time.", len(batch), error)
+            for row in batch:
+                self._commit([row])
+            return
+        model, fields = batch[0]
+        with self.stats_lock:
+            self.counters['rows_dropped'] += 1
+        logger.error("Dropping %s record the database rejected: %s (%s)", model.__tablename__, fields, error)
+
+    def _write(self, trades, alerts):
+        for row in trades:
+            row.pop('id', None)  # Assigned by an earlier attempt that rolled back
+        with Session(self.engine) as session:
+            if alerts:
+                # A key can already be there after a restart inside the window
+                session.execute(sqlite_insert(ProcessedAlert).on_conflict_do_nothing(), alerts)
+            if trades:
+                ids = session.scalars(
+                    insert(Trade).returning(Trade.id, sort_by_parameter_order=True), trades
+                ).all()
+                for row, trade_id in zip(trades, ids):
+                    row['id'] = trade_id
+                # Same transaction, so the aggregates never disagree with the trades
+                record_trades(session, trades)
+            if time.monotonic() - self.last_prune >= self.PRUNE_INTERVAL:
+                cutoff = datetime.utcnow() - timedelta(seconds=self.alert_retention)
+                session.execute(delete(ProcessedAlert).where(ProcessedAlert.seen_at < cutoff))
+                self.last_prune = time.monotonic()
+            session.commit()
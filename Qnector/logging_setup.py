@@ -0,0 +1,87 @@
+# logging_setup.py
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+
+
+class _MessageQueueHandler(logging.handlers.QueueHandler):
+    # Like the stock QueueHandler, render the message and traceback in the
+    # calling thread, since args and exc_info may change once the call
+    # returns, but queue them as a copy of the record rather than a finished
+    # line, so the listener's text or JSON formatter still lays it out.
+    _exceptions = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self._exceptions.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def parse_levels(value):
+    # "qnector.broker:DEBUG, websockets:WARNING" -> {'qnector.broker': 'DEBUG', ...}
+    levels = {}
+    for item in value.split(','):
+        if ':' not in item:
+            continue
+        name, level = item.split(':', 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(config):
+    # Every logger feeds an unbounded in-memory queue; one listener thread
+    # formats the records and writes them to the rotating file and stderr,
+    # so logging never blocks the WebSocket or broker threads on I/O.
+    settings = config['DEFAULT']
+    if settings.get('Log_Format', 'text').lower() == 'json':
+        formatter = JsonLinesFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        settings.get('Log_File', 'tradingview_ws.log'),
+        maxBytes=int(settings.get('Log_Max_Bytes', 10 * 1024 * 1024)),
+        backupCount=int(settings.get('Log_Backup_Count', 5)),
+        encoding='utf-8',
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_MessageQueueHandler(log_queue))
+    root.setLevel(settings.get('Log_Level', 'INFO').upper())
+
+    for name, level in parse_levels(settings.get('Log_Levels', '')).items():
+        logging.getLogger(name).setLevel(level)
+
+    listener.start()
+    return listener
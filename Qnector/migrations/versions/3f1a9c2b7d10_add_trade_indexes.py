@@ -0,0 +1,27 @@
+"""Add trade indexes
+
+Revision ID: 3f1a9c2b7d10
+Revises: 
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2b7d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() may already have built these on a fresh database
+    op.create_index('ix_trade_strategy_id_timestamp', 'trade', ['strategy_id', 'timestamp'], unique=False, if_not_exists=True)
+    op.create_index('ix_trade_trade_id', 'trade', ['trade_id'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_trade_trade_id', table_name='trade')
+    op.drop_index('ix_trade_strategy_id_timestamp', table_name='trade')
@@ -0,0 +1,42 @@
+"""Add pnl_rollup table
+
+Revision ID: 5a8c2e9d4b16
+Revises: e7b3f0c95a21
+Create Date: 2026-10-17 18:05:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a8c2e9d4b16'
+down_revision = 'e7b3f0c95a21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populated on the next application start, or with `flask rebuild-stats`
+    op.create_table('pnl_rollup',
+    sa.Column('strategy_id', sa.Integer(), nullable=False),
+    sa.Column('resolution', sa.String(length=4), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('pnl', sa.Float(), nullable=False),
+    sa.Column('trade_count', sa.Integer(), nullable=False),
+    sa.Column('win_count', sa.Integer(), nullable=False),
+    sa.Column('loss_count', sa.Integer(), nullable=False),
+    sa.Column('sum_sq', sa.Float(), nullable=False),
+    sa.Column('loss_sum', sa.Float(), nullable=False),
+    sa.Column('loss_sum_sq', sa.Float(), nullable=False),
+    sa.Column('min_equity', sa.Float(), nullable=False),
+    sa.Column('max_equity', sa.Float(), nullable=False),
+    sa.Column('max_drawdown', sa.Float(), nullable=False),
+    sa.Column('close_equity', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('strategy_id', 'resolution', 'bucket_start'),
+    if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('pnl_rollup')
@@ -0,0 +1,42 @@
+"""Add strategy_stats table
+
+Revision ID: 8b2e4d6f1c37
+Revises: 3f1a9c2b7d10
+Create Date: 2026-10-17 11:40:05.927731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1c37'
+down_revision = '3f1a9c2b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populated on the next application start, or with `flask rebuild-stats`
+    op.create_table('strategy_stats',
+    sa.Column('strategy_id', sa.Integer(), nullable=False),
+    sa.Column('trade_count', sa.Integer(), nullable=False),
+    sa.Column('total_profit', sa.Float(), nullable=False),
+    sa.Column('sum_sq', sa.Float(), nullable=False),
+    sa.Column('win_count', sa.Integer(), nullable=False),
+    sa.Column('loss_count', sa.Integer(), nullable=False),
+    sa.Column('loss_sum', sa.Float(), nullable=False),
+    sa.Column('loss_sum_sq', sa.Float(), nullable=False),
+    sa.Column('equity', sa.Float(), nullable=False),
+    sa.Column('peak_equity', sa.Float(), nullable=False),
+    sa.Column('max_drawdown', sa.Float(), nullable=False),
+    sa.Column('last_trade_id', sa.Integer(), nullable=True),
+    sa.Column('updated_date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['strategy_id'], ['strategy.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('strategy_id'),
+    if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('strategy_stats')
@@ -0,0 +1,60 @@
+"""Add engine_command, engine_status and stream_health tables
+
+Revision ID: 9d3f7a1c2e58
+Revises: 5a8c2e9d4b16
+Create Date: 2026-10-17 20:41:37.602914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3f7a1c2e58'
+down_revision = '5a8c2e9d4b16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('engine_command',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('strategy_id', sa.Integer(), nullable=False),
+    sa.Column('command', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('error', sa.String(length=500), nullable=True),
+    sa.Column('created_date', sa.DateTime(), nullable=False),
+    sa.Column('processed_date', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_engine_command_status', 'engine_command', ['status'], unique=False, if_not_exists=True)
+    op.create_table('engine_status',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('instance', sa.String(length=32), nullable=False),
+    sa.Column('pid', sa.Integer(), nullable=False),
+    sa.Column('host', sa.String(length=255), nullable=False),
+    sa.Column('started_date', sa.DateTime(), nullable=False),
+    sa.Column('heartbeat', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_table('stream_health',
+    sa.Column('strategy_id', sa.Integer(), nullable=False),
+    sa.Column('state', sa.String(length=20), nullable=False),
+    sa.Column('connected_since', sa.DateTime(), nullable=True),
+    sa.Column('last_message_at', sa.DateTime(), nullable=True),
+    sa.Column('reconnects', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('updated_date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['strategy_id'], ['strategy.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('strategy_id'),
+    if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('stream_health')
+    op.drop_table('engine_status')
+    op.drop_index('ix_engine_command_status', table_name='engine_command')
+    op.drop_table('engine_command')
@@ -0,0 +1,41 @@
+"""Add processed_alert table and trade.alert_key
+
+Revision ID: c4d9e1a7b352
+Revises: 8b2e4d6f1c37
+Create Date: 2026-10-17 14:05:12.418820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d9e1a7b352'
+down_revision = '8b2e4d6f1c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('processed_alert',
+    sa.Column('key', sa.String(length=32), nullable=False),
+    sa.Column('strategy_id', sa.Integer(), nullable=False),
+    sa.Column('seen_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['strategy_id'], ['strategy.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('key'),
+    if_not_exists=True
+    )
+    op.create_index('ix_processed_alert_seen_at', 'processed_alert', ['seen_at'], unique=False, if_not_exists=True)
+
+    # Databases created by db.create_all() on a newer build already have it
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('trade')]
+    if 'alert_key' not in columns:
+        with op.batch_alter_table('trade') as batch_op:
+            batch_op.add_column(sa.Column('alert_key', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('trade') as batch_op:
+        batch_op.drop_column('alert_key')
+    op.drop_index('ix_processed_alert_seen_at', table_name='processed_alert')
+    op.drop_table('processed_alert')
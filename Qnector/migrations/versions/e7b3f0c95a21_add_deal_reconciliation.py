@@ -0,0 +1,49 @@
+"""Add deal_cursor table and realized trade columns
+
+Revision ID: e7b3f0c95a21
+Revises: c4d9e1a7b352
+Create Date: 2026-10-17 16:42:37.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3f0c95a21'
+down_revision = 'c4d9e1a7b352'
+branch_labels = None
+depends_on = None
+
+TRADE_COLUMNS = (
+    ('commission', sa.Float()),
+    ('swap', sa.Float()),
+    ('close_price', sa.Float()),
+    ('close_time', sa.DateTime()),
+)
+
+
+def upgrade():
+    op.create_table('deal_cursor',
+    sa.Column('account', sa.String(length=150), nullable=False),
+    sa.Column('last_time_msc', sa.BigInteger(), nullable=False),
+    sa.Column('last_ticket', sa.BigInteger(), nullable=False),
+    sa.Column('updated_date', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('account'),
+    if_not_exists=True
+    )
+
+    # Databases created by db.create_all() on a newer build already have them
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('trade')]
+    missing = [(name, type_) for name, type_ in TRADE_COLUMNS if name not in columns]
+    if missing:
+        with op.batch_alter_table('trade') as batch_op:
+            for name, type_ in missing:
+                batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('trade') as batch_op:
+        for name, _ in reversed(TRADE_COLUMNS):
+            batch_op.drop_column(name)
+    op.drop_table('deal_cursor')
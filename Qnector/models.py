@@ -1,5 +1,7 @@
 # models.py
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from contextlib import contextmanager
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -24,6 +26,11 @@ class Strategy(db.Model):
 
 class Trade(db.Model):
     __tablename__ = 'trade'
+    __table_args__ = (
+        # Every performance view filters on strategy and orders by time
+        db.Index('ix_trade_strategy_id_timestamp', 'strategy_id', 'timestamp'),
+        db.Index('ix_trade_trade_id', 'trade_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     strategy_id = db.Column(db.Integer, db.ForeignKey('strategy.id'), nullable=False)
@@ -36,3 +43,214 @@ class Trade(db.Model):
     tp = db.Column(db.Float, nullable=True)
     profit = db.Column(db.Float, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    alert_key = db.Column(db.String(32), nullable=True)  # Idempotency key of the alert that opened it
+    # Filled in from the terminal's deal history by DealReconciler
+    commission = db.Column(db.Float, nullable=True)
+    swap = db.Column(db.Float, nullable=True)
+    close_price = db.Column(db.Float, nullable=True)
+    close_time = db.Column(db.DateTime, nullable=True)  # Trade server time, as MT5 reports it
+
+class DealCursor(db.Model):
+    __tablename__ = 'deal_cursor'
+
+    # High-water mark of the MT5 deal history already applied to trades, per
+    # account, so each sync only asks the terminal for newer deals.
+    account = db.Column(db.String(150), primary_key=True)  # 'login@server'
+    last_time_msc = db.Column(db.BigInteger, nullable=False, default=0)
+    last_ticket = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PnlRollup(db.Model):
+    __tablename__ = 'pnl_rollup'
+
+    # A strategy's trades summed per hour, day or week (by Trade.timestamp),
+    # kept up to date by the trade journal, so performance views over long
+    # ranges read one row per bucket. Equity is the strategy's running total
+    # after each trade in the bucket. strategy_id 0 holds the whole portfolio.
+    strategy_id = db.Column(db.Integer, primary_key=True)
+    resolution = db.Column(db.String(4), primary_key=True)  # 'hour', 'day' or 'week'
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    pnl = db.Column(db.Float, nullable=False, default=0.0)
+    trade_count = db.Column(db.Integer, nullable=False, default=0)
+    win_count = db.Column(db.Integer, nullable=False, default=0)
+    loss_count = db.Column(db.Integer, nullable=False, default=0)
+    sum_sq = db.Column(db.Float, nullable=False, default=0.0)
+    loss_sum = db.Column(db.Float, nullable=False, default=0.0)
+    loss_sum_sq = db.Column(db.Float, nullable=False, default=0.0)
+    min_equity = db.Column(db.Float, nullable=False)
+    max_equity = db.Column(db.Float, nullable=False)
+    max_drawdown = db.Column(db.Float, nullable=False, default=0.0)  # Deepest fall inside the bucket
+    close_equity = db.Column(db.Float, nullable=False)
+
+class EngineCommand(db.Model):
+    __tablename__ = 'engine_command'
+
+    # Requests from the web tier to the trading engine (engine.py), which owns
+    # every WebSocket handler and MT5 connection. The engine applies pending
+    # commands in id order and records the outcome; old ones are pruned.
+    id = db.Column(db.Integer, primary_key=True)
+    strategy_id = db.Column(db.Integer, nullable=False)  # No foreign key: a stop can outlive its strategy
+    command = db.Column(db.String(10), nullable=False)  # 'start', 'stop' or 'restart'
+    status = db.Column(db.String(10), nullable=False, default='pending', index=True)  # 'pending', 'done' or 'failed'
+    error = db.Column(db.String(500), nullable=True)
+    created_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    processed_date = db.Column(db.DateTime, nullable=True)
+
+class EngineStatus(db.Model):
+    __tablename__ = 'engine_status'
+
+    # The one running engine, if any. It claims the row at start-up, so a
+    # second engine refuses to trade alongside it, and keeps heartbeat fresh.
+    id = db.Column(db.Integer, primary_key=True)  # Always 1
+    instance = db.Column(db.String(32), nullable=False)
+    pid = db.Column(db.Integer, nullable=False)
+    host = db.Column(db.String(255), nullable=False)
+    started_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    heartbeat = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class StreamHealth(db.Model):
+    __tablename__ = 'stream_health'
+
+    # Connection state of each running strategy's WebSocket, published by the
+    # engine with its heartbeat for the dashboard.
+    strategy_id = db.Column(db.Integer, db.ForeignKey('strategy.id', ondelete='CASCADE'), primary_key=True)
+    state = db.Column(db.String(20), nullable=False)
+    connected_since = db.Column(db.DateTime, nullable=True)
+    last_message_at = db.Column(db.DateTime, nullable=True)
+    reconnects = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500), nullable=True)
+    updated_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ProcessedAlert(db.Model):
+    __tablename__ = 'processed_alert'
+
+    # Alerts already acted on, so a restart inside the dedup window still
+    # recognises TradingView redeliveries. Rows older than the window are pruned.
+    key = db.Column(db.String(32), primary_key=True)
+    strategy_id = db.Column(db.Integer, db.ForeignKey('strategy.id', ondelete='CASCADE'), nullable=False)
+    seen_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class StrategyStats(db.Model):
+    __tablename__ = 'strategy_stats'
+
+    # Running aggregates over a strategy's trades in timestamp order, so the
+    # dashboard can show its metrics without loading the trades.
+    strategy_id = db.Column(db.Integer, db.ForeignKey('strategy.id', ondelete='CASCADE'), primary_key=True)
+    trade_count = db.Column(db.Integer, nullable=False, default=0)
+    total_profit = db.Column(db.Float, nullable=False, default=0.0)
+    sum_sq = db.Column(db.Float, nullable=False, default=0.0)
+    win_count = db.Column(db.Integer, nullable=False, default=0)
+    loss_count = db.Column(db.Integer, nullable=False, default=0)
+    loss_sum = db.Column(db.Float, nullable=False, default=0.0)
+    loss_sum_sq = db.Column(db.Float, nullable=False, default=0.0)  # Downside sum of squares
+    equity = db.Column(db.Float, nullable=False, default=0.0)
+    peak_equity = db.Column(db.Float, nullable=False, default=0.0)
+    max_drawdown = db.Column(db.Float, nullable=False, default=0.0)
+    last_trade_id = db.Column(db.Integer, nullable=True)  # Highest Trade.id folded in
+    updated_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def reset(self):
+        for column in ('trade_count', 'win_count', 'loss_count'):
+            setattr(self, column, 0)
+        for column in ('total_profit', 'sum_sq', 'loss_sum', 'loss_sum_sq', 'equity', 'peak_equity', 'max_drawdown'):
+            setattr(self, column, 0.0)
+        self.last_trade_id = None
+
+    def apply(self, profit):
+        self.trade_count += 1
+        self.total_profit += profit
+        self.sum_sq += profit * profit
+        if profit > 0:
+            self.win_count += 1
+        elif profit < 0:
+            self.loss_count += 1
+            self.loss_sum += profit
+            self.loss_sum_sq += profit * profit
+        self.equity += profit
+        if self.equity > self.peak_equity:
+            self.peak_equity = self.equity
+        elif self.peak_equity - self.equity > self.max_drawdown:
+            self.max_drawdown = self.peak_equity - self.equity
+
+    @property
+    def win_rate(self):
+        return (self.win_count / self.trade_count * 100) if self.trade_count > 0 else 0
+
+    @property
+    def average_profit(self):
+        return (self.total_profit / self.trade_count) if self.trade_count > 0 else 0
+
+    @property
+    def drawdown_percentage(self):
+        return (self.max_drawdown / self.peak_equity * 100) if self.peak_equity > 0 else 0
+
+    @property
+    def sharpe_ratio(self):
+        # Population standard deviation, risk-free rate = 0
+        n = self.trade_count
+        if n < 2:
+            return 0
+        mean = self.total_profit / n
+        variance = self.sum_sq / n - mean * mean
+        if variance <= 1e-12:
+            return 0
+        return mean / variance ** 0.5 * n ** 0.5
+
+    @property
+    def sortino_ratio(self):
+        # Standard deviation of the losing trades only
+        n, k = self.trade_count, self.loss_count
+        if k == 0:
+            return 0
+        loss_mean = self.loss_sum / k
+        variance = self.loss_sum_sq / k - loss_mean * loss_mean
+        if variance <= 1e-12:
+            return 0
+        return (self.total_profit / n) / variance ** 0.5 * n ** 0.5
+
+    @property
+    def profit_factor(self):
+        # Gross profit over gross loss; losses are the only negative trades
+        if self.loss_sum >= 0:
+            return None
+        return (self.total_profit - self.loss_sum) / -self.loss_sum
+
+    @property
+    def expectancy(self):
+        # Win rate times the average win less loss rate times the average loss,
+        # which comes down to the average profit per trade
+        return self.average_profit
+
+
+def configure_sqlite(engine, cache_size_mb=64, mmap_size_mb=256, busy_timeout_ms=5000):
+    # WAL lets the journal writer commit while the dashboard reads, and
+    # synchronous=NORMAL is durable across application crashes in WAL mode.
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA cache_size=-{cache_size_mb * 1024}')
+        cursor.execute(f'PRAGMA mmap_size={mmap_size_mb * 1024 * 1024}')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute(f'PRAGMA busy_timeout={busy_timeout_ms}')
+        cursor.close()
+
+
+@contextmanager
+def count_queries(engine):
+    # Counts statements sent to the database inside the block, e.g. to check
+    # that a page's query count does not grow with the number of strategies.
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield executed
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
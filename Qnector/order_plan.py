@@ -0,0 +1,71 @@
+# order_plan.py
+import math
+from decimal import Decimal
+
+# Bits of symbol_info().filling_mode. The MetaTrader5 Python package does not
+# export the SYMBOL_FILLING_* flags (they exist only in MQL5).
+SYMBOL_FILLING_FOK = 1
+SYMBOL_FILLING_IOC = 2
+
+
+class OrderPlan:
+    # Everything about one strategy trading one symbol that does not change
+    # from alert to alert: contract specs, the fill policy the symbol accepts,
+    # the pip value before currency conversion and the constant part of the
+    # order_send request. Built from a SymbolMeta and rebuilt when the symbol
+    # cache hands out a new one (expiry or invalidation), so the alert path
+    # only fills in type, price, SL, TP and volume.
+    __slots__ = ('symbol', 'meta', 'digits', 'point', 'volume_min', 'volume_max', 'volume_step',
+                 'volume_decimals', 'quote_currency', 'pip_value', 'market', 'pending')
+
+    def __init__(self, mt5, meta, magic, comment, deviation=20):
+        self.symbol = meta.name
+        self.meta = meta
+        self.digits = meta.digits
+        self.point = meta.point
+        self.volume_step = meta.volume_step or 0.01
+        self.volume_decimals = max(0, -Decimal(str(self.volume_step)).normalize().as_tuple().exponent)
+        self.volume_min = meta.volume_min
+        self.volume_max = self._floor(meta.volume_max)
+        self.quote_currency = meta.name[-3:]
+        self.pip_value = meta.point * 100000  # per lot, in the quote currency
+
+        base = {
+            "symbol": meta.name,
+            "deviation": deviation,
+            "magic": magic,
+            "comment": comment,
+            "type_time": mt5.ORDER_TIME_GTC,
+        }
+        self.market = dict(base, action=mt5.TRADE_ACTION_DEAL, type_filling=filling_for(mt5, meta.filling_mode))
+        self.pending = dict(base, action=mt5.TRADE_ACTION_PENDING, type_filling=mt5.ORDER_FILLING_RETURN)
+
+    def _floor(self, volume):
+        # Round down to a whole number of steps; the small epsilon keeps
+        # 0.3 / 0.1 from landing on 2.9999999999999996 steps.
+        steps = math.floor(volume / self.volume_step + 1e-9)
+        return round(steps * self.volume_step, self.volume_decimals)
+
+    def snap_volume(self, volume):
+        # A tradeable volume: rounded down to volume_step (never over the
+        # risk budget), then clamped to the symbol's limits.
+        return min(max(self._floor(volume), self.volume_min), self.volume_max)
+
+    def market_request(self, order_type, price, sl, tp, volume):
+        return dict(self.market, type=order_type, price=price, sl=sl, tp=tp, volume=volume)
+
+    def close_request(self, order_type, price, volume, position):
+        return dict(self.market, type=order_type, price=price, volume=volume, position=position)
+
+    def pending_request(self, order_type, price, sl, tp, volume):
+        return dict(self.pending, type=order_type, price=price, sl=sl, tp=tp, volume=volume)
+
+
+def filling_for(mt5, filling_mode):
+    # symbol_info().filling_mode is a bitmask of the fill policies the symbol
+    # allows for market orders; prefer IOC as before, then FOK.
+    if filling_mode & SYMBOL_FILLING_IOC:
+        return mt5.ORDER_FILLING_IOC
+    if filling_mode & SYMBOL_FILLING_FOK:
+        return mt5.ORDER_FILLING_FOK
+    return mt5.ORDER_FILLING_RETURN
@@ -0,0 +1,237 @@
+# reconciler.py
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import bindparam, create_engine, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from broker import NotLoggedIn
+from models import Strategy, Trade, DealCursor, configure_sqlite
+from strategy_stats import adjust_strategy_stats
+from rollups import adjust_rollups
+
+logger = logging.getLogger('qnector.reconciler')
+
+OVERLAP = 2  # seconds re-requested below the high-water mark; history_deals_get takes whole seconds
+# history_deals_get gets timezone-aware UTC datetimes: MetaTrader5 applies the
+# local time zone's offset to naive ones, which would skip or re-read deals.
+
+
+def account_key(account):
+    return f'{account.login}@{account.server}'
+
+
+class DealReconciler(threading.Thread):
+    # Fills in what order_send cannot know: the fill price, realized profit,
+    # commission, swap and close of each journaled trade, including pending
+    # orders journaled at their placed price. Every interval it asks the
+    # terminal, through the execution broker, for the deals after each
+    # account's persisted high-water mark, so a cycle costs in proportion to
+    # the new deals rather than the whole history. Deals are matched to
+    # trades by position (the position ticket is the opening order's ticket,
+    # which is Trade.trade_id) and applied as increments, together with the
+    # new mark and the matching corrections to the strategies' aggregates
+    # and PnL rollups, in one short transaction.
+    #
+    # A deal whose trade is not in the database yet (the journal writes in
+    # the background) holds the mark back for up to grace seconds before it
+    # is skipped as not ours. on_write, if given, is called with the ids of
+    # the strategies whose trades changed.
+    def __init__(self, broker, database_url, accounts, magic, interval=10.0, grace=30.0, lookback_days=1, sqlite_options=None,
+                 on_write=None):
+        super().__init__(name='deal-reconciler')
+        self.daemon = True
+        self.broker = broker
+        self.engine = create_engine(database_url)
+        configure_sqlite(self.engine, **(sqlite_options or {}))
+        self.accounts = accounts  # callable returning the accounts to sync
+        self.magic = magic
+        self.entry_in = broker.mt5.DEAL_ENTRY_IN
+        self.interval = interval
+        self.grace = grace
+        self.lookback = timedelta(days=lookback_days)
+        self.on_write = on_write
+        self.stop_event = threading.Event()
+        self.waiting = {}  # deal ticket -> monotonic time it was first left unmatched
+        self.stats_lock = threading.Lock()
+        self.counters = {
+            'cycles': 0,
+            'deals_fetched': 0,
+            'deals_applied': 0,
+            'deals_skipped': 0,
+            'trades_updated': 0,
+            'failures': 0,
+            'last_cycle_ms': 0.0,
+        }
+
+    def stats(self):
+        with self.stats_lock:
+            snapshot = dict(self.counters)
+        snapshot['deals_waiting'] = len(self.waiting)
+        return snapshot
+
+    def stop(self, timeout=10):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+        self.engine.dispose()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sync()
+        logger.info("Deal reconciler stopped.")
+
+    def sync(self):
+        started = time.perf_counter()
+        for account in self.accounts():
+            try:
+                self.sync_account(account)
+            except NotLoggedIn:
+                pass  # Its deals wait for the next cycle that finds it logged in
+            except Exception as e:
+                with self.stats_lock:
+                    self.counters['failures'] += 1
+                logger.error("Deal sync for MT5 account %s failed: %s", account.login, e)
+        with self.stats_lock:
+            self.counters['cycles'] += 1
+            self.counters['last_cycle_ms'] = (time.perf_counter() - started) * 1000
+
+    def sync_account(self, account):
+        key = account_key(account)
+        with Session(self.engine) as session:
+            strategy_ids = session.scalars(
+                select(Strategy.id).where(Strategy.mt5_id == str(account.login), Strategy.server == account.server)
+            ).all()
+            if not strategy_ids:
+                return 0
+            cursor = session.get(DealCursor, key)
+            if cursor is not None:
+                mark = (cursor.last_time_msc, cursor.last_ticket)
+                since = datetime.fromtimestamp(cursor.last_time_msc / 1000 - OVERLAP, timezone.utc)
+            else:
+                # First sync: start from the oldest trade still waiting for its close
+                mark = (0, 0)
+                oldest = session.scalar(
+                    select(func.min(Trade.timestamp)).where(Trade.strategy_id.in_(strategy_ids), Trade.close_time.is_(None))
+                )
+                since = ((oldest or datetime.utcnow()) - self.lookback).replace(tzinfo=timezone.utc)
+
+        deals = self.broker.call(account, self._fetch_deals, since, mark, background=True)
+        with self.stats_lock:
+            self.counters['deals_fetched'] += len(deals)
+        if not deals:
+            return 0
+
+        with Session(self.engine) as session:
+            positions = {deal.position_id for deal in deals}
+            trades = {
+                trade_id: (row_id, strategy_id, timestamp)
+                for row_id, strategy_id, trade_id, timestamp in session.execute(
+                    select(Trade.id, Trade.strategy_id, Trade.trade_id, Trade.timestamp)
+                    .where(Trade.trade_id.in_(positions), Trade.strategy_id.in_(strategy_ids))
+                )
+            }
+
+        changes, new_mark, skipped = self._match(deals, trades, mark)
+        if new_mark == mark:
+            return 0
+        with Session(self.engine) as session:
+            # Increments rather than read-modify-write, so the first statement
+            # takes SQLite's write lock and no concurrent journal commit is lost
+            corrected = []
+            if changes:
+                trade = Trade.__table__
+                session.connection().execute(
+                    update(trade).where(trade.c.id == bindparam('row_id')).values(
+                        price=func.coalesce(bindparam('new_price', type_=trade.c.price.type), trade.c.price),
+                        profit=trade.c.profit + bindparam('add_profit'),
+                        commission=func.coalesce(trade.c.commission, 0.0) + bindparam('add_commission'),
+                        swap=func.coalesce(trade.c.swap, 0.0) + bindparam('add_swap'),
+                        close_price=func.coalesce(bindparam('new_close_price', type_=trade.c.close_price.type), trade.c.close_price),
+                        close_time=func.coalesce(bindparam('new_close_time', type_=trade.c.close_time.type), trade.c.close_time),
+                    ),
+                    [
+                        dict(row_id=row_id, new_price=change['price'], add_profit=change['profit'],
+                             add_commission=change['commission'], add_swap=change['swap'],
+                             new_close_price=change['close_price'], new_close_time=change['close_time'])
+                        for row_id, change in changes.items()
+                    ],
+                )
+                profits = [row_id for row_id, change in changes.items() if change['profit']]
+                if profits:
+                    corrected = session.execute(select(Trade.id, Trade.profit).where(Trade.id.in_(profits))).all()
+            session.execute(
+                sqlite_insert(DealCursor)
+                .values(account=key, last_time_msc=new_mark[0], last_ticket=new_mark[1], updated_date=datetime.utcnow())
+                .on_conflict_do_update(
+                    index_elements=['account'],
+                    set_=dict(last_time_msc=new_mark[0], last_ticket=new_mark[1], updated_date=datetime.utcnow()),
+                )
+            )
+            if corrected:
+                # Profits changed under the running aggregates
+                adjust_rollups(session, [
+                    (changes[row_id]['strategy_id'], changes[row_id]['timestamp'], changes[row_id]['profit'])
+                    for row_id, profit in corrected
+                ])
+                adjust_strategy_stats(session, [
+                    (changes[row_id]['strategy_id'], profit - changes[row_id]['profit'], profit)
+                    for row_id, profit in corrected
+                ])
+            session.commit()
+
+        applied = sum(change['deals'] for change in changes.values())
+        with self.stats_lock:
+            self.counters['deals_applied'] += applied
+            self.counters['deals_skipped'] += skipped
+            self.counters['trades_updated'] += len(changes)
+        if changes and self.on_write is not None:
+            self.on_write(sorted({change['strategy_id'] for change in changes.values()}))
+        logger.info("Applied %d deal(s) to %d trade(s) for MT5 account %s.", applied, len(changes), account.login)
+        return applied
+
+    def _fetch_deals(self, mt5, since, mark):
+        # Runs inside the broker. Our deals past the mark, oldest first.
+        deals = mt5.history_deals_get(since, datetime.now(timezone.utc) + timedelta(days=1)) or ()
+        magic = self.magic
+        deals = [deal for deal in deals if deal.magic == magic and (deal.time_msc, deal.ticket) > mark]
+        deals.sort(key=lambda deal: (deal.time_msc, deal.ticket))
+        return deals
+
+    def _match(self, deals, trades, mark):
+        # Returns ({row_id: change}, new high-water mark, deals skipped).
+        # The mark stops before the first deal still waiting for its trade.
+        now = time.monotonic()
+        changes = {}
+        skipped = 0
+        new_mark = mark
+        for deal in deals:
+            trade = trades.get(deal.position_id)
+            if trade is None:
+                first_seen = self.waiting.setdefault(deal.ticket, now)
+                if now - first_seen < self.grace:
+                    break
+                logger.warning("No trade found for deal %s (position %s). Skipping it.", deal.ticket, deal.position_id)
+                skipped += 1
+            else:
+                row_id, strategy_id, timestamp = trade
+                change = changes.get(row_id)
+                if change is None:
+                    change = changes[row_id] = dict(row_id=row_id, strategy_id=strategy_id, timestamp=timestamp, price=None,
+                                                    profit=0.0, commission=0.0, swap=0.0, close_price=None, close_time=None,
+                                                    deals=0)
+                change['commission'] += deal.commission
+                change['swap'] += deal.swap
+                change['deals'] += 1
+                if deal.entry == self.entry_in:
+                    change['price'] = deal.price  # The fill, which for a pending order was not known yet
+                else:
+                    change['profit'] += deal.profit
+                    change['close_price'] = deal.price
+                    change['close_time'] = datetime.utcfromtimestamp(deal.time_msc / 1000)
+            self.waiting.pop(deal.ticket, None)
+            new_mark = (deal.time_msc, deal.ticket)
+        return changes, new_mark, skipped
@@ -0,0 +1,175 @@
+# response_cache.py
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response, make_response, request, session
+
+ALL = 'all'  # Scope of pages built from every strategy
+
+
+class PageCache:
+    # Rendered pages, and the data behind them, valid until the next write
+    # that could change them. Each strategy's version is what poll() (see
+    # watch()) reads for it from the database; pages over all strategies
+    # follow every strategy's version. The ETag is a digest of those values,
+    # so every worker serving the same database hands out the same ETag, a
+    # browser revalidating an unchanged page gets a 304 without the view
+    # running, and a changed version simply misses. Entries are evicted least
+    # recently used beyond max_entries or max_bytes.
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (etag, value, size)
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'not_modified': 0, 'evictions': 0, 'invalidations': 0}
+        self.poll = None  # See watch()
+        self.poll_interval = 1.0
+        self.next_poll = 0.0
+        self.seen = {}
+
+    def configure(self, max_entries, max_bytes):
+        with self.lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def watch(self, poll, interval=1.0):
+        # poll() returns {strategy_id: version}, a tuple of values that change
+        # with every write behind the strategy's pages. It is called at most
+        # once per interval, so writes made by another process (the engine,
+        # another worker) show up within that interval.
+        self.poll = poll
+        self.poll_interval = interval
+        self.next_poll = 0.0
+        self.seen = {}
+
+    def invalidate(self, strategy_ids=None):
+        # Called after trades or strategies are committed here, so the next
+        # request reads the new versions instead of waiting for the interval.
+        # None also drops every cached entry.
+        with self.lock:
+            if strategy_ids is None:
+                self.entries.clear()
+                self.bytes = 0
+            self.next_poll = 0.0
+            self.counters['invalidations'] += 1
+
+    def validators(self, scope):
+        # (ETag, Last-Modified) of everything built for scope
+        self._refresh()
+        with self.lock:
+            if scope == ALL:
+                versions = sorted(self.seen.items())
+                values = [value for _, version in versions for value in version]
+            else:
+                versions = self.seen.get(scope, ())
+                values = list(versions)
+        etag = hashlib.blake2b(repr((scope, versions)).encode(), digest_size=12).hexdigest()
+        dates = [value for value in values if isinstance(value, datetime)]  # Naive UTC
+        modified = max(dates).replace(tzinfo=timezone.utc).timestamp() if dates else None
+        return etag, modified
+
+    def get(self, key, etag):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != etag:
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[1]
+
+    def put(self, key, etag, value, size=0):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self.entries[key] = (etag, value, size)
+            self.bytes += size
+            self._evict()
+
+    def memoize(self, key, scope, build):
+        # build()'s result, rebuilt only after scope changes. Values are
+        # counted against max_entries only, so keep them small.
+        etag, _ = self.validators(scope)
+        value = self.get(key, etag)
+        if value is None:
+            value = build()
+            self.put(key, etag, value)
+        return value
+
+    def cached(self, scope_arg=None):
+        # Caches a GET view's page per URL under the scope named by the view
+        # argument scope_arg (all strategies when None), answering matching
+        # If-None-Match / If-Modified-Since requests with a 304.
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                if '_flashes' in session:
+                    return view(**kwargs)  # Flashed messages belong to this one response
+
+                scope = kwargs[scope_arg] if scope_arg else ALL
+                etag, modified = self.validators(scope)
+                if self._not_modified(etag, modified):
+                    with self.lock:
+                        self.counters['not_modified'] += 1
+                    return self._headers(Response(status=304), etag, modified)
+
+                key = request.full_path
+                page = self.get(key, etag)
+                if page is None:
+                    response = make_response(view(**kwargs))
+                    if response.status_code != 200:
+                        return response
+                    page = (response.get_data(), response.mimetype)
+                    self.put(key, etag, page, len(page[0]))
+                return self._headers(Response(page[0], mimetype=page[1]), etag, modified)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self.lock:
+            snapshot = dict(self.counters)
+            snapshot['entries'] = len(self.entries)
+            snapshot['bytes'] = self.bytes
+        return snapshot
+
+    def _not_modified(self, etag, modified):
+        # Only the ETag is trusted: Last-Modified has whole seconds, so a
+        # page changed twice within one second would still match
+        # If-Modified-Since. Such requests get the full page.
+        return request.if_none_match.contains(etag)
+
+    def _headers(self, response, etag, modified):
+        response.set_etag(etag)
+        if modified is not None:
+            response.last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
+        response.cache_control.no_cache = True  # Always revalidate
+        return response
+
+    def _refresh(self):
+        if self.poll is None:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if now < self.next_poll:
+                return
+            self.next_poll = now + self.poll_interval
+        current = self.poll()
+        with self.lock:
+            self.seen = current
+
+    def _evict(self):
+        entries = self.entries
+        while entries and (len(entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, (_, _, size) = entries.popitem(last=False)
+            self.bytes -= size
+            self.counters['evictions'] += 1
+
+
+page_cache = PageCache()
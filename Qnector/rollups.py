@@ -0,0 +1,203 @@
+# rollups.py
+import logging
+from datetime import timedelta
+
+from sqlalchemy import select, delete, insert, update, bindparam, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import PnlRollup, StrategyStats, Trade
+
+logger = logging.getLogger('qnector.stats')
+
+PORTFOLIO = 0  # PnlRollup.strategy_id of the all-strategies rollup
+RESOLUTIONS = ('hour', 'day', 'week')
+
+ADDITIVE = ('pnl', 'trade_count', 'win_count', 'loss_count', 'sum_sq', 'loss_sum', 'loss_sum_sq')
+
+
+WEEK = timedelta(days=7)
+
+
+def bucket_start(timestamp, resolution):
+    if resolution == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())  # Weeks start on Monday
+    return day
+
+
+class Buckets:
+    # Rollup rows for trades added in time order, keyed by
+    # (strategy_id, resolution, bucket_start). equity is the scope's running
+    # equity after the trade.
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, scope, timestamp, profit, equity):
+        for resolution in RESOLUTIONS:
+            start = bucket_start(timestamp, resolution)
+            row = self.rows.get((scope, resolution, start))
+            if row is None:
+                row = self.rows[(scope, resolution, start)] = dict(
+                    strategy_id=scope, resolution=resolution, bucket_start=start,
+                    pnl=0.0, trade_count=0, win_count=0, loss_count=0, sum_sq=0.0, loss_sum=0.0, loss_sum_sq=0.0,
+                    min_equity=equity, max_equity=equity, max_drawdown=0.0, close_equity=equity,
+                )
+            row['pnl'] += profit
+            row['trade_count'] += 1
+            row['sum_sq'] += profit * profit
+            if profit > 0:
+                row['win_count'] += 1
+            elif profit < 0:
+                row['loss_count'] += 1
+                row['loss_sum'] += profit
+                row['loss_sum_sq'] += profit * profit
+            row['max_drawdown'] = max(row['max_drawdown'], row['max_equity'] - equity)
+            row['min_equity'] = min(row['min_equity'], equity)
+            row['max_equity'] = max(row['max_equity'], equity)
+            row['close_equity'] = equity
+
+
+def record_rollups(session, trades):
+    # Fold newly written trades into the rollups. trades are
+    # (strategy_id, timestamp, profit, equity after the trade) in the order
+    # they were written, which is time order per strategy; the caller commits.
+    portfolio = session.scalar(
+        select(PnlRollup.close_equity)
+        .where(PnlRollup.strategy_id == PORTFOLIO, PnlRollup.resolution == 'hour')
+        .order_by(PnlRollup.bucket_start.desc())
+        .limit(1)
+    ) or 0.0
+    buckets = Buckets()
+    for strategy_id, timestamp, profit, equity in trades:
+        portfolio += profit
+        buckets.add(strategy_id, timestamp, profit, equity)
+        buckets.add(PORTFOLIO, timestamp, profit, portfolio)
+
+    # A bucket that already has rows continues with these trades: sums add
+    # up, and the drawdown may start from the equity peak before them
+    stmt = sqlite_insert(PnlRollup)
+    current, new = PnlRollup.__table__.c, stmt.excluded
+    merged = {column: current[column] + new[column] for column in ADDITIVE}
+    merged.update(
+        max_drawdown=func.max(current.max_drawdown, new.max_drawdown, current.max_equity - new.min_equity),
+        min_equity=func.min(current.min_equity, new.min_equity),
+        max_equity=func.max(current.max_equity, new.max_equity),
+        close_equity=new.close_equity,
+    )
+    stmt = stmt.on_conflict_do_update(index_elements=['strategy_id', 'resolution', 'bucket_start'], set_=merged)
+    session.execute(stmt, list(buckets.rows.values()))
+
+
+def adjust_rollups(session, corrections):
+    # Fold corrections to the profit of trades already in the rollups, given
+    # as (strategy_id, timestamp, profit delta) once the caller has updated
+    # the trades. Only the weeks holding a corrected trade are recomputed,
+    # from that week's trades; every later bucket's equity just moves by the
+    # delta. The caller commits.
+    deltas = {}  # (scope, week start) -> profit delta
+    for strategy_id, timestamp, delta in corrections:
+        for scope in (strategy_id, PORTFOLIO):
+            key = (scope, bucket_start(timestamp, 'week'))
+            deltas[key] = deltas.get(key, 0.0) + delta
+
+    rollup = PnlRollup.__table__
+    shift = update(rollup).where(
+        rollup.c.strategy_id == bindparam('scope'), rollup.c.bucket_start >= bindparam('after', type_=rollup.c.bucket_start.type)
+    ).values(
+        min_equity=rollup.c.min_equity + bindparam('delta'),
+        max_equity=rollup.c.max_equity + bindparam('delta'),
+        close_equity=rollup.c.close_equity + bindparam('delta'),
+    )
+    recomputed = 0
+    for (scope, week), delta in sorted(deltas.items()):
+        # Earlier corrected weeks have already moved this one's equity
+        row = session.execute(
+            select(rollup.c.close_equity, rollup.c.pnl)
+            .where(rollup.c.strategy_id == scope, rollup.c.resolution == 'week', rollup.c.bucket_start == week)
+        ).first()
+        if row is not None:
+            opening = row.close_equity - row.pnl
+        else:
+            before = select(func.coalesce(func.sum(Trade.profit), 0.0)).where(Trade.timestamp < week)
+            if scope != PORTFOLIO:
+                before = before.where(Trade.strategy_id == scope)
+            opening = session.scalar(before)
+        session.execute(shift, dict(scope=scope, after=week + WEEK, delta=delta))
+
+        session.execute(delete(PnlRollup).where(
+            PnlRollup.strategy_id == scope, PnlRollup.bucket_start >= week, PnlRollup.bucket_start < week + WEEK
+        ))
+        query = (select(Trade.timestamp, Trade.profit)
+                 .where(Trade.timestamp >= week, Trade.timestamp < week + WEEK)
+                 .order_by(Trade.timestamp, Trade.id))
+        if scope != PORTFOLIO:
+            query = query.where(Trade.strategy_id == scope)
+        buckets = Buckets()
+        equity = opening
+        for timestamp, profit in session.execute(query):
+            equity += profit
+            buckets.add(scope, timestamp, profit, equity)
+        if buckets.rows:
+            session.execute(insert(PnlRollup), list(buckets.rows.values()))
+        recomputed += len(buckets.rows)
+    return recomputed
+
+
+def rebuild_rollups(session, strategy_ids=None):
+    # Recompute the rollups of the given strategies (all when None) and of the
+    # portfolio from the trade history. The caller commits.
+    clear = delete(PnlRollup)
+    if strategy_ids is not None:
+        clear = clear.where(PnlRollup.strategy_id.in_(list(strategy_ids) + [PORTFOLIO]))
+    session.execute(clear)
+
+    # Every strategy's trades are read, since they all move the portfolio
+    query = select(Trade.strategy_id, Trade.timestamp, Trade.profit).order_by(Trade.timestamp, Trade.id)
+    wanted = set(strategy_ids) if strategy_ids is not None else None
+    equity = {}
+    portfolio = 0.0
+    buckets = Buckets()
+    for strategy_id, timestamp, profit in session.execute(query):
+        portfolio += profit
+        buckets.add(PORTFOLIO, timestamp, profit, portfolio)
+        if wanted is None or strategy_id in wanted:
+            equity[strategy_id] = equity.get(strategy_id, 0.0) + profit
+            buckets.add(strategy_id, timestamp, profit, equity[strategy_id])
+
+    if buckets.rows:
+        session.execute(insert(PnlRollup), list(buckets.rows.values()))
+    logger.info("Rebuilt %d PnL rollup bucket(s).", len(buckets.rows))
+    return len(buckets.rows)
+
+
+def load_rollups(session, strategy_id, resolution, start=None, end=None):
+    # The buckets overlapping [start, end), oldest first
+    query = select(PnlRollup).where(PnlRollup.strategy_id == strategy_id, PnlRollup.resolution == resolution)
+    if start is not None:
+        query = query.where(PnlRollup.bucket_start >= bucket_start(start, resolution))
+    if end is not None:
+        query = query.where(PnlRollup.bucket_start < end)
+    return session.scalars(query.order_by(PnlRollup.bucket_start)).all()
+
+
+def summarize(rollups):
+    # The StrategyStats aggregates over consecutive buckets, with equity
+    # counted from the start of the first one. The deepest drawdown is either
+    # inside a bucket or from an earlier peak down to a bucket's low.
+    stats = StrategyStats()
+    stats.reset()
+    if not rollups:
+        return stats
+    opening = rollups[0].close_equity - rollups[0].pnl
+    peak = opening
+    for rollup in rollups:
+        for column in ('trade_count', 'win_count', 'loss_count', 'sum_sq', 'loss_sum', 'loss_sum_sq'):
+            setattr(stats, column, getattr(stats, column) + getattr(rollup, column))
+        stats.total_profit += rollup.pnl
+        stats.max_drawdown = max(stats.max_drawdown, rollup.max_drawdown, peak - rollup.min_equity)
+        peak = max(peak, rollup.max_equity)
+    stats.equity = stats.total_profit
+    stats.peak_equity = peak - opening
+    return stats
@@ -0,0 +1,69 @@
+// static/js/performance.js
+
+// Trade tables and equity charts on the performance pages are filled in from
+// the JSON API after the page has rendered, one page of trades at a time.
+
+function formatPrice(value) {
+    return value ? value.toFixed(5) : 'N/A';
+}
+
+function tradeRow(trade, showStrategy) {
+    const row = document.createElement('tr');
+    const cells = [trade.trade_id];
+    if (showStrategy) {
+        cells.push(trade.strategy);
+    }
+    cells.push(trade.symbol, trade.action, trade.volume, trade.price.toFixed(5), formatPrice(trade.sl), formatPrice(trade.tp));
+    cells.forEach(function(value) {
+        const cell = document.createElement('td');
+        cell.textContent = value;
+        row.appendChild(cell);
+    });
+
+    const profitCell = document.createElement('td');
+    const profit = document.createElement('span');
+    profit.className = trade.profit >= 0 ? 'text-success' : 'text-danger';
+    profit.textContent = (trade.profit >= 0 ? '+' : '') + trade.profit.toFixed(2);
+    profitCell.appendChild(profit);
+    row.appendChild(profitCell);
+
+    const timeCell = document.createElement('td');
+    timeCell.textContent = trade.timestamp;
+    row.appendChild(timeCell);
+    return row;
+}
+
+function initTradeTable(url, tbodyId, buttonId, showStrategy) {
+    const tbody = document.getElementById(tbodyId);
+    const button = document.getElementById(buttonId);
+    let cursor = null;
+
+    function loadPage() {
+        button.disabled = true;
+        const pageUrl = cursor ? url + (url.indexOf('?') < 0 ? '?' : '&') + 'cursor=' + encodeURIComponent(cursor) : url;
+        fetch(pageUrl)
+            .then(function(response) { return response.json(); })
+            .then(function(page) {
+                page.trades.forEach(function(trade) {
+                    tbody.appendChild(tradeRow(trade, showStrategy));
+                });
+                cursor = page.next_cursor;
+                button.disabled = false;
+                button.classList.toggle('d-none', !cursor);
+            });
+    }
+
+    button.addEventListener('click', loadPage);
+    loadPage();
+}
+
+function loadPnlCurve(url, chart) {
+    // One point per hour, day or week bucket: the equity at its close
+    fetch(url)
+        .then(function(response) { return response.json(); })
+        .then(function(pnl) {
+            chart.data.labels = pnl.buckets.map(function(bucket) { return bucket.start; });
+            chart.data.datasets[0].data = pnl.buckets.map(function(bucket) { return bucket.equity; });
+            chart.update();
+        });
+}
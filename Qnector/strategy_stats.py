@@ -0,0 +1,157 @@
+# strategy_stats.py
+import logging
+
+from sqlalchemy import select, delete, case, func
+
+from models import Strategy, StrategyStats, Trade
+from rollups import record_rollups, load_rollups, summarize
+
+logger = logging.getLogger('qnector.stats')
+
+
+def record_trades(session, trades):
+    # Fold newly written trades into their strategies' running aggregates
+    # and PnL rollups. trades are dicts carrying at least strategy_id, profit,
+    # timestamp and id, in the order they were written; the caller commits.
+    by_strategy = {}
+    for trade in trades:
+        by_strategy.setdefault(trade['strategy_id'], []).append(trade)
+
+    existing = session.scalars(
+        select(StrategyStats).where(StrategyStats.strategy_id.in_(list(by_strategy)))
+    ).all()
+    stats_by_id = {stats.strategy_id: stats for stats in existing}
+
+    equity = {}  # Trade.id -> strategy equity after it
+    for strategy_id, strategy_trades in by_strategy.items():
+        stats = stats_by_id.get(strategy_id)
+        if stats is None:
+            stats = StrategyStats(strategy_id=strategy_id)
+            stats.reset()
+            session.add(stats)
+        for trade in strategy_trades:
+            stats.apply(trade['profit'])
+            equity[trade['id']] = stats.equity
+            stats.last_trade_id = max(stats.last_trade_id or 0, trade['id'])
+
+    record_rollups(session, [
+        (trade['strategy_id'], trade['timestamp'], trade['profit'], equity[trade['id']]) for trade in trades
+    ])
+
+
+def adjust_strategy_stats(session, corrections):
+    # Fold corrections to the profit of already counted trades, given as
+    # (strategy_id, old profit, new profit), into their strategies'
+    # aggregates. The equity peak and drawdown depend on every later trade,
+    # so they are read back from the weekly rollups, which must already be
+    # adjusted. The caller commits.
+    by_strategy = {}
+    for strategy_id, old, new in corrections:
+        by_strategy.setdefault(strategy_id, []).append((old, new))
+
+    for stats in session.scalars(select(StrategyStats).where(StrategyStats.strategy_id.in_(list(by_strategy)))):
+        for old, new in by_strategy[stats.strategy_id]:
+            stats.total_profit += new - old
+            stats.equity += new - old
+            stats.sum_sq += new * new - old * old
+            stats.win_count += (new > 0) - (old > 0)
+            stats.loss_count += (new < 0) - (old < 0)
+            stats.loss_sum += min(new, 0.0) - min(old, 0.0)
+            stats.loss_sum_sq += (new * new if new < 0 else 0.0) - (old * old if old < 0 else 0.0)
+        weekly = summarize(load_rollups(session, stats.strategy_id, 'week'))
+        stats.peak_equity = weekly.peak_equity
+        stats.max_drawdown = weekly.max_drawdown
+
+
+def grouped_summary(session, strategy_ids=None):
+    # Aggregates for many strategies in two statements and without building
+    # Trade objects: one GROUP BY for the sums and counts, and one windowed
+    # query for the running equity peak and the deepest drawdown.
+    loss = case((Trade.profit < 0, Trade.profit), else_=None)
+    totals = select(
+        Trade.strategy_id,
+        func.count(Trade.id),
+        func.coalesce(func.sum(Trade.profit), 0.0),
+        func.coalesce(func.sum(Trade.profit * Trade.profit), 0.0),
+        func.sum(case((Trade.profit > 0, 1), else_=0)),
+        func.count(loss),
+        func.coalesce(func.sum(loss), 0.0),
+        func.coalesce(func.sum(loss * loss), 0.0),
+        func.max(Trade.id),
+    ).group_by(Trade.strategy_id)
+
+    window = dict(partition_by=Trade.strategy_id, order_by=(Trade.timestamp, Trade.id), rows=(None, 0))
+    equity = select(
+        Trade.strategy_id.label('strategy_id'),
+        Trade.timestamp.label('timestamp'),
+        Trade.id.label('id'),
+        func.sum(Trade.profit).over(**window).label('equity'),
+    )
+    if strategy_ids is not None:
+        totals = totals.where(Trade.strategy_id.in_(strategy_ids))
+        equity = equity.where(Trade.strategy_id.in_(strategy_ids))
+    equity = equity.subquery()
+    peaks = select(
+        equity.c.strategy_id,
+        equity.c.equity,
+        # SQLite's two-argument max(); the peak starts from zero equity
+        func.max(func.max(equity.c.equity, 0.0)).over(
+            partition_by=equity.c.strategy_id, order_by=(equity.c.timestamp, equity.c.id), rows=(None, 0)
+        ).label('peak'),
+    ).subquery()
+    drawdowns = select(
+        peaks.c.strategy_id,
+        func.max(peaks.c.peak),
+        func.max(peaks.c.peak - peaks.c.equity),
+    ).group_by(peaks.c.strategy_id)
+
+    summary = {}
+    for strategy_id, count, total, sum_sq, wins, losses, loss_sum, loss_sum_sq, last_id in session.execute(totals):
+        stats = StrategyStats(
+            strategy_id=strategy_id, trade_count=count, total_profit=total, sum_sq=sum_sq,
+            win_count=wins, loss_count=losses, loss_sum=loss_sum, loss_sum_sq=loss_sum_sq,
+            equity=total, peak_equity=0.0, max_drawdown=0.0, last_trade_id=last_id
+        )
+        summary[strategy_id] = stats
+    for strategy_id, peak, max_drawdown in session.execute(drawdowns):
+        stats = summary.get(strategy_id)
+        if stats is not None:
+            stats.peak_equity = peak or 0.0
+            stats.max_drawdown = max_drawdown or 0.0
+    return summary
+
+
+def load_dashboard_stats(session):
+    # (strategy, stats) for every strategy in a constant number of statements:
+    # one join for the strategies and their aggregate rows, plus the two
+    # grouped statements for any strategy that has no aggregate row yet.
+    rows = session.query(Strategy, StrategyStats).outerjoin(
+        StrategyStats, StrategyStats.strategy_id == Strategy.id
+    ).order_by(Strategy.id).all()
+
+    missing = [strategy.id for strategy, stats in rows if stats is None]
+    summaries = grouped_summary(session, missing) if missing else {}
+
+    result = []
+    for strategy, stats in rows:
+        if stats is None:
+            stats = summaries.get(strategy.id)
+        if stats is None:
+            stats = StrategyStats(strategy_id=strategy.id)
+            stats.reset()
+        result.append((strategy, stats))
+    return result
+
+
+def rebuild_strategy_stats(session, strategy_ids=None):
+    # Recompute the aggregates from the trade history
+    clear = delete(StrategyStats)
+    if strategy_ids is not None:
+        clear = clear.where(StrategyStats.strategy_id.in_(strategy_ids))
+    session.execute(clear)
+
+    rebuilt = grouped_summary(session, strategy_ids)
+    session.add_all(rebuilt.values())
+    session.commit()
+    logger.info("Rebuilt performance aggregates for %d strategies.", len(rebuilt))
+    return rebuilt
@@ -0,0 +1,308 @@
+# stream_manager.py
+import asyncio
+import json
+import logging
+import random
+import ssl
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from alert_parser import decode_frame, parse_alert, alert_key, AlertParseError
+
+logger = logging.getLogger('qnector.websocket')
+
+PING_MESSAGE = json.dumps({"type": "ping"})
+
+
+class _Stream:
+    # One connection per URL, shared by every strategy listening on it
+    __slots__ = ('key', 'url', 'routes', 'task', 'connection', 'messages', 'unrouted', 'connects',
+                 'state', 'connected_since', 'last_message_at', 'last_error', 'failures', 'pong_waiter', 'missed_pongs',
+                 'blocked')
+
+    def __init__(self, url):
+        # Private pipe URLs carry a token, so logs only show a short label
+        parts = urlsplit(url)
+        self.key = f"{parts.netloc}/...{parts.path[-6:]}"
+        self.url = url
+        self.routes = set()  # alert names subscribed on this connection
+        self.task = None
+        self.connection = None
+        self.messages = 0
+        self.unrouted = 0
+        self.connects = 0
+        self.state = 'connecting'
+        self.connected_since = None
+        self.last_message_at = None
+        self.last_error = None
+        self.failures = 0  # consecutive failed or short-lived connections
+        self.pong_waiter = None
+        self.missed_pongs = 0
+        self.blocked = False  # reading paused by a full alert queue
+
+    def health(self):
+        age = time.monotonic() - self.last_message_at if self.last_message_at is not None else None
+        return {
+            'state': self.state,
+            'connected_since': self.connected_since,
+            'reconnects': max(self.connects - 1, 0),
+            'last_message_age': age,
+            'missed_pongs': self.missed_pongs,
+            'blocked': self.blocked,
+            'last_error': self.last_error,
+        }
+
+
+class StreamManager(threading.Thread):
+    # Runs every strategy's WebSocket on one asyncio loop in a single thread,
+    # with one shared timer sending the heartbeat to all open connections.
+    # Strategies on the same URL share one connection: each frame is parsed
+    # once on the loop, turned into an AlertIntent and pushed onto the
+    # strategy's lane in AlertQueues. Execution happens on the queue workers,
+    # so a slow order_send never holds up reading or heartbeats.
+    #
+    # Dropped connections are retried with jittered exponential backoff. The
+    # heartbeat also sends a protocol ping; a link that misses max_missed_pongs
+    # of them, or stays silent for idle_timeout seconds, is treated as dead.
+    def __init__(self, queues, ping_interval=30, reconnect_delay=1, max_reconnect_delay=60, max_missed_pongs=2,
+                 idle_timeout=0, decode=decode_frame, metrics=None, dedup_content_only=False):
+        super().__init__(name='ws-streams')
+        self.daemon = True
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_missed_pongs = max_missed_pongs
+        self.idle_timeout = idle_timeout
+        self.decode = decode  # frame -> (name, message, fire_id) or None, see alert_parser
+        self.dedup_content_only = dedup_content_only  # Key alerts without a fire id too (see alert_key)
+        self.queues = queues
+        self.metrics = metrics
+        self.loop = asyncio.new_event_loop()
+        self.streams = {}
+        self.started = threading.Event()
+        self.ssl_context = ssl.create_default_context()
+        self.ssl_context.check_hostname = False
+        self.ssl_context.verify_mode = ssl.CERT_NONE
+
+    # ----- public API, callable from any thread -----
+
+    def subscribe(self, url, name, handler, timeout=10):
+        # handler is called as handler(intent, received_at) on a queue worker
+        # for every alert named name that arrives on url.
+        # The connection is opened by the first subscriber.
+        return self._call(self._subscribe(url, name, handler), timeout)
+
+    def unsubscribe(self, url, name, timeout=10):
+        # The connection is closed when its last subscriber leaves
+        return self._call(self._unsubscribe(url, name), timeout)
+
+    def health(self, url):
+        stream = self.streams.get(url)
+        return stream.health() if stream is not None else None
+
+    def stop(self, timeout=10):
+        if self.is_alive():
+            try:
+                self._call(self._close_all(), timeout)
+            finally:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self.join(timeout)
+
+    def stats(self):
+        streams = list(self.streams.values())
+        return {
+            'open': len(streams),
+            'connected': sum(1 for stream in streams if stream.connection is not None),
+            'subscribers': sum(len(stream.routes) for stream in streams),
+            'messages': sum(stream.messages for stream in streams),
+            'unrouted': sum(stream.unrouted for stream in streams),
+            'reconnects': sum(max(stream.connects - 1, 0) for stream in streams),
+        }
+
+    # ----- loop side -----
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        heartbeat = self.loop.create_task(self._heartbeat())
+        self.loop.call_soon(self.started.set)
+        self.loop.run_forever()
+        heartbeat.cancel()
+        self.loop.run_until_complete(asyncio.gather(heartbeat, return_exceptions=True))
+        self.loop.close()
+        logger.info("WebSocket stream manager stopped.")
+
+    def _call(self, coro, timeout):
+        if not self.started.wait(timeout) or not self.is_alive():
+            coro.close()
+            raise RuntimeError("WebSocket stream manager is not running.")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def _subscribe(self, url, name, handler):
+        stream = self.streams.get(url)
+        if stream is None:
+            stream = _Stream(url)
+            stream.task = asyncio.create_task(self._run_stream(stream), name=f'ws-{url}')
+            self.streams[url] = stream
+        stream.routes.add(name)
+        self.queues.register(name, handler)
+
+    async def _unsubscribe(self, url, name):
+        stream = self.streams.get(url)
+        if stream is None or name not in stream.routes:
+            return False
+        stream.routes.discard(name)
+        self.queues.unregister(name)
+        if not stream.routes:
+            await self._close(url)
+        return True
+
+    async def _close(self, key):
+        stream = self.streams.pop(key, None)
+        if stream is None:
+            return False
+        stream.task.cancel()
+        await asyncio.gather(stream.task, return_exceptions=True)
+        return True
+
+    async def _close_all(self):
+        await asyncio.gather(*(self._close(key) for key in list(self.streams)))
+
+    async def _run_stream(self, stream):
+        ssl_context = self.ssl_context if stream.url.startswith('wss://') else None
+        while True:
+            stream.state = 'connecting'
+            opened_at = None
+            try:
+                async with connect(stream.url, ssl=ssl_context, ping_interval=None, close_timeout=2) as connection:
+                    opened_at = time.monotonic()
+                    stream.connection = connection
+                    stream.connects += 1
+                    stream.state = 'connected'
+                    stream.connected_since = datetime.utcnow()
+                    stream.last_message_at = opened_at
+                    stream.pong_waiter = None
+                    stream.missed_pongs = 0
+                    logger.info("WebSocket connection opened for %s", stream.key)
+                    async for message in connection:
+                        received_at = time.perf_counter()
+                        stream.last_message_at = time.monotonic()
+                        stream.messages += 1
+                        routed = self._route(stream, message, received_at)
+                        if routed is None:
+                            continue
+                        name, intent = routed
+                        # Under the 'block' policy a full lane pauses reading
+                        # this socket until a worker catches up.
+                        while not self.queues.offer(name, intent, received_at):
+                            if self.queues.policy != 'block' or name not in stream.routes:
+                                break
+                            stream.blocked = True
+                            await asyncio.sleep(0.005)
+                        if stream.blocked:
+                            stream.blocked = False
+                            stream.last_message_at = time.monotonic()
+                stream.last_error = 'closed by server'
+            except ConnectionClosed as e:
+                stream.last_error = str(e)
+                logger.debug("WebSocket connection closed for %s: %s", stream.key, e)
+            except Exception as e:
+                stream.last_error = str(e)
+                logger.error("Unexpected error on WebSocket for %s: %s", stream.key, e)
+            finally:
+                stream.connection = None
+                stream.connected_since = None
+                stream.blocked = False
+
+            # A connection that stayed up for a heartbeat or more resets the
+            # backoff; one that failed or dropped straight away extends it.
+            if opened_at is not None and time.monotonic() - opened_at >= self.ping_interval:
+                stream.failures = 0
+            delay = self._backoff(stream.failures)
+            stream.failures += 1
+            stream.state = 'backoff'
+            logger.info("Attempting to reconnect %s in %.1f seconds...", stream.key, delay)
+            await asyncio.sleep(delay)
+
+    def _backoff(self, failures):
+        # Equal jitter: half the exponential step is fixed, half is random, so
+        # retries never hot-spin and strategies sharing an outage spread out.
+        step = min(self.max_reconnect_delay, self.reconnect_delay * 2 ** min(failures, 16))
+        return step / 2 + random.uniform(0, step / 2)
+
+    def _route(self, stream, message, received_at):
+        try:
+            alert = self.decode(message)
+        except ValueError:
+            logger.warning("Received non-JSON message. Ignoring.")
+            return None
+        if alert is None:
+            return None
+
+        alert_name, alert_message, fire_id = alert
+        started = time.perf_counter()
+        routed = alert_name in stream.routes
+        matched = time.perf_counter()
+        if not routed:
+            stream.unrouted += 1
+            logger.warning("No running strategy named '%s' on %s. Ignoring this alert.", alert_name, stream.key)
+            return None
+
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.increment(alert_name, 'received')
+            metrics.observe(alert_name, 'name_match', matched - started)
+        try:
+            intent = parse_alert(alert_message, alert_name)
+            intent.key = alert_key(alert_name, alert_message, fire_id, self.dedup_content_only)
+        except AlertParseError as e:
+            if metrics is not None:
+                metrics.increment(alert_name, 'ignored')
+            logger.warning("%s", e)
+            return None
+        if metrics is not None:
+            metrics.observe(alert_name, 'decode', time.perf_counter() - received_at)
+        return alert_name, intent
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            now = time.monotonic()
+            streams = []
+            for stream in self.streams.values():
+                if stream.connection is None:
+                    continue
+                if stream.blocked:
+                    # Pongs queue up behind the frames we are holding back,
+                    # so silence here says nothing about the link.
+                    stream.pong_waiter = None
+                    stream.missed_pongs = 0
+                    streams.append(stream)
+                    continue
+                if stream.pong_waiter is not None and not stream.pong_waiter.done():
+                    stream.missed_pongs += 1
+                else:
+                    stream.missed_pongs = 0
+                idle = now - stream.last_message_at
+                if stream.missed_pongs >= self.max_missed_pongs or (self.idle_timeout and idle > self.idle_timeout):
+                    logger.warning("WebSocket for %s looks dead (%d missed pongs, idle %.0f s). Reconnecting.",
+                                   stream.key, stream.missed_pongs, idle)
+                    stream.connection.transport.abort()
+                    continue
+                streams.append(stream)
+
+            results = await asyncio.gather(*(self._ping(stream) for stream in streams), return_exceptions=True)
+            for stream, result in zip(streams, results):
+                if isinstance(result, Exception):
+                    logger.error("Failed to send ping for %s: %s", stream.key, result)
+
+    @staticmethod
+    async def _ping(stream):
+        connection = stream.connection
+        await connection.send(PING_MESSAGE)
+        if stream.pong_waiter is None or stream.pong_waiter.done():
+            stream.pong_waiter = await connection.ping()
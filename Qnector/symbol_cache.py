@@ -0,0 +1,210 @@
+# symbol_cache.py
+import logging
+import threading
+import time
+
+from broker import NotLoggedIn
+
+logger = logging.getLogger('qnector.symbols')
+
+
+class SymbolMeta:
+    __slots__ = ('name', 'digits', 'point', 'volume_min', 'volume_max', 'volume_step', 'filling_mode', 'expires_at')
+
+    def __init__(self, info, expires_at):
+        self.name = info.name
+        self.digits = info.digits
+        self.point = 10 ** -info.digits
+        self.volume_min = info.volume_min
+        self.volume_max = info.volume_max
+        self.volume_step = getattr(info, 'volume_step', 0.01)
+        self.filling_mode = getattr(info, 'filling_mode', 0)
+        self.expires_at = expires_at
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at')
+
+    def __init__(self, value, expires_at):
+        self.value = value
+        self.expires_at = expires_at
+
+
+class SymbolCache:
+    # Symbol metadata only changes when the broker edits contract specs, so it
+    # is kept for minutes. Ticks used for FX conversion and the account balance
+    # are kept for a few seconds and refreshed in the background through the
+    # execution broker, which leaves the live tick for the traded symbol as
+    # the only MT5 round trip an alert has to make before order_send.
+    def __init__(self, broker, metadata_ttl=300.0, tick_ttl=10.0, account_ttl=15.0, refresh_interval=5.0):
+        self.broker = broker
+        self.metadata_ttl = metadata_ttl
+        self.tick_ttl = tick_ttl
+        self.account_ttl = account_ttl
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.symbols = {}       # (server, symbol) -> SymbolMeta
+        self.conversions = {}   # (server, account_ccy, quote_ccy) -> _Entry((pair, inverse))
+        self.ticks = {}         # (server, symbol) -> _Entry(tick)
+        self.accounts = {}      # account -> _Entry(account_info)
+        self.registered = {}    # account -> number of strategies using it
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # ----- lookups (called from inside broker jobs) -----
+
+    def symbol_meta(self, mt5, account, symbol):
+        key = (account.server, symbol)
+        now = time.monotonic()
+        meta = self.symbols.get(key)
+        if meta is not None and meta.expires_at > now:
+            return meta
+
+        info = mt5.symbol_info(symbol)
+        if info is None:
+            logger.error("Symbol %s not found in MT5.", symbol)
+            return None
+        if not info.select and not mt5.symbol_select(symbol, True):
+            logger.error("Failed to select symbol %s.", symbol)
+            return None
+
+        meta = SymbolMeta(info, now + self.metadata_ttl)
+        with self.lock:
+            self.symbols[key] = meta
+        return meta
+
+    def account_info(self, mt5, account):
+        now = time.monotonic()
+        entry = self.accounts.get(account)
+        if entry is not None and entry.expires_at > now:
+            return entry.value
+
+        info = mt5.account_info()
+        if info is not None:
+            with self.lock:
+                self.accounts[account] = _Entry(info, now + self.account_ttl)
+        return info
+
+    def tick(self, mt5, account, symbol):
+        key = (account.server, symbol)
+        now = time.monotonic()
+        entry = self.ticks.get(key)
+        if entry is not None and entry.expires_at > now:
+            return entry.value
+
+        tick = mt5.symbol_info_tick(symbol)
+        if tick is not None:
+            with self.lock:
+                self.ticks[key] = _Entry(tick, now + self.tick_ttl)
+        return tick
+
+    def conversion_rate(self, mt5, account, account_currency, quote_currency):
+        # Price of one unit of the quote currency expressed the way the
+        # original pip-value formula expects (ACCQUOTE ask, or 1 / QUOTEACC bid).
+        key = (account.server, account_currency, quote_currency)
+        now = time.monotonic()
+        entry = self.conversions.get(key)
+        if entry is None or entry.expires_at <= now:
+            pair = self._resolve_conversion(mt5, account_currency, quote_currency)
+            entry = _Entry(pair, now + self.metadata_ttl)
+            with self.lock:
+                self.conversions[key] = entry
+        if entry.value is None:
+            return None
+
+        exchange_symbol, inverse = entry.value
+        tick = self.tick(mt5, account, exchange_symbol)
+        if tick is None:
+            logger.error("Failed to get tick information for %s.", exchange_symbol)
+            return None
+        return 1 / tick.bid if inverse else tick.ask
+
+    def _resolve_conversion(self, mt5, account_currency, quote_currency):
+        exchange_symbol = account_currency + quote_currency
+        if mt5.symbol_info(exchange_symbol) is not None:
+            return exchange_symbol, False
+        reverse_exchange_symbol = quote_currency + account_currency
+        if mt5.symbol_info(reverse_exchange_symbol) is not None:
+            return reverse_exchange_symbol, True
+        logger.error("Neither %s nor %s found in MT5.", exchange_symbol, reverse_exchange_symbol)
+        return None
+
+    # ----- invalidation -----
+
+    def invalidate(self, account=None, symbol=None):
+        with self.lock:
+            if account is None and symbol is None:
+                self.symbols.clear()
+                self.conversions.clear()
+                self.ticks.clear()
+                self.accounts.clear()
+                return
+            if account is not None and symbol is None:
+                self.accounts.pop(account, None)
+                return
+            server = account.server if account is not None else None
+            for cache in (self.symbols, self.ticks):
+                for key in [k for k in cache if k[1] == symbol and (server is None or k[0] == server)]:
+                    del cache[key]
+
+    # ----- background refresh -----
+
+    def register(self, account):
+        with self.lock:
+            self.registered[account] = self.registered.get(account, 0) + 1
+
+    def registered_accounts(self):
+        with self.lock:
+            return list(self.registered)
+
+    def unregister(self, account):
+        with self.lock:
+            count = self.registered.get(account, 0) - 1
+            if count > 0:
+                self.registered[account] = count
+            else:
+                self.registered.pop(account, None)
+                self.accounts.pop(account, None)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._refresh_loop, name='symbol-cache', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(self.refresh_interval)
+
+    def _refresh_loop(self):
+        while not self.stop_event.wait(self.refresh_interval):
+            with self.lock:
+                accounts = list(self.registered)
+            for account in accounts:
+                try:
+                    self.broker.call(account, self._refresh_account, account, timeout=self.refresh_interval * 2,
+                                     background=True)
+                except NotLoggedIn:
+                    pass  # Refreshed while its account is logged in; entries expire meanwhile
+                except Exception as e:
+                    logger.warning("Background refresh for MT5 account %s failed: %s", account.login, e)
+
+    def _refresh_account(self, mt5, account):
+        now = time.monotonic()
+        info = mt5.account_info()
+        updates = {}
+        if info is not None:
+            updates[account] = _Entry(info, now + self.account_ttl)
+
+        # Keep the conversion ticks for this server warm
+        ticks = {}
+        for (server, _, _), entry in list(self.conversions.items()):
+            if server != account.server or entry.value is None:
+                continue
+            exchange_symbol = entry.value[0]
+            tick = mt5.symbol_info_tick(exchange_symbol)
+            if tick is not None:
+                ticks[(server, exchange_symbol)] = _Entry(tick, now + self.tick_ttl)
+
+        with self.lock:
+            self.accounts.update(updates)
+            self.ticks.update(ticks)
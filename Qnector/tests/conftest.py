@@ -0,0 +1,80 @@
+# tests/conftest.py
+import configparser
+import os
+import sys
+import threading
+
+import pytest
+
+QNECTOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, QNECTOR_DIR)
+
+
+class RecordingMT5:
+    # Stands in for the MetaTrader5 module and records every call made on it,
+    # in order, as (name, args) tuples. gate, when cleared, holds order_send
+    # until the test sets it; blocked is set once order_send is held there.
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.gate = threading.Event()
+        self.gate.set()
+        self.blocked = threading.Event()
+
+    def _record(self, name, *args):
+        with self.lock:
+            self.calls.append((name,) + args)
+
+    def names(self):
+        with self.lock:
+            return [call[0] for call in self.calls]
+
+    def initialize(self, path=None, **kwargs):
+        self._record('initialize', path)
+        return True
+
+    def login(self, login, password=None, server=None, **kwargs):
+        self._record('login', login, server)
+        return True
+
+    def shutdown(self):
+        self._record('shutdown')
+
+    def last_error(self):
+        return (0, 'ok')
+
+    def order_send(self, request):
+        if not self.gate.is_set():
+            self.blocked.set()
+        self.gate.wait()
+        self._record('order_send', request)
+        return request
+
+
+@pytest.fixture
+def mt5():
+    return RecordingMT5()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # The web app on an empty database of its own, without the trading engine
+    config = configparser.ConfigParser()
+    config.read(os.path.join(QNECTOR_DIR, 'config.ini'))
+    config['DEFAULT']['Log_File'] = str(tmp_path / 'qnector.log')
+    config_file = tmp_path / 'config.ini'
+    with open(config_file, 'w') as f:
+        config.write(f)
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'strategies.db'}")
+
+    import app as qnector
+    from models import db
+    from response_cache import page_cache
+
+    flask_app = qnector.create_app(str(config_file))
+    flask_app.config['TESTING'] = True
+    qnector.prepare_database(flask_app)
+    page_cache.invalidate()
+    yield flask_app
+    with flask_app.app_context():
+        db.engine.dispose()
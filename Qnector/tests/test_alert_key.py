@@ -0,0 +1,33 @@
+# tests/test_alert_key.py
+import json
+from types import SimpleNamespace
+
+from alert_parser import alert_key
+from stream_manager import StreamManager
+
+
+def frame(message, **tags):
+    return json.dumps({'text': {'content': {'p': dict(name='s1', message=message, **tags)}}})
+
+
+def route(manager, message):
+    stream = SimpleNamespace(routes={'s1': None}, unrouted=0, key='ws://x')
+    return manager._route(stream, message, 0.0)[1].key
+
+
+def test_alerts_without_a_fire_id_are_not_keyed():
+    assert alert_key('s1', 'buy EURUSD 20 40') is None
+    assert alert_key('s1', 'buy EURUSD 20 40', '7:1') != alert_key('s1', 'buy EURUSD 20 40', '7:2')
+    assert alert_key('s1', 'buy EURUSD 20 40', content_only=True) == alert_key('s1', 'buy EURUSD 20 40', content_only=True)
+
+
+def test_stream_keys_content_only_alerts_when_configured():
+    plain = StreamManager(queues=None)
+    content = StreamManager(queues=None, dedup_content_only=True)
+    try:
+        assert route(plain, frame('buy EURUSD 20 40')) is None
+        assert route(plain, frame('buy EURUSD 20 40', aid=7, fire_time=1)) is not None
+        assert route(content, frame('buy EURUSD 20 40')) == route(content, frame('buy EURUSD 20 40'))
+    finally:
+        plain.loop.close()
+        content.loop.close()
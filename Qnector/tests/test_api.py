@@ -0,0 +1,77 @@
+# tests/test_api.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from models import db, Strategy, Trade
+from rollups import rebuild_rollups
+
+
+def populate():
+    db.session.execute(insert(Strategy), [dict(
+        id=1, name='strategy-1', risk_percentage=1, mt5_id='1', password='x', server='x', directory='x',
+        websocket_url='ws://x', commission=4, status='Inactive'
+    )])
+    db.session.execute(insert(Trade), [
+        dict(strategy_id=1, trade_id=n + 1, symbol='EURUSD', action='BUY', volume=0.1, price=1.1, profit=1.0,
+             timestamp=timestamp)
+        for n, timestamp in enumerate([
+            datetime(2026, 1, 30, 12), datetime(2026, 1, 31, 0), datetime(2026, 1, 31, 23, 59),
+            datetime(2026, 2, 1, 0), datetime(2026, 2, 2, 9),
+        ])
+    ])
+    db.session.commit()
+
+
+def trade_ids(client, url):
+    ids = []
+    while url:
+        page = client.get(url).get_json()
+        ids += [trade['trade_id'] for trade in page['trades']]
+        url = page['next_cursor'] and f"{url.split('&cursor=')[0]}&cursor={page['next_cursor']}"
+    return ids
+
+
+def test_trade_pages_follow_the_date_range(app):
+    with app.app_context():
+        populate()
+    client = app.test_client()
+    # A plain end date includes that whole day
+    assert trade_ids(client, '/api/strategies/1/trades?start=2026-01-31&end=2026-01-31&limit=1') == [2, 3]
+    assert trade_ids(client, '/api/portfolio/trades?start=2026-01-31&end=2026-02-01&limit=2') == [2, 3, 4]
+    # An end with a time stays exclusive
+    assert trade_ids(client, '/api/strategies/1/trades?end=2026-02-01T00:00') == [1, 2, 3]
+    assert client.get('/api/strategies/1/trades?end=tomorrow').status_code == 400
+
+
+def test_trade_page_size_is_at_least_one(app):
+    with app.app_context():
+        populate()
+    client = app.test_client()
+    for limit in (0, -1):
+        page = client.get(f'/api/strategies/1/trades?limit={limit}').get_json()
+        assert [trade['trade_id'] for trade in page['trades']] == [1]
+        assert page['next_cursor'] is not None
+
+
+def test_pnl_curve_is_reduced_to_the_points_asked_for(app):
+    with app.app_context():
+        db.session.execute(insert(Strategy), [dict(
+            id=1, name='strategy-1', risk_percentage=1, mt5_id='1', password='x', server='x', directory='x',
+            websocket_url='ws://x', commission=4, status='Inactive'
+        )])
+        db.session.execute(insert(Trade), [
+            dict(strategy_id=1, trade_id=n + 1, symbol='EURUSD', action='BUY', volume=0.1, price=1.1,
+                 profit=-500.0 if n == 700 else 1.0, timestamp=datetime(2026, 1, 1) + timedelta(hours=n))
+            for n in range(2000)
+        ])
+        rebuild_rollups(db.session)
+        db.session.commit()
+    client = app.test_client()
+    pnl = client.get('/api/strategies/1/pnl?resolution=hour&points=100').get_json()
+    assert pnl['total_buckets'] == 2000
+    assert len(pnl['buckets']) <= 100
+    starts = [bucket['start'] for bucket in pnl['buckets']]
+    assert starts == sorted(starts)
+    assert starts[0] == '2026-01-01 00:00' and starts[-1] == '2026-03-25 07:00'
+    assert '2026-01-30 04:00' in starts  # The drawdown's low
@@ -0,0 +1,93 @@
+# tests/test_broker.py
+import threading
+
+import pytest
+
+from broker import BrokerError, ExecutionBroker, MT5Account, NotLoggedIn
+
+ALICE = MT5Account(1, 'p', 'server-a', 'C:/mt5')
+BOB = MT5Account(2, 'p', 'server-a', 'C:/mt5')
+
+
+@pytest.fixture
+def broker(mt5):
+    broker = ExecutionBroker(mt5, poll_interval=0.05)
+    broker.start()
+    yield broker
+    mt5.gate.set()
+    broker.stop()
+
+
+def send(mt5, order):
+    return mt5.order_send(order)
+
+
+def test_jobs_run_in_order_with_one_login_per_account(broker, mt5):
+    futures = [broker.submit(account, send, n) for n, account in enumerate([ALICE, ALICE, BOB, BOB])]
+    assert [future.result(5) for future in futures] == [0, 1, 2, 3]
+    assert mt5.names() == ['initialize', 'login', 'order_send', 'order_send', 'login', 'order_send', 'order_send']
+
+
+def test_background_jobs_wait_for_alerts_and_never_switch_accounts(broker, mt5):
+    broker.call(ALICE, send, 'login')
+    mt5.gate.clear()
+    broker.submit(ALICE, send, 'running')
+    mt5.blocked.wait(5)
+    background = [broker.submit(account, send, f'sync-{account.login}', background=True) for account in (ALICE, BOB)]
+    alert = broker.submit(ALICE, send, 'alert')
+    mt5.gate.set()
+
+    assert alert.result(5) == 'alert'
+    assert background[0].result(5) == 'sync-1'
+    with pytest.raises(NotLoggedIn):
+        background[1].result(5)
+    sends = [call[1] for call in mt5.calls if call[0] == 'order_send']
+    assert sends == ['login', 'running', 'alert', 'sync-1']
+    assert mt5.names().count('login') == 1
+
+
+def test_stop_runs_jobs_queued_before_it_and_rejects_later_ones(broker, mt5):
+    mt5.gate.clear()
+    queued = [broker.submit(ALICE, send, n) for n in range(3)]
+    stopper = threading.Thread(target=broker.stop)
+    stopper.start()
+    while not broker.closed:
+        pass
+    late = broker.submit(ALICE, send, 'late')
+    mt5.gate.set()
+    stopper.join(5)
+
+    assert [future.result(5) for future in queued] == [0, 1, 2]
+    with pytest.raises(BrokerError):
+        late.result(5)
+    with pytest.raises(BrokerError):
+        broker.call(ALICE, send, 'after')
+    assert ('order_send', 'late') not in mt5.calls
+    assert mt5.names()[-1] == 'shutdown'
+
+
+def test_queued_jobs_behind_a_stop_are_failed(mt5):
+    broker = ExecutionBroker(mt5, poll_interval=0.05)
+    broker.start()
+    mt5.gate.clear()
+    broker.submit(ALICE, send, 'running')
+    mt5.blocked.wait(5)
+    stuck = broker.submit(ALICE, send, 'stuck')
+    broker.stop(timeout=0.2)  # The worker is still in order_send; stop gives up waiting
+    with pytest.raises(BrokerError):
+        stuck.result(1)
+    mt5.gate.set()
+    broker.join(5)
+    assert not broker.is_alive()
+    assert ('order_send', 'stuck') not in mt5.calls
+
+
+def test_call_timeout_withdraws_a_job_that_has_not_started(broker, mt5):
+    mt5.gate.clear()
+    blocker = broker.submit(ALICE, send, 'blocker')
+    with pytest.raises(BrokerError, match='did not start'):
+        broker.call(ALICE, send, 'withdrawn', timeout=0.2)
+    mt5.gate.set()
+    assert blocker.result(5) == 'blocker'
+    assert broker.call(ALICE, send, 'next', timeout=5) == 'next'
+    assert ('order_send', 'withdrawn') not in mt5.calls
@@ -0,0 +1,34 @@
+# tests/test_engine.py
+from engine import Engine
+from models import db, EngineStatus
+
+
+class FakePipeline:
+    def __init__(self):
+        self.websocket_handlers = {1: object(), 2: object()}
+        self.stopped = []
+
+    def handler_health(self):
+        return {}
+
+    def stop_handler(self, strategy_id):
+        self.stopped.append(strategy_id)
+        return self.websocket_handlers.pop(strategy_id, None) is not None
+
+
+def test_engine_that_loses_its_row_stops_its_strategies(app):
+    pipeline = FakePipeline()
+    engine = Engine(app, pipeline, poll_interval=0.05, heartbeat_interval=0.05)
+    engine.claim()
+    engine.start_heartbeat()
+    engine.start()
+    with app.app_context():
+        db.session.get(EngineStatus, 1).instance = 'another-engine'
+        db.session.commit()
+
+    engine.join(5)
+    assert not engine.is_alive()
+    assert engine.lost.is_set()
+    assert sorted(pipeline.stopped) == [1, 2]
+    with app.app_context():
+        assert db.session.get(EngineStatus, 1).instance == 'another-engine'  # Not released
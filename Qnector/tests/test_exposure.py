@@ -0,0 +1,54 @@
+# tests/test_exposure.py
+import time
+from types import SimpleNamespace
+
+from broker import MT5Account
+from exposure import ExposureBook
+
+MAGIC = 234000
+COMMENT = 'TradingView Alert: GoldScalper-'  # Both strategies' comments, as cut by MT5
+
+
+class FakeTerminal:
+    def __init__(self, positions, deals):
+        self.positions = positions
+        self.deals = deals
+
+    def positions_get(self):
+        return self.positions
+
+    def history_deals_get(self, start, end):
+        return self.deals
+
+    def last_error(self):
+        return (0, 'ok')
+
+
+def position(ticket, symbol, volume, profit):
+    return SimpleNamespace(ticket=ticket, magic=MAGIC, symbol=symbol, volume=volume, profit=profit, comment=COMMENT)
+
+
+def deal(position_id, profit):
+    return SimpleNamespace(position_id=position_id, magic=MAGIC, profit=profit, commission=-1.0, swap=0.0,
+                           time_msc=int(time.time() * 1000), comment=COMMENT)
+
+
+def test_positions_and_deals_follow_claimed_tickets():
+    account = MT5Account(1, 'x', 'server', 'terminal')
+    book = ExposureBook(broker=None, magic=MAGIC)
+    book.register(account, 1, tickets={10})
+    book.register(account, 2)
+    book.opened(account, 2, 20, 'XAUUSD', 0.5)
+    book.claim(account, 2, 30)  # Pending order
+
+    terminal = FakeTerminal(
+        positions=[position(20, 'XAUUSD', 0.5, -5.0), position(30, 'XAUUSD', 0.2, 1.0), position(40, 'XAUUSD', 1.0, 0.0)],
+        deals=[deal(10, -40.0), deal(50, -100.0)],
+    )
+    book.sync_account(terminal, account)
+
+    accounts = book.accounts[account]
+    assert accounts.open_trades == {2: 2, None: 1}
+    assert accounts.symbol_lots == {'XAUUSD': 1.7}
+    assert accounts.realized == {1: -41.0, None: -101.0}
+    assert accounts.account_realized == -142.0
@@ -0,0 +1,110 @@
+# tests/test_journal.py
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from journal import TradeJournal
+from models import db, Strategy, Trade
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / 'journal.db'
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Strategy(id=1, name='s1', risk_percentage=1, mt5_id='1', password='p', server='x', directory='d',
+                             websocket_url='ws://x', commission=4))
+        session.commit()
+    yield path, engine
+    engine.dispose()
+
+
+def trade(trade_id, **fields):
+    row = dict(strategy_id=1, trade_id=trade_id, symbol='EURUSD', action='BUY', volume=0.1, price=1.1, sl=None, tp=None,
+               profit=0.0, timestamp=datetime(2026, 1, 1, 12, trade_id))
+    row.update(fields)
+    return row
+
+
+def trade_ids(engine):
+    with Session(engine) as session:
+        return sorted(session.scalars(select(Trade.trade_id)))
+
+
+def test_locked_database_is_retried_until_the_batch_is_written(database):
+    path, engine = database
+    blocker = sqlite3.connect(path)
+    blocker.execute('BEGIN IMMEDIATE')  # Holds the write lock
+    journal = TradeJournal(f'sqlite:///{path}', flush_interval=0.05, sqlite_options={'busy_timeout_ms': 20})
+    journal.start()
+    journal.record(**trade(1))
+    journal.record(**trade(2))
+
+    deadline = time.monotonic() + 5
+    while journal.stats()['commit_retries'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    blocker.rollback()
+    blocker.close()
+    journal.stop()
+
+    stats = journal.stats()
+    assert stats['commit_retries'] >= 2
+    assert stats['rows_dropped'] == 0
+    assert trade_ids(engine) == [1, 2]
+
+
+def test_only_rows_the_database_rejects_are_dropped(database):
+    path, engine = database
+    journal = TradeJournal(f'sqlite:///{path}', flush_interval=0.2)
+    journal.start()
+    journal.record(**trade(1))
+    journal.record(**trade(2, symbol=None))  # NOT NULL
+    journal.record(**trade(3))
+    journal.stop()
+
+    stats = journal.stats()
+    assert stats['rows_dropped'] == 1
+    assert stats['rows_written'] == 2
+    assert trade_ids(engine) == [1, 3]
+
+
+def test_a_missing_table_is_not_retried(database):
+    path, engine = database
+    with engine.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE processed_alert')  # As if a migration never ran
+    journal = TradeJournal(f'sqlite:///{path}', flush_interval=0.05)
+    journal.start()
+    journal.record_alert(key='a', strategy_id=1, seen_at=datetime(2026, 1, 1))
+    journal.record(**trade(1))
+    started = time.monotonic()
+    journal.stop(timeout=5)
+
+    assert time.monotonic() - started < 2
+    stats = journal.stats()
+    assert stats['commit_retries'] == 0
+    assert stats['rows_dropped'] == 2  # The pruning of the missing table fails the trade's write too
+
+
+def test_stop_returns_while_a_full_queue_is_stuck_on_a_lock(database):
+    path, engine = database
+    blocker = sqlite3.connect(path)
+    blocker.execute('BEGIN IMMEDIATE')
+    journal = TradeJournal(f'sqlite:///{path}', max_queue=2, batch_size=1, flush_interval=0.01, put_timeout=0.01,
+                           sqlite_options={'busy_timeout_ms': 20})
+    journal.start()
+    for trade_id in range(1, 6):
+        journal.record(**trade(trade_id))
+
+    started = time.monotonic()
+    journal.stop(timeout=1)
+    assert time.monotonic() - started < 2
+    journal.join(2)  # Drops what is left instead of waiting for the lock
+    assert not journal.is_alive()
+    blocker.rollback()
+    blocker.close()
+    assert journal.stats()['rows_written'] == 0
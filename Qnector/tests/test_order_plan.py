@@ -0,0 +1,21 @@
+# tests/test_order_plan.py
+from types import SimpleNamespace
+
+from order_plan import OrderPlan
+
+# Only the names the MetaTrader5 package exports; no SYMBOL_FILLING_* flags
+MT5 = SimpleNamespace(ORDER_FILLING_FOK=0, ORDER_FILLING_IOC=1, ORDER_FILLING_RETURN=2, ORDER_TIME_GTC=0,
+                      TRADE_ACTION_DEAL=1, TRADE_ACTION_PENDING=5)
+
+
+def plan(filling_mode):
+    meta = SimpleNamespace(name='EURUSD', digits=5, point=0.00001, volume_min=0.01, volume_max=100.0,
+                           volume_step=0.01, filling_mode=filling_mode)
+    return OrderPlan(MT5, meta, magic=1, comment='test')
+
+
+def test_market_orders_use_a_fill_policy_the_symbol_allows():
+    assert plan(3).market['type_filling'] == MT5.ORDER_FILLING_IOC
+    assert plan(2).market['type_filling'] == MT5.ORDER_FILLING_IOC
+    assert plan(1).market['type_filling'] == MT5.ORDER_FILLING_FOK
+    assert plan(0).market['type_filling'] == MT5.ORDER_FILLING_RETURN
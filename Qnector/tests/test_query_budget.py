@@ -0,0 +1,50 @@
+# tests/test_query_budget.py
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from models import db, Strategy, Trade, count_queries
+from response_cache import page_cache
+from rollups import rebuild_rollups
+from strategy_stats import rebuild_strategy_stats
+
+# Statements per page, whatever the number of strategies or trades. Each
+# includes the page cache's data version check.
+BUDGET = {'/': 3, '/performance/1': 3, '/portfolio': 3}
+
+
+def populate(strategy_count, trades_per_strategy=50):
+    rng = random.Random(7)
+    start = datetime(2026, 1, 5)
+    db.session.execute(insert(Strategy), [
+        dict(id=i, name=f'strategy-{i}', risk_percentage=1, mt5_id='1', password='x', server='x', directory='x',
+             websocket_url='ws://x', commission=4, status='Inactive')
+        for i in range(1, strategy_count + 1)
+    ])
+    db.session.execute(insert(Trade), [
+        dict(strategy_id=i, trade_id=i * trades_per_strategy + n, symbol='EURUSD', action='BUY', volume=0.1, price=1.1,
+             sl=1.09, tp=1.12, profit=rng.gauss(5, 50), timestamp=start + timedelta(hours=n))
+        for i in range(1, strategy_count + 1) for n in range(trades_per_strategy)
+    ])
+    rebuild_rollups(db.session)
+    rebuild_strategy_stats(db.session)  # Commits
+
+
+def statements(app, url):
+    page_cache.invalidate()  # Measure the view, not the cache
+    page_cache.next_poll = 0.0  # and always count the cache's own version check
+    client = app.test_client()
+    with app.app_context(), count_queries(db.engine) as executed:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(executed)
+
+
+@pytest.mark.parametrize('url', sorted(BUDGET))
+@pytest.mark.parametrize('strategy_count', [1, 25])
+def test_page_stays_within_query_budget(app, url, strategy_count):
+    with app.app_context():
+        populate(strategy_count)
+    assert statements(app, url) <= BUDGET[url]
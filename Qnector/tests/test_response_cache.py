@@ -0,0 +1,43 @@
+# tests/test_response_cache.py
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import data_versions
+from models import db, Strategy
+from response_cache import ALL, PageCache, page_cache
+
+
+def add_strategy():
+    db.session.execute(insert(Strategy), [dict(
+        id=1, name='strategy-1', risk_percentage=1, mt5_id='1', password='x', server='x', directory='x',
+        websocket_url='ws://x', commission=4, status='Inactive'
+    )])
+    db.session.commit()
+
+
+def test_revalidation_follows_the_etag_only(app):
+    with app.app_context():
+        add_strategy()
+    client = app.test_client()
+    first = client.get('/portfolio')
+    assert first.status_code == 200
+    etag, modified = first.headers['ETag'], first.headers['Last-Modified']
+    assert client.get('/portfolio', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():  # A write within the same second as the page
+        db.session.get(Strategy, 1).updated_date = datetime.utcnow()
+        db.session.commit()
+    page_cache.invalidate([1])
+    assert client.get('/portfolio', headers={'If-None-Match': etag}).status_code == 200
+    assert client.get('/portfolio', headers={'If-Modified-Since': modified}).status_code == 200
+
+
+def test_every_worker_hands_out_the_same_etag(app):
+    with app.app_context():
+        add_strategy()
+        worker = PageCache()
+        worker.watch(data_versions)
+        page_cache.invalidate()
+        for scope in (ALL, 1, 2):
+            assert worker.validators(scope) == page_cache.validators(scope)
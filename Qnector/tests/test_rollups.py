@@ -0,0 +1,63 @@
+# tests/test_rollups.py
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, update
+
+from models import db, PnlRollup, Strategy, StrategyStats, Trade
+from rollups import adjust_rollups, rebuild_rollups
+from strategy_stats import adjust_strategy_stats, rebuild_strategy_stats
+
+STATS = ('trade_count', 'total_profit', 'sum_sq', 'win_count', 'loss_count', 'loss_sum', 'loss_sum_sq', 'equity',
+         'peak_equity', 'max_drawdown')
+ROLLUP = ('pnl', 'trade_count', 'win_count', 'loss_count', 'sum_sq', 'loss_sum', 'loss_sum_sq', 'min_equity',
+          'max_equity', 'max_drawdown', 'close_equity')
+
+
+def populate():
+    rng = random.Random(11)
+    start = datetime(2026, 1, 5)
+    db.session.execute(insert(Strategy), [
+        dict(id=i, name=f'strategy-{i}', risk_percentage=1, mt5_id='1', password='x', server='x', directory='x',
+             websocket_url='ws://x', commission=4, status='Inactive')
+        for i in (1, 2)
+    ])
+    db.session.execute(insert(Trade), [
+        dict(strategy_id=1 + n % 2, trade_id=n + 1, symbol='EURUSD', action='BUY', volume=0.1, price=1.1,
+             sl=1.09, tp=1.12, profit=rng.gauss(0, 50), timestamp=start + timedelta(hours=7 * n))
+        for n in range(120)  # Five weeks
+    ])
+    rebuild_rollups(db.session)
+    rebuild_strategy_stats(db.session)  # Commits
+
+
+def snapshot():
+    rollups = {
+        (row.strategy_id, row.resolution, row.bucket_start): tuple(round(getattr(row, c), 6) for c in ROLLUP)
+        for row in db.session.scalars(select(PnlRollup))
+    }
+    stats = {
+        row.strategy_id: tuple(round(getattr(row, c), 6) for c in STATS)
+        for row in db.session.scalars(select(StrategyStats))
+    }
+    return rollups, stats
+
+
+def test_adjusted_aggregates_match_a_rebuild(app):
+    with app.app_context():
+        populate()
+        trades = db.session.execute(select(Trade.id, Trade.strategy_id, Trade.timestamp, Trade.profit)
+                                    .where(Trade.id.in_([3, 4, 40, 41, 100]))).all()
+        deltas = {3: -500.0, 4: 80.0, 40: 12.5, 41: -7.0, 100: 300.0}
+        for row_id, delta in deltas.items():
+            db.session.execute(update(Trade).where(Trade.id == row_id).values(profit=Trade.profit + delta))
+        adjust_rollups(db.session, [(strategy_id, timestamp, deltas[row_id])
+                                    for row_id, strategy_id, timestamp, profit in trades])
+        adjust_strategy_stats(db.session, [(strategy_id, profit, profit + deltas[row_id])
+                                           for row_id, strategy_id, timestamp, profit in trades])
+        db.session.commit()
+        adjusted = snapshot()
+
+        rebuild_rollups(db.session)
+        rebuild_strategy_stats(db.session)
+        assert snapshot() == adjusted